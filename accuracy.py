@@ -0,0 +1,191 @@
+import contextlib
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import ACCURACY_TIME, DEFAULT_DATA_SIZE, DEFAULT_TIMEOUT
+from impair import Impairment, ImpairmentRelay
+from network_tester import NetworkSpeedTester
+from utils import free_port
+
+MBIT = 1024 * 1024
+
+# The relay must not be the bottleneck of any case below
+RELAY_MIN_MBPS = 500.0
+
+
+def accuracy_cases() -> List[Dict]:
+    """
+    Return the accuracy cases in run order.
+
+    Every impairment applies to both directions, so RTTs carry the delay
+    twice; UDP loss is the forward loss counted by the server.
+    Each case names the metric it checks and the range it must fall in.
+    """
+    return [
+        {'key': 'tcp/relay-ceiling', 'protocol': 'tcp', 'test': 'download', 'impairment': {},
+         'metric': 'steady_mbps', 'unit': 'Mbps', 'low': RELAY_MIN_MBPS, 'high': None},
+        {'key': 'tcp/rate-download', 'protocol': 'tcp', 'test': 'download',
+         'impairment': {'rate': 200 * MBIT, 'delay': 0.005},
+         'metric': 'steady_mbps', 'unit': 'Mbps', 'low': 180.0, 'high': 206.0},
+        {'key': 'tcp/rate-upload', 'protocol': 'tcp', 'test': 'upload',
+         'impairment': {'rate': 100 * MBIT, 'delay': 0.005},
+         'metric': 'steady_mbps', 'unit': 'Mbps', 'low': 90.0, 'high': 103.0},
+        # Relay timers fire late by up to a millisecond per direction, never early
+        {'key': 'tcp/delay', 'protocol': 'tcp', 'test': 'download', 'impairment': {'delay': 0.010},
+         'client': {'latency': True},
+         'metric': 'idle_rtt', 'unit': 'ms', 'low': 19.9, 'high': 23.0},
+        {'key': 'udp/delay', 'protocol': 'udp', 'test': 'upload', 'impairment': {'delay': 0.020},
+         'client': {'bandwidth': 8 * MBIT},
+         'metric': 'p50_rtt', 'unit': 'ms', 'low': 39.9, 'high': 43.0},
+        # Consecutive RTTs are independent sums of two uniform delays, so E|R1 - R2|
+        # is about 0.92 times the jitter. The jitter is large next to host timer noise,
+        # and the range wide because RFC 3550 jitter only averages the last ~16 probes.
+        {'key': 'udp/jitter', 'protocol': 'udp', 'test': 'upload',
+         'impairment': {'delay': 0.020, 'jitter': 0.010}, 'client': {'bandwidth': 800 * 1024},
+         'metric': 'jitter', 'unit': 'ms', 'low': 6.0, 'high': 12.0},
+        {'key': 'udp/loss', 'protocol': 'udp', 'test': 'upload', 'impairment': {'loss': 0.05},
+         'client': {'bandwidth': 20 * MBIT},
+         'metric': 'loss', 'unit': '%', 'low': 3.75, 'high': 6.25},
+        # Bursts raise the variance of the loss count, hence the wider range
+        {'key': 'udp/burst-loss', 'protocol': 'udp', 'test': 'upload',
+         'impairment': {'loss': 0.05, 'loss_burst': 4}, 'client': {'bandwidth': 20 * MBIT},
+         'metric': 'loss', 'unit': '%', 'low': 2.5, 'high': 7.5},
+        {'key': 'udp/rate', 'protocol': 'udp', 'test': 'upload', 'impairment': {'rate': 50 * MBIT},
+         'client': {'bandwidth': 100 * MBIT, 'datagram_size': 8192},
+         'metric': 'delivered_mbps', 'unit': 'Mbps', 'low': 45.0, 'high': 52.0},
+        # Datagrams 4 ms apart and a 6 ms delay: a reordered datagram skips the delay
+        # and overtakes exactly its predecessor, unless that one was reordered too,
+        # so the server counts p * (1 - p) of the datagrams as out of order
+        {'key': 'udp/reorder', 'protocol': 'udp', 'test': 'upload',
+         'impairment': {'delay': 0.006, 'reorder': 0.05}, 'client': {'bandwidth': 2000 * 1024},
+         'metric': 'reordered', 'unit': '%', 'low': 2.5, 'high': 7.0},
+    ]
+
+
+def _measure(metric: str, speed: float, stats: Dict) -> Optional[float]:
+    """Extract a case's metric from a client result."""
+    if metric == 'steady_mbps':
+        return stats['steady']['mbps']
+    if metric == 'idle_rtt':
+        return stats['latency']['idle']['p50']
+    if metric == 'loss':
+        return stats['packet_loss']
+    if metric == 'delivered_mbps':
+        return stats['achieved_mbps'] * (1 - stats['packet_loss'] / 100)
+    if metric == 'reordered':
+        # Needs the server's RESULTS; without them the case counts as failed
+        if not stats.get('server_received'):
+            return None
+        return stats['reordered'] / stats['server_received'] * 100
+    return stats[metric]
+
+
+def _run_relay(port: int, target_port: int, impairment: Impairment, verbose: bool) -> None:
+    """Process entry point running a relay in front of the local server."""
+    relay = ImpairmentRelay('127.0.0.1', port, '127.0.0.1', target_port, impairment, seed=1)
+    if verbose:
+        relay.start()
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        relay.start()
+
+
+def _tester(case: Dict, port: int, duration: float) -> NetworkSpeedTester:
+    client = case.get('client', {})
+    return NetworkSpeedTester(
+        host='127.0.0.1',
+        port=port,
+        buffer_size=64 * 1024,
+        data_size=DEFAULT_DATA_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+        protocol=case['protocol'],
+        test_duration=duration,
+        datagram_size=client.get('datagram_size', 1024),
+        bandwidth=client.get('bandwidth'),
+        latency=client.get('latency', False),
+        omit=1.0 if case['metric'] == 'steady_mbps' else 0.0
+    )
+
+
+def _wait_for_port(port: int, timeout: float = 10.0) -> None:
+    """Wait until something accepts TCP connections on a loopback port."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1.0).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def run_case(case: Dict, duration: float = ACCURACY_TIME, verbose: bool = False) -> Dict:
+    """
+    Run one case with the server in this process and the relay in another.
+
+    The relay gets its own process (and interpreter lock), as it would on
+    a real path, so its forwarding cost does not slow the endpoints down.
+
+    Args:
+        case (Dict): Case from accuracy_cases()
+        duration (float): Seconds of traffic
+        verbose (bool): Show the handlers' and relay's own output
+
+    Returns:
+        Dict: The case plus the measured value and whether it is within range
+    """
+    server_port, relay_port = free_port(), free_port()
+    server = _tester(case, server_port, duration)
+    # The server thread idles in its accept/recv loop once the case is done
+    threading.Thread(target=server.start_server, name=f"accuracy-server-{server_port}",
+                     daemon=True).start()
+    # Spawned rather than forked: this process already runs server threads
+    relay = multiprocessing.get_context('spawn').Process(
+        target=_run_relay, args=(relay_port, server_port, Impairment(**case['impairment']), verbose),
+        name=f"relay-{relay_port}", daemon=True)
+    relay.start()
+    try:
+        _wait_for_port(relay_port)
+        speed, _, transferred, stats = _tester(case, relay_port, duration).run_client_test(case['test'])
+        value = _measure(case['metric'], speed, stats) if transferred else None
+    finally:
+        relay.terminate()
+        relay.join()
+
+    within = (value is not None and value >= case['low']
+              and (case['high'] is None or value <= case['high']))
+    return {**case, 'value': value, 'ok': within}
+
+
+def accuracy_bench(duration: float = ACCURACY_TIME, verbose: bool = False) -> bool:
+    """
+    Check measured figures against impairments injected by a local relay.
+
+    Args:
+        duration (float): Seconds of traffic per case
+        verbose (bool): Show the handlers' and relay's own output
+
+    Returns:
+        bool: False if any case fell outside its range
+    """
+    print(f"Running accuracy benchmark through the impairment relay ({duration:g} s per case)...")
+    ok = True
+    for case in accuracy_cases():
+        if verbose:
+            result = run_case(case, duration, verbose)
+        else:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                result = run_case(case, duration, verbose)
+
+        high = f"{result['high']:.2f}" if result['high'] is not None else 'inf'
+        measured = f"{result['value']:9.2f}" if result['value'] is not None else f"{'failed':>9}"
+        flag = '' if result['ok'] else '  OUT OF RANGE'
+        print(f"{result['key']:<20} {Impairment(**case['impairment']).describe():<52} "
+              f"{measured} {result['unit']:<4} (expected {result['low']:.2f}-{high}){flag}")
+        ok = ok and result['ok']
+    return ok
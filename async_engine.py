@@ -0,0 +1,839 @@
+import asyncio
+import functools
+import random
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from config import (
+    ASYNC_YIELD_BYTES,
+    DEFAULT_UDP_PACKETS,
+    DEFAULT_UDP_DRAIN_TIME,
+    DEFAULT_UDP_RESULTS_TIMEOUT,
+    UDP_RESULTS_ATTEMPTS,
+    FRAME_MAX_BLOCK
+)
+from framing import (
+    FRAME_DATA,
+    FRAME_END,
+    FRAME_PING,
+    FRAME_REQUEST,
+    FRAME_RESULT,
+    FRAME_SIZE,
+    MAX_MESSAGE_SIZE,
+    ProtocolError,
+    decode_message,
+    encode_message,
+    pack_frame,
+    unpack_frame
+)
+from intervals import create_detector, create_reporter
+from packets import HEADER_SIZE, TYPE_ACK, TYPE_DATA, pack_header, unpack_header
+from pacer import TokenBucketPacer
+from payload import default_provider
+from tcp_handler import TCPHandler
+from transfer import PayloadFile, next_block_size, sendfile_count
+from udp_handler import UDPHandler
+from streamstats import LatencyStats, OneWayDelayStats, SendTimes
+from tcpinfo import TcpInfoSampler, create_sampler, sampling_period
+from udp_session import SessionTable, parse_results
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+def run(coro):
+    """Run a coroutine to completion, on uvloop when it is installed."""
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(coro)
+
+
+class _IdleWatchdog:
+    """Abort a transport that makes no progress for longer than the timeout."""
+
+    def __init__(self, transport: asyncio.BaseTransport, timeout: float):
+        self.transport = transport
+        self.timeout = timeout
+        self.loop = asyncio.get_running_loop()
+        self.last = self.loop.time()
+        self._handle = self.loop.call_later(timeout, self._check)
+
+    def touch(self) -> None:
+        """Record progress on the connection."""
+        self.last = self.loop.time()
+
+    def _check(self) -> None:
+        idle = self.loop.time() - self.last
+        if idle >= self.timeout:
+            self.transport.abort()
+        else:
+            self._handle = self.loop.call_later(self.timeout - idle, self._check)
+
+    def cancel(self) -> None:
+        self._handle.cancel()
+
+
+class AsyncTCPHandler(TCPHandler):
+    """TCP tests on asyncio streams, wire compatible with TCPHandler."""
+
+    def start_server(self) -> None:
+        """Start the asyncio TCP server."""
+        run(self._serve())
+
+    async def _serve(self) -> None:
+        self._active = 0
+        if self.use_sendfile:
+            self._open_payload_files()
+
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        # Accepted sockets inherit these, window scale included
+        self.socket_options.apply(listener)
+        listener.bind((self.host, self.port))
+        server = await asyncio.start_server(self._handle_connection, sock=listener,
+                                            backlog=self.backlog)
+        print(f"TCP Server started on {self.host}:{self.port} "
+              f"(asyncio engine, max {self.max_sessions} concurrent sessions)")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._close_payload_files()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        """Serve one client connection, enforcing the session cap."""
+        address = writer.get_extra_info('peername')
+        if self._active >= self.max_sessions:
+            print(f"Rejecting {address}: session limit of {self.max_sessions} reached")
+            writer.close()
+            return
+
+        self._active += 1
+        metrics.active_sessions.inc('tcp')
+        session_start = time.perf_counter()
+        print(f"Connection from {address}")
+        watchdog = _IdleWatchdog(writer.transport, self.timeout)
+        try:
+            await self._handle_session(reader, writer, watchdog)
+        except Exception as e:
+            metrics.errors_total.inc('tcp')
+            print(f"Error handling client: {e}")
+        finally:
+            self._active -= 1
+            metrics.active_sessions.dec('tcp')
+            metrics.session_duration.observe(time.perf_counter() - session_start, 'tcp')
+            watchdog.cancel()
+            writer.close()
+
+    async def _handle_session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                              watchdog: _IdleWatchdog) -> None:
+        """Run the upload or download test named in the client's REQUEST frame."""
+        request = await self._read_message(reader, FRAME_REQUEST)
+        test_type = request.get('test')
+        size = int(request.get('size') or self.data_size)
+        test_duration = float(request.get('duration') or 0) or None
+        options = request.get('options', {})
+        payload_mode = options.get('payload', self.payload_mode)
+        buffer_size = min(int(options.get('buffer') or self.buffer_size), FRAME_MAX_BLOCK)
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            self._apply_requested_options(sock, options)
+        label = f"[stream {request.get('stream', 0)}] "
+        steady = options.get('steady')
+        reporter = create_reporter(self._requested_interval(options), label,
+                                   live=self.verbose, detector=create_detector(steady))
+        extra: Dict = {}
+        sampler = None
+        if sock is not None and test_type in ('upload', 'download', 'bidir'):
+            sampler = create_sampler(sock, float(options.get('tcp_info') or 0))
+        # On errors the sampling task ends by itself once the socket is closed
+        sampling = self._start_sampling(sampler)
+
+        if test_type == 'upload':
+            if self.verbose:
+                print(f"{label}Starting upload test (receiving data)...")
+
+            start_time = time.perf_counter()
+            if reporter:
+                reporter.start()
+            total = await self._receive(reader, watchdog, reporter, buffer_size)
+            duration = time.perf_counter() - start_time
+            metrics.bytes_total.inc('tcp', 'in', amount=total)
+
+            if self.verbose:
+                print(f"{label}Received {total} bytes in {duration:.2f} seconds")
+
+        elif test_type == 'download':
+            if self.verbose:
+                print(f"{label}Starting download test (sending data)...")
+
+            limit = None if test_duration else size
+            payload = memoryview(default_provider.get(buffer_size, payload_mode))
+            start_time = time.perf_counter()
+            if reporter:
+                reporter.start()
+            deadline = time.perf_counter() + test_duration if test_duration else None
+            total = await self._send(writer, payload, limit, deadline, reporter, watchdog,
+                                     payload_file=self._payload_files.get(payload_mode))
+            duration = time.perf_counter() - start_time
+            metrics.bytes_total.inc('tcp', 'out', amount=total)
+
+            if self.verbose:
+                print(f"{label}Sent {total} bytes in {duration:.2f} seconds")
+
+        elif test_type == 'bidir':
+            if self.verbose:
+                print(f"{label}Starting bidirectional test (sending and receiving)...")
+
+            limit = None if test_duration else size
+            payload = memoryview(default_provider.get(buffer_size, payload_mode))
+            # Our sending half only needs a reporter to stop at the steady state
+            send_reporter = create_reporter(reporter.interval, live=False,
+                                            detector=create_detector(steady)) if steady else None
+            if reporter:
+                reporter.start()
+            if send_reporter:
+                send_reporter.start()
+            deadline = time.perf_counter() + test_duration if test_duration else None
+            sent, send_duration, total, duration = await self._send_and_receive(
+                reader, writer, payload, limit, deadline, watchdog, send_reporter, reporter, buffer_size)
+            metrics.bytes_total.inc('tcp', 'in', amount=total)
+            metrics.bytes_total.inc('tcp', 'out', amount=sent)
+            # The client reports upload from our receive side and download from our send side
+            extra = {'sent': sent, 'send_duration': send_duration}
+
+            if self.verbose:
+                print(f"{label}Sent {sent} bytes in {send_duration:.2f} seconds, "
+                      f"received {total} bytes in {duration:.2f} seconds")
+
+        elif test_type == 'ping':
+            probes = await self._echo_pings(reader, writer, watchdog)
+            if self.verbose:
+                print(f"{label}Echoed {probes} latency probes")
+            metrics.sessions_total.inc('tcp', test_type)
+            return
+
+        else:
+            metrics.errors_total.inc('tcp')
+            writer.write(encode_message(FRAME_RESULT, {'error': f"Unknown test type: {test_type}"}))
+            await writer.drain()
+            return
+
+        intervals = reporter.finish() if reporter else None
+        if test_type in ('upload', 'bidir'):
+            # The client reports the direction it sent from our receive side
+            extra.update(self._receive_intervals(intervals))
+        if sampler:
+            extra['tcp_info'] = self._stop_sampling(sampler, sampling)
+        writer.write(encode_message(FRAME_RESULT, {'bytes': total, 'duration': duration, **extra}))
+        await writer.drain()
+        metrics.sessions_total.inc('tcp', test_type)
+
+        if intervals and self.verbose:
+            self._print_interval_summary(label, intervals)
+
+    @staticmethod
+    def _start_sampling(sampler: Optional[TcpInfoSampler]) -> Optional[asyncio.Task]:
+        """Run a TCP_INFO sampler on the event loop, if sampling is on."""
+        return asyncio.ensure_future(sampler.run_async()) if sampler else None
+
+    @staticmethod
+    def _stop_sampling(sampler: TcpInfoSampler, sampling: asyncio.Task) -> Dict:
+        """Cancel the sampling task and return the sampler's summary and series."""
+        sampling.cancel()
+        return sampler.stop()
+
+    @staticmethod
+    async def _read_message(reader: asyncio.StreamReader, expected_type: int) -> Dict:
+        """Read a JSON control message of the expected type."""
+        frame_type, length = unpack_frame(await reader.readexactly(FRAME_SIZE))
+        if frame_type != expected_type:
+            raise ProtocolError(f"Expected frame type {expected_type}, got {frame_type}")
+        if length > MAX_MESSAGE_SIZE:
+            raise ProtocolError(f"Control message too large ({length} bytes)")
+        return decode_message(await reader.readexactly(length))
+
+    @staticmethod
+    async def _echo_pings(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                          watchdog: _IdleWatchdog) -> int:
+        """Echo latency probe frames until the END frame."""
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        count = 0
+        while True:
+            frame_type, length = unpack_frame(await reader.readexactly(FRAME_SIZE))
+            if frame_type == FRAME_END:
+                return count
+            if frame_type != FRAME_PING or length > MAX_MESSAGE_SIZE:
+                raise ProtocolError(f"Unexpected frame type {frame_type} on probe connection")
+            body = await reader.readexactly(length)
+            writer.write(pack_frame(FRAME_PING, length) + body)
+            await writer.drain()
+            watchdog.touch()
+            count += 1
+
+    async def _receive(self, reader: asyncio.StreamReader, watchdog: _IdleWatchdog,
+                       reporter=None, buffer_size: Optional[int] = None) -> int:
+        """Read and discard DATA frames until the END frame."""
+        read = reader.read
+        buffer_size = buffer_size or self.buffer_size
+        total = 0
+        while True:
+            frame_type, length = unpack_frame(await reader.readexactly(FRAME_SIZE))
+            if frame_type == FRAME_END:
+                return total
+            if frame_type != FRAME_DATA:
+                raise ProtocolError(f"Unexpected frame type {frame_type} in data stream")
+
+            remaining = length
+            while remaining:
+                data = await read(min(remaining, buffer_size))
+                if not data:
+                    raise ProtocolError("Connection closed mid-frame")
+                remaining -= len(data)
+                watchdog.touch()
+                if reporter is not None:
+                    reporter.update(len(data))
+            total += length
+
+    async def _send(self, writer: asyncio.StreamWriter, payload: memoryview,
+                    total: Optional[int], deadline: Optional[float], reporter,
+                    watchdog: _IdleWatchdog, yield_bytes: Optional[int] = None,
+                    payload_file: Optional[PayloadFile] = None) -> int:
+        """
+        Send DATA frames from a preallocated payload, then the END frame.
+
+        With yield_bytes set, the sender gives way to other tasks on the loop
+        at least that often, which a receiver sharing the loop needs. With
+        payload_file set, frames are sent from it with sendfile() instead.
+        """
+        # loop.sendfile() pauses reading on the transport, so duplex sends stay on the buffer path
+        if payload_file is not None and yield_bytes is None:
+            send_block = functools.partial(self._send_file_block, payload_file=payload_file)
+        else:
+            send_block = functools.partial(self._send_block, yield_bytes=yield_bytes)
+
+        if total is not None:
+            sent = await send_block(writer, payload, total, reporter, watchdog) if total > 0 else 0
+        else:
+            clock = time.perf_counter
+            start = clock()
+            chunk_size = len(payload)
+            sent = 0
+            while True:
+                now = clock()
+                if now >= deadline or (reporter is not None and reporter.settled):
+                    break
+                block = next_block_size(sent, now - start, deadline - now, chunk_size)
+                sent += await send_block(writer, payload, block, reporter, watchdog)
+
+        writer.write(pack_frame(FRAME_END, 0))
+        await writer.drain()
+        return sent
+
+    async def _send_and_receive(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                payload: memoryview, total: Optional[int], deadline: Optional[float],
+                                watchdog: _IdleWatchdog, send_reporter=None, recv_reporter=None,
+                                buffer_size: Optional[int] = None) -> Tuple[int, float, int, float]:
+        """
+        Send DATA frames on a separate task while receiving the peer's frames.
+
+        Returns:
+            Tuple[int, float, int, float]: Bytes sent, send duration, bytes received
+            and receive duration in seconds
+        """
+        start = time.perf_counter()
+
+        async def timed_send() -> Tuple[int, float]:
+            sent = await self._send(writer, payload, total, deadline, send_reporter, watchdog,
+                                    ASYNC_YIELD_BYTES)
+            return sent, time.perf_counter() - start
+
+        send_task = asyncio.ensure_future(timed_send())
+        try:
+            received = await self._receive(reader, watchdog, recv_reporter, buffer_size)
+            recv_duration = time.perf_counter() - start
+        except BaseException:
+            send_task.cancel()
+            raise
+        sent, send_duration = await send_task
+        return sent, send_duration, received, recv_duration
+
+    async def _send_block(self, writer: asyncio.StreamWriter, payload: memoryview, size: int,
+                          reporter, watchdog: _IdleWatchdog, yield_bytes: Optional[int] = None) -> int:
+        """Send one DATA frame of the given size from the payload buffer."""
+        writer.write(pack_frame(FRAME_DATA, size))
+        chunk_size = len(payload)
+        remaining = size
+        unyielded = 0
+        while remaining:
+            chunk = min(chunk_size, remaining)
+            writer.write(payload if chunk == chunk_size else payload[:chunk])
+            await writer.drain()
+            remaining -= chunk
+            watchdog.touch()
+            if reporter is not None:
+                reporter.update(chunk)
+            # drain() returns without yielding while the kernel keeps accepting data
+            if yield_bytes is not None:
+                unyielded += chunk
+                if unyielded >= yield_bytes:
+                    unyielded = 0
+                    await asyncio.sleep(0)
+        return size
+
+    async def _send_file_block(self, writer: asyncio.StreamWriter, payload: memoryview, size: int,
+                               reporter, watchdog: _IdleWatchdog, payload_file: PayloadFile) -> int:
+        """Send one DATA frame of the given size from the tmpfs payload file."""
+        loop = asyncio.get_running_loop()
+        backing = payload_file.open()
+        writer.write(pack_frame(FRAME_DATA, size))
+        clock = time.perf_counter
+        start = clock()
+        remaining = size
+        while remaining:
+            count = sendfile_count(remaining, payload_file.size, size - remaining,
+                                   clock() - start, reporter)
+            written = await loop.sendfile(writer.transport, backing, 0, count)
+            if not written:
+                raise ProtocolError("sendfile() made no progress")
+            remaining -= written
+            watchdog.touch()
+            if reporter is not None:
+                reporter.update(written)
+        return size
+
+    def run_client_test(self, test_type: str) -> Tuple[float, float, int, Dict]:
+        """
+        Run TCP client speed test on the asyncio engine.
+
+        Args:
+            test_type (str): Type of test ('upload', 'download' or 'bidir')
+
+        Returns:
+            Tuple[float, float, int, Dict]: Speed in Mbps, duration in seconds, bytes
+            transferred, and statistics (interval summary under 'intervals' when enabled)
+        """
+        speed, duration, total, per_stream = run(self._run_streams(test_type, 1))
+        stats = {key: value for key, value in per_stream[0].items()
+                 if key not in ('stream', 'speed', 'duration', 'bytes')}
+        return speed, duration, total, stats
+
+    def run_parallel_test(self, test_type: str, streams: int) -> Tuple[float, float, int, List[Dict]]:
+        """
+        Run a TCP speed test over several concurrent connections on one event loop.
+
+        Args:
+            test_type (str): Type of test ('upload' or 'download')
+            streams (int): Number of parallel connections
+
+        Returns:
+            Tuple[float, float, int, List[Dict]]: Aggregate speed in Mbps, duration
+            in seconds, total bytes transferred, and per-stream results
+        """
+        return run(self._run_streams(test_type, streams))
+
+    async def _run_streams(self, test_type: str, streams: int) -> Tuple[float, float, int, List[Dict]]:
+        # Connecting every stream before any transfer starts acts as the barrier
+        connections = await asyncio.gather(
+            *(asyncio.wait_for(self._open_connection(), self.timeout) for _ in range(streams)),
+            return_exceptions=True)
+
+        results = await asyncio.gather(
+            *(self._run_async_stream(connection, test_type, stream_id, live=streams == 1)
+              for stream_id, connection in enumerate(connections)))
+
+        per_stream = []
+        for stream_id, (speed, duration, transferred, stats) in enumerate(results):
+            per_stream.append({
+                'stream': stream_id,
+                'speed': speed,
+                'duration': duration,
+                'bytes': transferred,
+                **stats
+            })
+
+        total_bytes = sum(stream['bytes'] for stream in per_stream)
+        duration = max(stream['duration'] for stream in per_stream)
+        speed_mbps = (total_bytes * 8) / (1024 * 1024 * duration) if duration > 0 else 0.0
+        return speed_mbps, duration, total_bytes, per_stream
+
+    async def _open_connection(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Connect a stream with the socket options applied before the handshake."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            self.socket_options.apply(sock)
+            sock.setblocking(False)
+            await asyncio.get_running_loop().sock_connect(sock, (self.host, self.port))
+        except BaseException:
+            sock.close()
+            raise
+        return await asyncio.open_connection(sock=sock)
+
+    async def _run_async_stream(self, connection, test_type: str, stream_id: int,
+                                live: bool) -> Tuple[float, float, int, Dict]:
+        """Run a single TCP test over an already opened connection."""
+        stats: Dict = {}
+        if isinstance(connection, BaseException):
+            print(f"Error during {test_type} test (stream {stream_id}): {connection}")
+            return 0.0, 0.0, 0, stats
+
+        reader, writer = connection
+        watchdog = _IdleWatchdog(writer.transport, self.timeout)
+        label = '[download] ' if test_type == 'bidir' else ''
+        reporter = create_reporter(self.interval, label, live=live,
+                                   detector=create_detector(self._steady_options()))
+        sock = writer.get_extra_info('socket')
+        sampler = create_sampler(sock, sampling_period(self.tcp_info, self.interval)) if sock else None
+        sampling = None
+        result: Dict = {}
+
+        try:
+            writer.write(encode_message(FRAME_REQUEST, self._build_request(test_type, stream_id)))
+            sampling = self._start_sampling(sampler)
+
+            if test_type == 'upload':
+                if self.verbose:
+                    print(f"Starting upload test to {self.host}:{self.port}...")
+
+                payload = memoryview(self._generate_test_data(self.buffer_size))
+                limit = None if self.test_duration else self.data_size
+                start_time = time.perf_counter()
+                if reporter:
+                    reporter.start()
+                deadline = time.perf_counter() + self.test_duration if self.test_duration else None
+                total_sent = await self._send(writer, payload, limit, deadline, reporter, watchdog)
+                # Close our intervals now, not after waiting for the receiver to drain
+                own_intervals = reporter.finish() if reporter else None
+                reporter = None
+
+                # Prefer the receiver's view of the transfer; fall back to our own
+                try:
+                    result = await self._read_message(reader, FRAME_RESULT)
+                    bytes_sent = int(result['bytes'])
+                    duration = float(result['duration'])
+                except KeyError:
+                    duration = time.perf_counter() - start_time
+                    bytes_sent = total_sent
+                intervals = self._sender_intervals(result, own_intervals)
+                if intervals:
+                    stats['intervals'] = intervals
+
+            elif test_type == 'download':
+                if self.verbose:
+                    print(f"Starting download test from {self.host}:{self.port}...")
+
+                start_time = time.perf_counter()
+                if reporter:
+                    reporter.start()
+                total_received = await self._receive(reader, watchdog, reporter)
+                end_time = time.perf_counter()
+
+                # Report the sender's timing, as for uploads
+                result = await self._read_message(reader, FRAME_RESULT)
+                duration = float(result.get('duration') or end_time - start_time)
+                bytes_sent = total_received
+
+            elif test_type == 'bidir':
+                if self.verbose:
+                    print(f"Starting bidirectional test with {self.host}:{self.port}...")
+
+                payload = memoryview(self._generate_test_data(self.buffer_size))
+                upload_reporter = create_reporter(self.interval, '[upload] ', live=live,
+                                                  detector=create_detector(self._steady_options()))
+                limit = None if self.test_duration else self.data_size
+                if reporter:
+                    reporter.start()
+                if upload_reporter:
+                    upload_reporter.start()
+                deadline = time.perf_counter() + self.test_duration if self.test_duration else None
+                _, _, total_received, receive_duration = await self._send_and_receive(
+                    reader, writer, payload, limit, deadline, watchdog, upload_reporter, reporter)
+                upload_intervals = upload_reporter.finish() if upload_reporter else None
+                download_intervals = reporter.finish() if reporter else None
+
+                # Each direction is reported from its receiver's byte count and its sender's timing
+                result = await self._read_message(reader, FRAME_RESULT)
+                directions = {
+                    'upload': self._direction_result(int(result['bytes']), float(result['duration']),
+                                                     self._sender_intervals(result, upload_intervals)),
+                    'download': self._direction_result(
+                        total_received, float(result.get('send_duration') or receive_duration),
+                        download_intervals)
+                }
+                stats['directions'] = directions
+                reporter = None
+                bytes_sent = sum(direction['bytes'] for direction in directions.values())
+                duration = max(direction['duration'] for direction in directions.values())
+
+            else:
+                raise ValueError(f"Unknown test type: {test_type}")
+
+            if reporter:
+                stats['intervals'] = reporter.finish()
+            if sampler:
+                stats['tcp_info'] = {'client': self._stop_sampling(sampler, sampling),
+                                     'server': result.get('tcp_info')}
+
+            speed_mbps = (bytes_sent * 8) / (1024 * 1024 * duration)
+            return speed_mbps, duration, bytes_sent, stats
+
+        except Exception as e:
+            print(f"Error during {test_type} test (stream {stream_id}): {e}")
+            return 0.0, 0.0, 0, stats
+        finally:
+            if sampling:
+                sampling.cancel()
+            watchdog.cancel()
+            writer.close()
+
+
+class _UDPServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, handler: 'AsyncUDPHandler', sessions: SessionTable):
+        self.handler = handler
+        self.sessions = sessions
+        self.ack = bytearray(HEADER_SIZE)
+        self.transport = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        response = self.handler._process_datagram(self.sessions, data, len(data), addr,
+                                                  time.monotonic(), self.ack)
+        if response is not None:
+            self.transport.sendto(response, addr)
+
+
+class _UDPClientProtocol(asyncio.DatagramProtocol):
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self.ready = asyncio.get_running_loop().create_future()
+        self.results = asyncio.get_running_loop().create_future()
+        self.send_times = SendTimes()
+        self.latency = LatencyStats()
+        self.one_way = OneWayDelayStats()
+        self.last_ack = 0.0
+        self.errors = 0
+
+    def error_received(self, exc: Exception) -> None:
+        # The transport drops a datagram whose sendto() fails and reports it here
+        self.errors += 1
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        receive_time = time.monotonic_ns()
+        header = unpack_header(data, len(data))
+        if header is None:
+            if data in (b'READY', b'BUSY') and not self.ready.done():
+                self.ready.set_result(data == b'READY')
+            elif not self.results.done():
+                results = parse_results(data)
+                if results is not None:
+                    self.results.set_result(results)
+            return
+
+        msg_type, session_id, seq_num, server_time = header
+        if msg_type == TYPE_ACK and session_id == self.session_id:
+            sent_time = self.send_times.pop(seq_num)
+            if sent_time is not None:
+                self.latency.add((receive_time - sent_time) / 1e6)
+                self.one_way.add(sent_time, server_time, receive_time)
+                self.last_ack = time.perf_counter()
+
+
+class AsyncUDPHandler(UDPHandler):
+    """UDP tests on asyncio datagram endpoints, wire compatible with UDPHandler."""
+
+    def start_server(self) -> None:
+        """Start the asyncio UDP server."""
+        run(self._serve())
+
+    async def _serve(self) -> None:
+        loop = asyncio.get_running_loop()
+        sessions = SessionTable()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.socket_options.apply(sock, tcp=False)
+        sock.bind((self.host, self.port))
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UDPServerProtocol(self, sessions), sock=sock)
+        print(f"UDP Server started on {self.host}:{self.port} (asyncio engine)")
+
+        try:
+            while True:
+                await asyncio.sleep(1.0)
+                self._evict_sessions(sessions, time.monotonic())
+        finally:
+            transport.close()
+
+    def run_client_test(self, test_type: str) -> Tuple[float, float, int, Dict]:
+        """
+        Run UDP client speed test on the asyncio engine.
+
+        Args:
+            test_type (str): Type of test ('upload' or 'download')
+
+        Returns:
+            Tuple[float, float, int, Dict]: Speed in Mbps, duration, bytes sent, statistics
+        """
+        return run(self._client_test(test_type, live=True))
+
+    def run_parallel_test(self, test_type: str, streams: int) -> Tuple[float, float, int, List[Dict]]:
+        """
+        Run several UDP probes concurrently on one event loop.
+
+        Args:
+            test_type (str): Type of test ('upload' or 'download')
+            streams (int): Number of concurrent probes
+
+        Returns:
+            Tuple[float, float, int, List[Dict]]: Aggregate speed in Mbps, duration
+            in seconds, total bytes sent, and per-probe results
+        """
+        return run(self._parallel_test(test_type, streams))
+
+    async def _parallel_test(self, test_type: str, streams: int) -> Tuple[float, float, int, List[Dict]]:
+        results = await asyncio.gather(*(self._client_test(test_type, live=False)
+                                         for _ in range(streams)))
+
+        per_stream = []
+        for stream_id, (speed, duration, transferred, stats) in enumerate(results):
+            per_stream.append({
+                'stream': stream_id,
+                'speed': speed,
+                'duration': duration,
+                'bytes': transferred,
+                **stats
+            })
+
+        total_bytes = sum(stream['bytes'] for stream in per_stream)
+        duration = max(stream['duration'] for stream in per_stream)
+        speed_mbps = (total_bytes * 8) / (1024 * 1024 * duration) if duration > 0 else 0.0
+        return speed_mbps, duration, total_bytes, per_stream
+
+    async def _client_test(self, test_type: str, live: bool) -> Tuple[float, float, int, Dict]:
+        loop = asyncio.get_running_loop()
+        session_id = random.getrandbits(32)
+        server_address = (self.host, self.port)
+        transport = None
+
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._client_socket_options().apply(sock, tcp=False)
+            sock.connect(server_address)
+            transport, protocol = await loop.create_datagram_endpoint(
+                lambda: _UDPClientProtocol(session_id), sock=sock)
+
+            transport.sendto(f"START:{test_type}:{session_id}".encode('utf-8'))
+            try:
+                ready = await asyncio.wait_for(protocol.ready, self.timeout)
+            except asyncio.TimeoutError:
+                print("Timed out waiting for server ready signal")
+                return 0.0, 0.0, 0, {}
+            if not ready:
+                print("Server is busy: too many UDP sessions open")
+                return 0.0, 0.0, 0, {}
+
+            if self.verbose:
+                print(f"Starting UDP {test_type} test with {self.host}:{self.port}")
+
+            packet_size = self.datagram_size
+            num_packets = min(DEFAULT_UDP_PACKETS, self.data_size // packet_size)
+            send_times = protocol.send_times
+            bytes_sent = 0
+            packet = bytearray(default_provider.get(packet_size))
+
+            reporter = create_reporter(self.interval, live=live)
+            pacer = TokenBucketPacer(self.bandwidth, packet_size) if self.bandwidth else None
+
+            if reporter:
+                reporter.start()
+            deadline = time.perf_counter() + self.test_duration if self.test_duration else None
+
+            send_start = time.perf_counter()
+            i = 0
+            # Sends the transport refused; they keep no sequence number, so
+            # they are reported on their own instead of as loss
+            send_errors = 0
+            while (i + send_errors < num_packets) if deadline is None else (time.perf_counter() < deadline):
+                if pacer:
+                    delay = pacer.wait_time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    burst = pacer.take()
+                else:
+                    burst = 1
+                if deadline is None:
+                    burst = min(burst, num_packets - i - send_errors)
+
+                if transport.is_closing():
+                    raise ConnectionError("UDP transport closed while sending")
+                for _ in range(burst):
+                    now = time.monotonic_ns()
+                    pack_header(packet, TYPE_DATA, session_id, i, now)
+                    send_times.record(i, now)
+                    errors = protocol.errors
+                    transport.sendto(packet)
+                    # A failed send is reported synchronously; the next datagram reuses its sequence number
+                    if protocol.errors != errors:
+                        send_errors += 1
+                        continue
+                    i += 1
+                    bytes_sent += packet_size
+                    if reporter:
+                        reporter.update(packet_size)
+
+                if not pacer and i + send_errors > 0 and (i + send_errors) % 50 == 0:
+                    await asyncio.sleep(0.01)
+                else:
+                    # Yield so ACKs are timestamped while sending continues
+                    await asyncio.sleep(0)
+            send_duration = time.perf_counter() - send_start
+            num_packets = i
+            intervals = reporter.finish() if reporter else None
+
+            # Wait for outstanding ACKs until a single drain deadline
+            drain_deadline = time.perf_counter() + DEFAULT_UDP_DRAIN_TIME
+            while protocol.latency.count < num_packets and time.perf_counter() < drain_deadline:
+                await asyncio.sleep(0.005)
+
+            duration = max(send_start + send_duration, protocol.last_ack) - send_start
+            server_results = await self._fetch_results_async(transport, protocol, session_id)
+
+            return self._build_results(num_packets, bytes_sent, protocol.latency, protocol.one_way,
+                                       send_duration, duration, intervals, server_results,
+                                       send_errors)
+
+        except Exception as e:
+            print(f"Error during UDP {test_type} test: {e}")
+            return 0.0, 0.0, 0, {}
+        finally:
+            if transport is not None:
+                transport.close()
+
+    async def _fetch_results_async(self, transport, protocol: _UDPClientProtocol,
+                                   session_id: int) -> Optional[Dict[str, int]]:
+        """End the session and wait for the server's RESULTS, resending END on timeout."""
+        end = f"END:{session_id}".encode('utf-8')
+        for _ in range(UDP_RESULTS_ATTEMPTS):
+            transport.sendto(end)
+            try:
+                return await asyncio.wait_for(asyncio.shield(protocol.results),
+                                              DEFAULT_UDP_RESULTS_TIMEOUT)
+            except asyncio.TimeoutError:
+                continue
+
+        if self.verbose:
+            print(f"No UDP results from the server (session {session_id}); loss is round trip only")
+        return None
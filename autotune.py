@@ -0,0 +1,129 @@
+import contextlib
+import itertools
+import json
+import os
+from typing import Dict, List, Optional
+
+from config import (
+    AUTOTUNE_BUFFERS,
+    AUTOTUNE_INTERVAL,
+    AUTOTUNE_PROBE_TIME,
+    AUTOTUNE_SOCKET_BUFFERS
+)
+from network_tester import NetworkSpeedTester
+from sockopts import SocketOptions
+from utils import format_size
+
+
+def steady_state_mbps(intervals: Optional[Dict]) -> float:
+    """
+    Estimate steady-state throughput from an interval summary.
+
+    The first third of the intervals is dropped so TCP slow start does not
+    count against configurations that take longer to ramp up.
+
+    Args:
+        intervals (Optional[Dict]): Interval summary from IntervalReporter.finish()
+
+    Returns:
+        float: Mean Mbps over the remaining intervals, or 0 if there are none
+    """
+    samples = intervals['samples'] if intervals else []
+    steady = samples[len(samples) // 3:]
+    if not steady:
+        return 0.0
+    return sum(sample['mbps'] for sample in steady) / len(steady)
+
+
+def autotune(host: str, port: int, timeout: int, test_type: str = 'download',
+             base_options: Optional[SocketOptions] = None, engine: str = 'threads',
+             streams: int = 1, probe_time: float = AUTOTUNE_PROBE_TIME,
+             verbose: bool = False) -> Dict:
+    """
+    Sweep application and kernel buffer sizes and pick the fastest combination.
+
+    Every combination of AUTOTUNE_BUFFERS and AUTOTUNE_SOCKET_BUFFERS runs a
+    short time-bounded TCP probe against the server. Kernel buffer sizes
+    are set as SO_SNDBUF and SO_RCVBUF on both ends; the server mirrors
+    them from the test request.
+
+    Args:
+        host (str): Server address
+        port (int): Server port
+        timeout (int): Socket timeout in seconds
+        test_type (str): Direction to tune ('upload' or 'download')
+        base_options (Optional[SocketOptions]): Options kept fixed during the sweep (nodelay, congestion)
+        engine (str): I/O engine to tune with
+        streams (int): Parallel streams per probe
+        probe_time (float): Seconds per probe
+        verbose (bool): Show the handlers' own output
+
+    Returns:
+        Dict: Profile with the chosen buffer size and socket options, its
+        steady-state Mbps, and every probe result under 'probes'
+    """
+    base_options = base_options or SocketOptions()
+    probes: List[Dict] = []
+    best: Optional[Dict] = None
+
+    print(f"Autotuning {test_type} against {host}:{port} "
+          f"({len(AUTOTUNE_BUFFERS) * len(AUTOTUNE_SOCKET_BUFFERS)} probes of {probe_time:g} s)...")
+
+    for buffer_size, socket_buffer in itertools.product(AUTOTUNE_BUFFERS, AUTOTUNE_SOCKET_BUFFERS):
+        options = SocketOptions(sndbuf=socket_buffer, rcvbuf=socket_buffer,
+                                nodelay=base_options.nodelay, congestion=base_options.congestion)
+        tester = NetworkSpeedTester(
+            host=host,
+            port=port,
+            buffer_size=buffer_size,
+            data_size=0,
+            timeout=timeout,
+            streams=streams,
+            test_duration=probe_time,
+            interval=AUTOTUNE_INTERVAL,
+            engine=engine,
+            socket_options=options
+        )
+
+        if verbose:
+            _, _, _, stats = tester.run_client_test(test_type)
+        else:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                _, _, _, stats = tester.run_client_test(test_type)
+
+        mbps = steady_state_mbps((stats or {}).get('intervals'))
+        probe = {'buffer_size': buffer_size, 'socket': options.to_dict(), 'mbps': mbps}
+        probes.append(probe)
+        print(f"  buffer {format_size(buffer_size):>10}  socket buffers "
+              f"{format_size(socket_buffer) if socket_buffer else 'default':>10}  {mbps:10.2f} Mbps")
+
+        if best is None or mbps > best['mbps']:
+            best = probe
+
+    return {
+        'host': host,
+        'test': test_type,
+        'engine': engine,
+        'streams': streams,
+        'buffer_size': best['buffer_size'],
+        'socket': best['socket'],
+        'mbps': best['mbps'],
+        'probes': probes
+    }
+
+
+def save_profile(path: str, profile: Dict) -> None:
+    """Write a tuning profile as JSON."""
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
+
+
+def load_profile(path: str) -> Dict:
+    """
+    Read a tuning profile written by save_profile().
+
+    Returns:
+        Dict: Profile with 'buffer_size' and 'socket' options
+    """
+    with open(path) as f:
+        return json.load(f)
@@ -6,4 +6,67 @@ DEFAULT_PORT = 5000
 DEFAULT_BUFFER_SIZE = 8192  # 8KB buffer
 DEFAULT_DATA_SIZE = 10 * 1024 * 1024  # 10MB default test size
 DEFAULT_TIMEOUT = 10  # seconds
+DEFAULT_SENDFILE_SIZE = 4 * 1024 * 1024  # size of the tmpfs payload file served with sendfile()
+SENDFILE_MIN_COUNT = 64 * 1024  # smallest sendfile() call while interval reporting is on
+SENDFILE_REPORT_SHARE = 0.1  # share of a reporting interval one sendfile() call may cover
+FRAME_BLOCK_TIME = 0.01  # seconds of data per DATA frame in time-bounded tests
+FRAME_MAX_BLOCK = 16 * 1024 * 1024  # largest DATA frame in time-bounded tests
+DEFAULT_TCPINFO_INTERVAL = 0.1  # seconds between TCP_INFO samples without --interval
+TCPINFO_MAX_SAMPLES = 300  # TCP_INFO samples kept per connection before thinning
+ASYNC_YIELD_BYTES = 256 * 1024  # asyncio bidirectional senders yield to the event loop after this many bytes
+DEFAULT_PROBE_INTERVAL = 0.1  # seconds between latency probes
+DEFAULT_IDLE_PROBES = 10  # latency probes sent before the transfer starts
 DEFAULT_UDP_PACKETS = 1000
+DEFAULT_DATAGRAM_SIZE = 1024  # UDP datagram size in bytes, header included
+DEFAULT_PACER_BURST = 32  # max datagrams sent back to back per pacer tick
+DEFAULT_UDP_DRAIN_TIME = 1.0  # seconds to wait for outstanding ACKs after sending
+DEFAULT_UDP_RESULTS_TIMEOUT = 0.5  # seconds to wait for the server's RESULTS after each END
+UDP_RESULTS_ATTEMPTS = 3  # END messages sent before giving up on the server's RESULTS
+DEFAULT_UDP_RCVBUF = 4 * 1024 * 1024  # client receive buffer for ACKs
+DEFAULT_UDP_SESSION_IDLE = 30.0  # seconds before an idle UDP server session is evicted
+DEFAULT_UDP_REORDER_WINDOW = 1024  # sequence numbers tracked for duplicate/reorder detection
+DEFAULT_UDP_MAX_SESSIONS = 1024  # UDP server sessions open at once; new ones beyond are refused
+DEFAULT_UDP_SEQ_WINDOW = 65536  # outstanding send timestamps kept by the UDP client
+
+# Steady-state detection
+DEFAULT_STEADY_INTERVAL = 0.25  # interval used by --omit and --steady without --interval
+DEFAULT_STEADY_WINDOW = 5  # consecutive intervals whose rates must agree
+DEFAULT_STEADY_CV = 5.0  # coefficient of variation (percent) below which the rate counts as steady
+
+# Test payload
+DEFAULT_PAYLOAD_MODE = 'random'  # 'random', 'zeros' or 'pattern'
+PAYLOAD_CACHE_ENTRIES = 8  # distinct payloads kept in memory
+PAYLOAD_CACHE_BYTES = 256 * 1024 * 1024  # upper bound on cached payload memory
+
+# Autotuning
+AUTOTUNE_BUFFERS = (8 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024)  # application buffer sizes
+AUTOTUNE_SOCKET_BUFFERS = (None, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)  # SO_SNDBUF/SO_RCVBUF, None = kernel autotuning
+AUTOTUNE_PROBE_TIME = 1.0  # seconds per probe
+AUTOTUNE_INTERVAL = 0.1  # interval used to find the steady state of a probe
+
+# Monitoring
+DEFAULT_MONITOR_EVERY = 60.0  # seconds between monitoring rounds
+DEFAULT_MONITOR_JITTER = 5.0  # random delay added to each round, seconds
+DEFAULT_HISTORY_DB = 'history.db'  # SQLite results history
+DEFAULT_HISTORY_SINCE = '24h'  # window summarised by --history
+DEFAULT_HISTORY_BUCKET = 'hour'  # 'hour' or 'day'
+
+# Server metrics
+METRICS_DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300)  # session duration histogram, seconds
+
+# Self-benchmark
+DEFAULT_BENCH_TIME = 1.0  # seconds of traffic per benchmark case
+DEFAULT_BENCH_THRESHOLD = 0.10  # relative change flagged as a regression
+DEFAULT_BENCH_OUTPUT = 'selfbench.json'
+
+# Impairment relay
+DEFAULT_IMPAIR_QUEUE = 0.05  # seconds of data the rate limiter queues before dropping datagrams or pausing TCP reads
+IMPAIR_BUCKET_BYTES = 64 * 1024  # token bucket depth of the rate limiter
+IMPAIR_TCP_CHUNK = 64 * 1024  # bytes per TCP relay read
+IMPAIR_TCP_CHUNKS = 64  # chunks in flight per TCP relay direction
+IMPAIR_TIMER_SLACK = 0.0002  # datagrams due within this many seconds are released together
+ACCURACY_TIME = 3.0  # seconds of traffic per accuracy benchmark case
+
+# Server concurrency
+DEFAULT_BACKLOG = 128  # pending connections queued by listen()
+DEFAULT_MAX_SESSIONS = 64  # concurrent TCP test sessions served at once
@@ -0,0 +1,116 @@
+import json
+import socket
+import struct
+from typing import Dict, Tuple
+
+# Every TCP message starts with a fixed header: magic, protocol version,
+# frame type and the length of the body that follows.
+FRAME = struct.Struct('!HBBQ')
+FRAME_SIZE = FRAME.size
+
+MAGIC = 0x4E46  # 'NF'
+VERSION = 1
+
+FRAME_REQUEST = 1  # JSON test request from the client
+FRAME_DATA = 2  # raw payload bytes, length announced in the header
+FRAME_END = 3  # end of payload, no body
+FRAME_RESULT = 4  # JSON result from whichever side received the payload
+FRAME_PING = 5  # latency probe, echoed back unchanged by the server
+
+# Upper bound for JSON control message bodies
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+
+class ProtocolError(Exception):
+    """Raised when the peer sends a malformed or unexpected frame."""
+
+
+def pack_frame(frame_type: int, length: int) -> bytes:
+    """
+    Build a frame header.
+
+    Args:
+        frame_type (int): One of the FRAME_* constants
+        length (int): Length of the body that follows
+
+    Returns:
+        bytes: The encoded header
+    """
+    return FRAME.pack(MAGIC, VERSION, frame_type, length)
+
+
+def unpack_frame(header: bytes) -> Tuple[int, int]:
+    """
+    Parse a frame header.
+
+    Args:
+        header (bytes): FRAME_SIZE bytes read from the stream
+
+    Returns:
+        Tuple[int, int]: Frame type and body length
+    """
+    if len(header) < FRAME_SIZE:
+        raise ProtocolError("Connection closed mid-frame")
+    magic, version, frame_type, length = FRAME.unpack(header)
+    if magic != MAGIC:
+        raise ProtocolError("Peer is not a network speed tester")
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+    return frame_type, length
+
+
+def encode_message(frame_type: int, message: Dict) -> bytes:
+    """Encode a JSON control message as a complete frame."""
+    body = json.dumps(message).encode('utf-8')
+    return pack_frame(frame_type, len(body)) + body
+
+
+def decode_message(body: bytes) -> Dict:
+    """Decode the JSON body of a control message."""
+    try:
+        return json.loads(body.decode('utf-8'))
+    except ValueError as e:
+        raise ProtocolError(f"Malformed control message: {e}")
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    """Receive exactly size bytes, or fewer if the peer closes first."""
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return bytes(data)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[int, int]:
+    """Read the next frame header from a socket."""
+    return unpack_frame(recv_exact(sock, FRAME_SIZE))
+
+
+def send_message(sock: socket.socket, frame_type: int, message: Dict) -> None:
+    """Send a JSON control message."""
+    sock.sendall(encode_message(frame_type, message))
+
+
+def recv_message(sock: socket.socket, expected_type: int) -> Dict:
+    """
+    Receive a JSON control message of the expected type.
+
+    Args:
+        sock (socket.socket): Connected socket
+        expected_type (int): FRAME_REQUEST or FRAME_RESULT
+
+    Returns:
+        Dict: The decoded message
+    """
+    frame_type, length = recv_frame(sock)
+    if frame_type != expected_type:
+        raise ProtocolError(f"Expected frame type {expected_type}, got {frame_type}")
+    if length > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"Control message too large ({length} bytes)")
+    body = recv_exact(sock, length)
+    if len(body) < length:
+        raise ProtocolError("Connection closed mid-message")
+    return decode_message(body)
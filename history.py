@@ -0,0 +1,179 @@
+import math
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BUCKETS = {'hour': 3600, 'day': 86400}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    host TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    test TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    mbps REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    loss REAL,
+    rtt REAL,
+    ok INTEGER NOT NULL,
+    PRIMARY KEY (host, protocol, test, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    host TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    test TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    runs INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    p50_mbps REAL,
+    p95_mbps REAL,
+    mean_mbps REAL,
+    loss REAL,
+    p50_rtt REAL,
+    p95_rtt REAL,
+    PRIMARY KEY (host, protocol, test, width, start)
+) WITHOUT ROWID;
+"""
+
+ROLLUP_COLUMNS = ('runs', 'failed', 'p50_mbps', 'p95_mbps', 'mean_mbps', 'loss', 'p50_rtt', 'p95_rtt')
+
+
+def _percentile(ordered: List[float], p: float) -> Optional[float]:
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_runs(rows: Iterable[Tuple]) -> Tuple:
+    """
+    Summarise the results in one time bucket.
+
+    Args:
+        rows (Iterable[Tuple]): (mbps, loss, rtt, ok) per test run
+
+    Returns:
+        Tuple: Values for ROLLUP_COLUMNS; throughput, loss and RTT figures
+        cover successful runs only
+    """
+    runs = failed = 0
+    speeds: List[float] = []
+    losses: List[float] = []
+    rtts: List[float] = []
+    for mbps, loss, rtt, ok in rows:
+        runs += 1
+        if not ok:
+            failed += 1
+            continue
+        speeds.append(mbps)
+        if loss is not None:
+            losses.append(loss)
+        if rtt is not None:
+            rtts.append(rtt)
+
+    speeds.sort()
+    rtts.sort()
+    return (runs, failed, _percentile(speeds, 50), _percentile(speeds, 95),
+            sum(speeds) / len(speeds) if speeds else None,
+            sum(losses) / len(losses) if losses else None,
+            _percentile(rtts, 50), _percentile(rtts, 95))
+
+
+class HistoryStore:
+    def __init__(self, path: str):
+        """
+        Open (or create) a results history database.
+
+        Raw results are kept per run. Every insert also refreshes the exact
+        hourly and daily summaries of its bucket, so queries read one row
+        per bucket and stay fast over a year of per-minute results.
+
+        Args:
+            path (str): SQLite database file
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        # WAL lets --history read while a monitor keeps writing
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(_SCHEMA)
+
+    def record(self, host: str, protocol: str, test_type: str, speed: float, duration: float,
+               bytes_transferred: int, stats: Optional[Dict], timestamp: Optional[float] = None) -> None:
+        """
+        Append one test result.
+
+        Args:
+            host (str): Server the test ran against
+            protocol (str): 'tcp' or 'udp'
+            test_type (str): 'upload' or 'download'
+            speed (float): Speed in Mbps
+            duration (float): Duration in seconds
+            bytes_transferred (int): Bytes transferred; 0 marks a failed test
+            stats (Optional[Dict]): Statistics returned with the result
+            timestamp (Optional[float]): Unix time of the test (default: now)
+        """
+        stats = stats or {}
+        rtt = stats.get('avg_rtt')
+        if rtt is None and 'latency' in stats:
+            rtt = stats['latency']['loaded']['p50']
+        ts = int((timestamp if timestamp is not None else time.time()) * 1000)
+
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                              (host, protocol, test_type, ts, speed, bytes_transferred, duration,
+                               stats.get('packet_loss'), rtt, int(bytes_transferred > 0)))
+            for width in BUCKETS.values():
+                self._rollup(host, protocol, test_type, width, ts // 1000 - (ts // 1000) % width)
+
+    def _rollup(self, host: str, protocol: str, test_type: str, width: int, start: int) -> None:
+        """Recompute the summary row of one bucket from its raw results."""
+        rows = self.conn.execute(
+            'SELECT mbps, loss, rtt, ok FROM results '
+            'WHERE host = ? AND protocol = ? AND test = ? AND ts >= ? AND ts < ?',
+            (host, protocol, test_type, start * 1000, (start + width) * 1000))
+        self.conn.execute('INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                          (host, protocol, test_type, width, start, *summarize_runs(rows)))
+
+    def rebuild_rollups(self) -> None:
+        """Recompute every bucket summary, e.g. after importing raw results."""
+        with self.conn:
+            self.conn.execute('DELETE FROM rollups')
+            for width in BUCKETS.values():
+                buckets = self.conn.execute(
+                    'SELECT DISTINCT host, protocol, test, ts / 1000 - (ts / 1000) % ? FROM results',
+                    (width,)).fetchall()
+                for host, protocol, test_type, start in buckets:
+                    self._rollup(host, protocol, test_type, width, start)
+
+    def aggregate(self, since: float, until: Optional[float] = None,
+                  bucket: str = 'hour') -> List[Dict]:
+        """
+        Return rolling aggregates per series and time bucket.
+
+        Args:
+            since (float): Unix time of the window start
+            until (Optional[float]): Unix time of the window end (default: now)
+            bucket (str): Bucket width, 'hour' or 'day' (UTC-aligned); buckets
+                overlapping the window are returned whole
+
+        Returns:
+            List[Dict]: One entry per series and bucket with the number of runs
+            and failures, p50/p95/mean Mbps, mean loss and p50/p95 RTT over
+            the successful runs
+        """
+        width = BUCKETS[bucket]
+        first = int(since) - int(since) % width
+        last = int(until if until is not None else time.time())
+        cursor = self.conn.execute(
+            f"SELECT host, protocol, test, start, {', '.join(ROLLUP_COLUMNS)} FROM rollups "
+            'WHERE width = ? AND start BETWEEN ? AND ? ORDER BY host, protocol, test, start',
+            (width, first, last))
+        keys = ('host', 'protocol', 'test', 'start') + ROLLUP_COLUMNS
+        return [dict(zip(keys, row)) for row in cursor]
+
+    def close(self) -> None:
+        """Close the database."""
+        self.conn.close()
@@ -0,0 +1,370 @@
+import asyncio
+import heapq
+import itertools
+import random
+import socket
+from typing import Dict, Optional, Tuple
+
+from async_engine import run
+from config import (
+    DEFAULT_IMPAIR_QUEUE,
+    DEFAULT_UDP_RCVBUF,
+    DEFAULT_UDP_SESSION_IDLE,
+    IMPAIR_BUCKET_BYTES,
+    IMPAIR_TCP_CHUNK,
+    IMPAIR_TCP_CHUNKS,
+    IMPAIR_TIMER_SLACK
+)
+
+
+class Impairment:
+    def __init__(self, delay: float = 0.0, jitter: float = 0.0, loss: float = 0.0,
+                 loss_burst: float = 1.0, reorder: float = 0.0, rate: Optional[float] = None,
+                 queue: float = DEFAULT_IMPAIR_QUEUE):
+        """
+        Initialize the impairments applied to each direction of the relay.
+
+        Args:
+            delay (float): One-way delay in seconds
+            jitter (float): Delay variation in seconds, uniform in +/- jitter
+            loss (float): Fraction of datagrams dropped (UDP)
+            loss_burst (float): Mean length of a loss burst in datagrams; 1 drops independently
+            reorder (float): Fraction of datagrams sent without the delay, overtaking
+                earlier ones (UDP, needs a delay)
+            rate (Optional[float]): Rate limit in bits per second
+            queue (float): Seconds of data the rate limiter queues
+        """
+        self.delay = delay
+        self.jitter = jitter
+        self.loss = loss
+        self.loss_burst = max(1.0, loss_burst)
+        self.reorder = reorder
+        self.rate = rate
+        self.queue = queue
+
+    def describe(self) -> str:
+        """Return a short human-readable description."""
+        parts = []
+        if self.delay or self.jitter:
+            parts.append(f"delay {self.delay * 1000:g} ms +/- {self.jitter * 1000:g} ms")
+        if self.loss:
+            burst = f" in bursts of {self.loss_burst:g}" if self.loss_burst > 1 else ''
+            parts.append(f"loss {self.loss * 100:g}%{burst}")
+        if self.reorder:
+            parts.append(f"reorder {self.reorder * 100:g}%")
+        if self.rate:
+            parts.append(f"rate {self.rate / (1024 * 1024):.2f} Mbps "
+                         f"(queue {self.queue * 1000:g} ms)")
+        return ', '.join(parts) or 'no impairment'
+
+
+class LinkModel:
+    def __init__(self, impairment: Impairment, rng: random.Random):
+        """
+        Model one direction of an impaired link.
+
+        The rate limiter is a FIFO token bucket evaluated arithmetically:
+        each packet's departure time follows from the tokens left by the
+        packets before it, so no timer runs per token. Bursty loss follows
+        a two-state Gilbert-Elliott model whose long-run loss rate is the
+        configured fraction.
+
+        Args:
+            impairment (Impairment): Impairments of this direction
+            rng (random.Random): Source of randomness, seeded for repeatable runs
+        """
+        self.impairment = impairment
+        self.rng = rng
+        self.rate = impairment.rate / 8 if impairment.rate else None  # bytes per second
+        self._tokens = float(IMPAIR_BUCKET_BYTES)
+        self._stamp = 0.0  # departure time of the last packet
+        self._in_burst = False
+        loss, burst = impairment.loss, impairment.loss_burst
+        self._leave_burst = 1 / burst
+        self._enter_burst = min(1.0, loss / (burst * (1 - loss))) if burst > 1 and loss < 1 else loss
+
+    def backlog(self, now: float) -> float:
+        """Return the seconds of data queued at the rate limiter."""
+        return max(0.0, self._stamp - now) if self.rate else 0.0
+
+    def deliver_at(self, size: int, now: float, datagram: bool = True) -> Optional[float]:
+        """
+        Decide the fate of one packet entering the link.
+
+        Loss, reordering and queue overflow only apply to datagrams. TCP
+        data is never dropped; its reader pauses on backlog() instead, so
+        the sender sees the rate limit through flow control.
+
+        Args:
+            size (int): Packet size in bytes
+            now (float): Event loop time at which it entered
+            datagram (bool): Whether the packet may be dropped or reordered
+
+        Returns:
+            Optional[float]: Event loop time at which it leaves the link, or None if dropped
+        """
+        impairment = self.impairment
+        if datagram and impairment.loss and self._lost():
+            return None
+
+        departure = now
+        if self.rate:
+            start = max(now, self._stamp)
+            tokens = min(IMPAIR_BUCKET_BYTES, self._tokens + (start - self._stamp) * self.rate)
+            departure = start + max(0.0, size - tokens) / self.rate
+            if datagram and departure - now > impairment.queue:
+                return None  # tail drop
+            self._stamp = departure
+            self._tokens = max(tokens - size, 0.0)
+
+        if datagram and impairment.reorder and self.rng.random() < impairment.reorder:
+            return departure
+        delay = impairment.delay
+        if impairment.jitter:
+            delay = max(0.0, delay + self.rng.uniform(-impairment.jitter, impairment.jitter))
+        return departure + delay
+
+    def _lost(self) -> bool:
+        """Advance the loss model by one datagram and return whether it is dropped."""
+        if self._in_burst:
+            self._in_burst = self.rng.random() >= self._leave_burst
+        else:
+            self._in_burst = self.rng.random() < self._enter_burst
+        return self._in_burst
+
+
+class ImpairmentRelay:
+    def __init__(self, host: str, port: int, target_host: str, target_port: int,
+                 impairment: Impairment, verbose: bool = False, seed: Optional[int] = None):
+        """
+        Initialize a userspace TCP and UDP relay that impairs traffic.
+
+        Clients connect to the relay as if it were the server. Every TCP
+        connection and UDP session is forwarded to the target, with the
+        impairments applied to each direction separately.
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on, for both TCP and UDP
+            target_host (str): Server address
+            target_port (int): Server port
+            impairment (Impairment): Impairments applied to each direction
+            verbose (bool): Report every relayed connection
+            seed (Optional[int]): Seed for repeatable loss, jitter and reordering
+        """
+        self.host = host
+        self.port = port
+        self.target = (target_host, target_port)
+        self.impairment = impairment
+        self.verbose = verbose
+        rng = random.Random(seed)
+        self.uplink = LinkModel(impairment, rng)  # client to server
+        self.downlink = LinkModel(impairment, rng)  # server to client
+        self.stats = {'connections': 0, 'datagrams': 0, 'dropped': 0}
+        # Client address -> [upstream socket, last activity]
+        self._sessions: Dict[Tuple[str, int], list] = {}
+        self._pending = []  # heap of (due, order, socket, datagram, address)
+        self._order = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_due = 0.0
+
+    def start(self) -> None:
+        """Run the relay until interrupted."""
+        try:
+            run(self._serve())
+        except KeyboardInterrupt:
+            print(f"\nRelay shutting down: {self.stats['connections']} TCP connections, "
+                  f"{self.stats['datagrams']} datagrams relayed, {self.stats['dropped']} dropped")
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, DEFAULT_UDP_RCVBUF)
+        self._udp.bind((self.host, self.port))
+        self._udp.setblocking(False)
+        self._loop.add_reader(self._udp, self._on_client_datagrams)
+        self._loop.call_later(DEFAULT_UDP_SESSION_IDLE, self._evict_sessions)
+        print(f"Impairment relay on {self.host}:{self.port} -> {self.target[0]}:{self.target[1]} "
+              f"({self.impairment.describe()})")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._loop.remove_reader(self._udp)
+            self._udp.close()
+            for upstream, _ in self._sessions.values():
+                self._loop.remove_reader(upstream)
+                upstream.close()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        """Relay one TCP connection to the target."""
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(*self.target)
+        except OSError as e:
+            print(f"Cannot reach {self.target[0]}:{self.target[1]}: {e}")
+            writer.close()
+            return
+        self.stats['connections'] += 1
+        if self.verbose:
+            print(f"Relaying TCP connection from {writer.get_extra_info('peername')}")
+
+        def abort() -> None:
+            # One side failed: tear down both rather than leave the other half open
+            writer.transport.abort()
+            upstream_writer.transport.abort()
+
+        await asyncio.gather(self._pipe(reader, upstream_writer, self.uplink, abort),
+                             self._pipe(upstream_reader, writer, self.downlink, abort))
+        writer.close()
+        upstream_writer.close()
+
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                    link: LinkModel, abort) -> None:
+        """Forward one direction of a TCP connection through a link model."""
+        queue: asyncio.Queue = asyncio.Queue(IMPAIR_TCP_CHUNKS)
+        delivery = asyncio.ensure_future(self._deliver(queue, writer, abort))
+        last = 0.0
+        try:
+            while True:
+                data = await reader.read(IMPAIR_TCP_CHUNK)
+                now = self._loop.time()
+                if not data:
+                    break
+                # A byte stream cannot overtake itself, so jitter only ever adds delay
+                last = max(last, link.deliver_at(len(data), now, datagram=False))
+                await queue.put((last, data))
+                excess = link.backlog(self._loop.time()) - link.impairment.queue
+                if excess > 0:
+                    await asyncio.sleep(excess)
+        except OSError:
+            abort()
+        await queue.put((last, b''))
+        await delivery
+
+    @staticmethod
+    async def _deliver(queue: asyncio.Queue, writer: asyncio.StreamWriter, abort) -> None:
+        """
+        Write queued chunks when they are due, then half-close the connection.
+
+        After a write error the queue is still drained, so the reading side
+        never blocks on a full queue while the connection is torn down.
+        """
+        loop = asyncio.get_running_loop()
+        failed = False
+        while True:
+            due, data = await queue.get()
+            if failed:
+                if not data:
+                    return
+                continue
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not data:
+                break
+            try:
+                writer.write(data)
+                await writer.drain()
+            except OSError:
+                failed = True
+                abort()
+        if writer.can_write_eof():
+            writer.write_eof()
+
+    def _on_client_datagrams(self) -> None:
+        """Forward every datagram waiting on the listening socket."""
+        now = self._loop.time()
+        while True:
+            try:
+                data, address = self._udp.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # e.g. ICMP port unreachable from an earlier send to a client
+                continue
+            session = self._sessions.get(address)
+            if session is None:
+                session = self._open_session(address)
+            session[1] = now
+            self._forward(self.uplink, data, session[0], None, now)
+
+    def _on_server_datagrams(self, upstream: socket.socket, address: Tuple[str, int]) -> None:
+        """Forward every datagram the server sent back to one client."""
+        now = self._loop.time()
+        while True:
+            try:
+                data = upstream.recv(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue
+            self._forward(self.downlink, data, self._udp, address, now)
+
+    def _open_session(self, address: Tuple[str, int]) -> list:
+        """Open the upstream socket that carries one client's datagrams."""
+        upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        upstream.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, DEFAULT_UDP_RCVBUF)
+        upstream.connect(self.target)
+        upstream.setblocking(False)
+        self._loop.add_reader(upstream, self._on_server_datagrams, upstream, address)
+        session = self._sessions[address] = [upstream, 0.0]
+        if self.verbose:
+            print(f"Relaying UDP session from {address}")
+        return session
+
+    def _evict_sessions(self) -> None:
+        """Close upstream sockets of clients that went quiet."""
+        cutoff = self._loop.time() - DEFAULT_UDP_SESSION_IDLE
+        for address, (upstream, last) in list(self._sessions.items()):
+            if last < cutoff:
+                self._loop.remove_reader(upstream)
+                upstream.close()
+                del self._sessions[address]
+        self._loop.call_later(DEFAULT_UDP_SESSION_IDLE, self._evict_sessions)
+
+    def _forward(self, link: LinkModel, data: bytes, sock: socket.socket,
+                 address: Optional[Tuple[str, int]], now: float) -> None:
+        """Send a datagram through a link model, now or when it is due."""
+        due = link.deliver_at(len(data), now)
+        if due is None:
+            self.stats['dropped'] += 1
+            return
+        if due <= now and not self._pending:
+            self._send(sock, data, address)
+            return
+        heapq.heappush(self._pending, (due, next(self._order), sock, data, address))
+        if self._timer is None or due < self._timer_due:
+            self._schedule(due)
+
+    def _schedule(self, due: float) -> None:
+        """(Re)arm the single timer that releases pending datagrams."""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_due = due
+        self._timer = self._loop.call_at(due, self._release)
+
+    def _release(self) -> None:
+        """Send every pending datagram that is due."""
+        self._timer = None
+        pending = self._pending
+        horizon = self._loop.time() + IMPAIR_TIMER_SLACK
+        while pending and pending[0][0] <= horizon:
+            _, _, sock, data, address = heapq.heappop(pending)
+            self._send(sock, data, address)
+        if pending:
+            self._schedule(pending[0][0])
+
+    def _send(self, sock: socket.socket, data: bytes, address: Optional[Tuple[str, int]]) -> None:
+        try:
+            if address is None:
+                sock.send(data)
+            else:
+                sock.sendto(data, address)
+            self.stats['datagrams'] += 1
+        except OSError:
+            # A full socket buffer or a closed session drops the datagram, as a NIC queue would
+            self.stats['dropped'] += 1
@@ -0,0 +1,263 @@
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+from config import DEFAULT_STEADY_CV, DEFAULT_STEADY_WINDOW
+from streamstats import LogHistogram, RunningStats
+from utils import format_size
+
+
+class IntervalReporter:
+    def __init__(self, interval: float, label: str = '', live: bool = True,
+                 detector: Optional['SteadyStateDetector'] = None):
+        """
+        Initialize an interval throughput reporter.
+
+        Args:
+            interval (float): Reporting interval in seconds
+            label (str): Prefix for printed interval lines
+            live (bool): Print each interval as it completes
+            detector (Optional[SteadyStateDetector]): Watches completed intervals for a steady rate
+        """
+        self.interval = interval
+        self.label = label
+        self.live = live
+        self.detector = detector
+        self.samples: List[Dict] = []
+        self._start = 0.0
+        self._tick_start = 0.0
+        self._next_tick = 0.0
+        self._last_update = 0.0
+        self._bytes = 0
+
+    def start(self) -> None:
+        """Start the first interval now."""
+        self._start = self._tick_start = time.perf_counter()
+        self._next_tick = self._start + self.interval
+        self._bytes = 0
+
+    @property
+    def settled(self) -> bool:
+        """Whether the detector has seen the rate settle; senders stop early once it has."""
+        return self.detector is not None and self.detector.settled
+
+    def update(self, nbytes: int) -> None:
+        """Account for transferred bytes, closing the interval when it is due."""
+        self._bytes += nbytes
+        now = self._last_update = time.perf_counter()
+        if now >= self._next_tick:
+            self._close_interval(now)
+
+    def finish(self) -> Dict:
+        """
+        Close the final (possibly partial) interval and summarise the run.
+
+        Returns:
+            Dict: Interval samples plus min/mean/max/p95 Mbps across intervals
+        """
+        # A sender that stopped at the steady state may finish long after its last chunk
+        now = self._last_update if self.settled else time.perf_counter()
+        if self.samples and now - self._tick_start < self.interval / 2:
+            # Fold a short trailing fragment into the last interval rather than
+            # reporting a rate measured over a few milliseconds
+            last = self.samples[-1]
+            last['bytes'] += self._bytes
+            last['end'] = now - self._start
+            elapsed = last['end'] - last['start']
+            last['mbps'] = (last['bytes'] * 8) / (1024 * 1024 * elapsed) if elapsed > 0 else 0.0
+        elif self._bytes or not self.samples:
+            self._close_interval(now)
+        return summarize(self.samples)
+
+    def _close_interval(self, now: float) -> None:
+        """Record the interval ending at now and start the next one."""
+        elapsed = now - self._tick_start
+        sample = {
+            'start': self._tick_start - self._start,
+            'end': now - self._start,
+            'bytes': self._bytes,
+            'mbps': (self._bytes * 8) / (1024 * 1024 * elapsed) if elapsed > 0 else 0.0
+        }
+        self.samples.append(sample)
+        if self.detector is not None:
+            self.detector.add(sample)
+
+        if self.live:
+            print(f"{self.label}{format_interval(sample)}")
+
+        self._tick_start = now
+        self._next_tick = now + self.interval
+        self._bytes = 0
+
+
+def format_interval(sample: Dict) -> str:
+    """
+    Format one interval sample as a report line.
+
+    Args:
+        sample (Dict): Interval sample with start, end, bytes and mbps
+
+    Returns:
+        str: Formatted line (e.g., '[  0.00-  1.00 s]  12.00 MB  100.00 Mbps')
+    """
+    return (f"[{sample['start']:6.2f}-{sample['end']:6.2f} s] "
+            f"{format_size(sample['bytes']):>10}  {sample['mbps']:10.2f} Mbps")
+
+
+def summarize(samples: List[Dict]) -> Dict:
+    """
+    Summarise interval samples.
+
+    Args:
+        samples (List[Dict]): Interval samples in time order
+
+    Returns:
+        Dict: The samples plus min/mean/max/stdev/p95 of the interval Mbps
+    """
+    if not samples:
+        return {'samples': [], 'min': 0.0, 'mean': 0.0, 'max': 0.0, 'stdev': 0.0, 'p95': 0.0}
+
+    running = RunningStats()
+    histogram = LogHistogram()
+    for sample in samples:
+        running.add(sample['mbps'])
+        histogram.add(sample['mbps'])
+    return {
+        'samples': samples,
+        'min': running.min,
+        'mean': running.mean,
+        'max': running.max,
+        'stdev': running.stdev,
+        'p95': histogram.percentile(0.95)
+    }
+
+
+def merge(summaries: List[Dict]) -> Dict:
+    """
+    Combine per-stream interval summaries into an aggregate one.
+
+    Streams started together behind a barrier, so samples are aligned by index.
+
+    Args:
+        summaries (List[Dict]): Per-stream summaries from IntervalReporter.finish()
+
+    Returns:
+        Dict: Aggregate summary with per-interval bytes and Mbps summed
+    """
+    merged: List[Dict] = []
+    for summary in summaries:
+        for index, sample in enumerate(summary['samples']):
+            if index == len(merged):
+                merged.append(dict(sample))
+            else:
+                merged[index]['bytes'] += sample['bytes']
+                merged[index]['mbps'] += sample['mbps']
+                merged[index]['end'] = max(merged[index]['end'], sample['end'])
+    return summarize(merged)
+
+
+def coefficient_of_variation(rates: Sequence[float]) -> float:
+    """Return the standard deviation of rates as a percentage of their mean."""
+    running = RunningStats()
+    for rate in rates:
+        running.add(rate)
+    return running.stdev / running.mean * 100 if running.mean > 0 else float('inf')
+
+
+class SteadyStateDetector:
+    def __init__(self, threshold: float = DEFAULT_STEADY_CV, window: int = DEFAULT_STEADY_WINDOW,
+                 omit: float = 0.0):
+        """
+        Initialize a steady-state detector.
+
+        The rate counts as steady once the last window intervals that began
+        after the omitted warm-up vary by no more than threshold percent.
+
+        Args:
+            threshold (float): Coefficient of variation in percent
+            window (int): Consecutive intervals considered
+            omit (float): Seconds at the start of the test that are never considered
+        """
+        self.threshold = threshold
+        self.window = window
+        self.omit = omit
+        self.settled = False
+        self._recent = deque(maxlen=window)
+
+    def add(self, sample: Dict) -> None:
+        """Consider one completed interval sample."""
+        if self.settled or sample['start'] < self.omit:
+            return
+        self._recent.append(sample['mbps'])
+        if (len(self._recent) == self.window
+                and coefficient_of_variation(self._recent) <= self.threshold):
+            self.settled = True
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> 'SteadyStateDetector':
+        """Build a detector from the 'steady' options of a test request."""
+        return cls(float(values.get('cv') or DEFAULT_STEADY_CV),
+                   int(values.get('window') or DEFAULT_STEADY_WINDOW),
+                   float(values.get('omit') or 0))
+
+
+def steady_state(samples: List[Dict], omit: float = 0.0, threshold: Optional[float] = None,
+                 window: int = DEFAULT_STEADY_WINDOW) -> Dict:
+    """
+    Measure the steady-state rate of an interval series.
+
+    Intervals that began in the first omit seconds are dropped. With a
+    threshold, the steady state starts at the first window of intervals
+    whose coefficient of variation is within it; otherwise (or if the
+    rate never settles) it covers every interval after the warm-up.
+
+    Args:
+        samples (List[Dict]): Interval samples in time order
+        omit (float): Warm-up seconds to drop
+        threshold (Optional[float]): Coefficient of variation in percent, or None to skip detection
+        window (int): Consecutive intervals considered by the detection
+
+    Returns:
+        Dict: Steady-state Mbps over the chosen intervals, their start and end,
+        their coefficient of variation, the settings used, and whether and
+        when the rate settled
+    """
+    kept = [sample for sample in samples if sample['start'] >= omit]
+    first = 0
+    settled_at = None
+    if threshold is not None:
+        for index in range(len(kept) - window + 1):
+            if coefficient_of_variation([sample['mbps'] for sample in kept[index:index + window]]) <= threshold:
+                first = index
+                settled_at = kept[index + window - 1]['end']
+                break
+
+    steady = kept[first:]
+    if not steady:
+        return {'mbps': 0.0, 'start': omit, 'end': omit, 'cv': 0.0, 'omit': omit,
+                'threshold': threshold, 'settled': False, 'settled_at': None}
+    elapsed = steady[-1]['end'] - steady[0]['start']
+    total = sum(sample['bytes'] for sample in steady)
+    return {
+        'mbps': (total * 8) / (1024 * 1024 * elapsed) if elapsed > 0 else 0.0,
+        'start': steady[0]['start'],
+        'end': steady[-1]['end'],
+        'cv': coefficient_of_variation([sample['mbps'] for sample in steady]),
+        'omit': omit,
+        'threshold': threshold,
+        'settled': settled_at is not None,
+        'settled_at': settled_at
+    }
+
+
+def create_detector(options: Optional[Dict]) -> Optional[SteadyStateDetector]:
+    """Return a detector for the 'steady' request options, or None when detection is off."""
+    return SteadyStateDetector.from_dict(options) if options else None
+
+
+def create_reporter(interval: Optional[float], label: str = '', live: bool = True,
+                    detector: Optional[SteadyStateDetector] = None) -> Optional[IntervalReporter]:
+    """Return a reporter for a positive interval, or None when reporting is off."""
+    if interval and interval > 0:
+        return IntervalReporter(interval, label, live, detector)
+    return None
@@ -0,0 +1,194 @@
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import DEFAULT_PROBE_INTERVAL
+from framing import (
+    FRAME_END,
+    FRAME_PING,
+    FRAME_REQUEST,
+    MAX_MESSAGE_SIZE,
+    ProtocolError,
+    VERSION,
+    pack_frame,
+    recv_exact,
+    recv_frame,
+    send_message
+)
+from streamstats import LatencyStats
+
+# Ping body: probe sequence number and client send time in nanoseconds
+PING = struct.Struct('!IQ')
+
+
+class LatencyProbe:
+    def __init__(self, host: str, port: int, timeout: float,
+                 interval: float = DEFAULT_PROBE_INTERVAL):
+        """
+        Initialize a TCP ping prober.
+
+        Probes travel on their own connection with Nagle disabled, so they
+        see the same queues as the bulk streams but never wait behind their
+        payload in a socket buffer. Each probe is a 24-byte frame (12-byte
+        header, 12-byte body), so at the default rate of 10 per second they
+        carry about 2 kbit/s each way.
+
+        Args:
+            host (str): Server address
+            port (int): Server port
+            timeout (float): Seconds to wait for an echo before counting it lost
+            interval (float): Seconds between probes
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.interval = interval
+        self.sock: Optional[socket.socket] = None
+        self.lost = 0
+        self._seq = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._rtts: List[float] = []
+
+    def connect(self) -> None:
+        """Open the probe connection and ask the server to echo pings."""
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        send_message(self.sock, FRAME_REQUEST, {'version': VERSION, 'test': 'ping', 'stream': 0})
+
+    def ping(self) -> Optional[float]:
+        """
+        Send one probe and wait for its echo.
+
+        Returns:
+            Optional[float]: Round-trip time in milliseconds, or None if lost
+        """
+        seq = self._seq
+        self._seq += 1
+        sent = time.perf_counter_ns()
+        self.sock.sendall(pack_frame(FRAME_PING, PING.size) + PING.pack(seq, sent))
+        try:
+            # Skip echoes of probes that were already given up on
+            while True:
+                # The timeout only covers the wait for an echo to start, so a
+                # late echo is skipped whole on the next probe
+                readable, _, _ = select.select([self.sock], [], [], self.timeout)
+                if not readable:
+                    self.lost += 1
+                    return None
+                frame_type, length = recv_frame(self.sock)
+                if frame_type != FRAME_PING or length != PING.size:
+                    raise ProtocolError(f"Unexpected frame type {frame_type} on probe connection")
+                echo_seq, echo_sent = PING.unpack(recv_exact(self.sock, length))
+                if echo_seq == seq:
+                    return (time.perf_counter_ns() - echo_sent) / 1e6
+        except socket.timeout:
+            # An echo stalled partway, so the next frame boundary is unknown;
+            # carry on over a fresh connection
+            self.lost += 1
+            self.close()
+            self.connect()
+            return None
+
+    def measure(self, count: int) -> List[float]:
+        """Send count probes at the probe interval and return their RTTs in ms."""
+        rtts = []
+        next_probe = time.perf_counter()
+        for _ in range(count):
+            rtt = self.ping()
+            if rtt is not None:
+                rtts.append(rtt)
+            next_probe = max(next_probe + self.interval, time.perf_counter())
+            time.sleep(max(0.0, next_probe - time.perf_counter()))
+        return rtts
+
+    def start(self) -> None:
+        """Start probing in the background until stop() is called."""
+        self._rtts = []
+        self.lost = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='latency-probe', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        next_probe = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                rtt = self.ping()
+                if rtt is not None:
+                    self._rtts.append(rtt)
+                next_probe = max(next_probe + self.interval, time.perf_counter())
+                self._stop.wait(next_probe - time.perf_counter())
+        except (OSError, ProtocolError) as e:
+            print(f"Latency probe stopped: {e}")
+
+    def stop(self) -> List[float]:
+        """Stop background probing and return the RTTs in ms."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self._rtts
+
+    def close(self) -> None:
+        """Tell the server the probes are done and close the connection."""
+        if self.sock is None:
+            return
+        try:
+            self.sock.sendall(pack_frame(FRAME_END, 0))
+        except OSError:
+            pass
+        self.sock.close()
+        self.sock = None
+
+
+def echo_pings(sock: socket.socket) -> int:
+    """
+    Serve a probe connection, echoing PING frames until the END frame.
+
+    Args:
+        sock (socket.socket): Connected client socket after the REQUEST frame
+
+    Returns:
+        int: Number of probes echoed
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    count = 0
+    while True:
+        frame_type, length = recv_frame(sock)
+        if frame_type == FRAME_END:
+            return count
+        if frame_type != FRAME_PING or length > MAX_MESSAGE_SIZE:
+            raise ProtocolError(f"Unexpected frame type {frame_type} on probe connection")
+        body = recv_exact(sock, length)
+        sock.sendall(pack_frame(FRAME_PING, len(body)) + body)
+        count += 1
+
+
+def summarize_rtts(rtts: List[float], lost: int = 0) -> Dict:
+    """
+    Summarise probe round-trip times.
+
+    Args:
+        rtts (List[float]): Round-trip times in milliseconds
+        lost (int): Probes that timed out
+
+    Returns:
+        Dict: Probe counts plus min/p50/p90/p99/max RTT in milliseconds
+    """
+    latency = LatencyStats()
+    for rtt in rtts:
+        latency.add(rtt)
+    summary = latency.summary()
+    return {
+        'probes': latency.count,
+        'lost': lost,
+        'min': summary['min_rtt'],
+        'p50': summary['p50_rtt'],
+        'p90': summary['p90_rtt'],
+        'p99': summary['p99_rtt'],
+        'max': summary['max_rtt']
+    }
@@ -1,15 +1,161 @@
 import argparse
+import contextlib
 import sys
+import time
 
 from config import (
     DEFAULT_HOST,
     DEFAULT_PORT,
     DEFAULT_BUFFER_SIZE,
     DEFAULT_DATA_SIZE,
-    DEFAULT_TIMEOUT
+    DEFAULT_TIMEOUT,
+    DEFAULT_BACKLOG,
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_PAYLOAD_MODE,
+    DEFAULT_DATAGRAM_SIZE,
+    DEFAULT_PROBE_INTERVAL,
+    DEFAULT_BENCH_OUTPUT,
+    DEFAULT_BENCH_THRESHOLD,
+    DEFAULT_BENCH_TIME,
+    DEFAULT_MONITOR_EVERY,
+    DEFAULT_MONITOR_JITTER,
+    DEFAULT_HISTORY_DB,
+    DEFAULT_HISTORY_SINCE,
+    DEFAULT_HISTORY_BUCKET,
+    DEFAULT_STEADY_CV,
+    DEFAULT_STEADY_WINDOW,
+    DEFAULT_IMPAIR_QUEUE
 )
+from intervals import format_interval
 from network_tester import NetworkSpeedTester
-from utils import format_size
+from output import OUTPUT_FORMATS, build_record, write_csv, write_history, write_json
+from payload import PAYLOAD_MODES
+from sockopts import SocketOptions
+from utils import format_size, parse_address, parse_duration, parse_rate, parse_size
+
+def print_results(direction: str, speed: float, duration: float,
+                  bytes_transferred: int, stats) -> None:
+    """Print the outcome of a single upload or download test."""
+    verb = 'received' if direction == 'Download' else 'sent'
+    
+    # Print per-stream results for parallel TCP tests
+    if stats and 'streams' in stats:
+        for stream in stats['streams']:
+            print(f"  [stream {stream['stream']}] {stream['speed']:.2f} Mbps, "
+                  f"{format_size(stream['bytes'])} in {stream['duration']:.2f} seconds")
+        print(f"  [aggregate] {len(stats['streams'])} streams")
+        if 'intervals' in stats:
+            for sample in stats['intervals']['samples']:
+                print(f"  [aggregate] {format_interval(sample)}")
+    
+    # Print each half of a bidirectional test, then the combined figures
+    if stats and 'directions' in stats:
+        for name, result in stats['directions'].items():
+            print(f"{name.capitalize()} speed: {result['speed']:.2f} Mbps "
+                  f"({format_size(result['bytes'])} in {result['duration']:.2f} seconds)")
+            if 'intervals' in result:
+                intervals = result['intervals']
+                print(f"  {name.capitalize()} interval Mbps: min {intervals['min']:.2f} / "
+                      f"mean {intervals['mean']:.2f} / max {intervals['max']:.2f} / "
+                      f"p95 {intervals['p95']:.2f}")
+            if 'steady' in result:
+                print(f"  {name.capitalize()} {format_steady(result['steady'])}")
+        verb = 'transferred'
+    
+    print(f"{direction} speed: {speed:.2f} Mbps")
+    print(f"Data {verb}: {format_size(bytes_transferred)}")
+    print(f"Duration: {duration:.2f} seconds")
+    if stats and 'steady' in stats:
+        print(f"{direction} {format_steady(stats['steady'])}")
+    
+    # Print UDP-specific statistics if available
+    if stats and 'packet_loss' in stats:
+        if 'reverse_loss' in stats:
+            print(f"Packet loss: {stats['packet_loss']:.2f}% forward "
+                  f"({stats['server_received']} of {stats['packets_sent']} datagrams received) / "
+                  f"{stats['reverse_loss']:.2f}% of ACKs lost on the way back")
+            print(f"Forward path: {stats['reordered']} reordered, {stats['duplicates']} duplicate, "
+                  f"{stats['late']} too late to classify")
+        else:
+            print(f"Packet loss: {stats['packet_loss']:.2f}% (round trip; the server sent no results)")
+        if stats.get('send_errors'):
+            print(f"Send errors: {stats['send_errors']} datagrams refused by the local socket "
+                  f"(never sent, not counted as loss)")
+        print(f"Average RTT: {stats['avg_rtt']:.2f} ms")
+        print(f"Jitter: {stats['jitter']:.2f} ms")
+        if 'forward_delay' in stats:
+            print(f"One-way delay: forward {stats['forward_delay']:.2f} ms "
+                  f"(jitter {stats['forward_jitter']:.2f}) / reverse {stats['reverse_delay']:.2f} ms "
+                  f"(jitter {stats['reverse_jitter']:.2f}), clock offset {stats['clock_offset']:.2f} "
+                  f"+/- {stats['clock_offset_error']:.2f} ms")
+            print("  (the split assumes the fastest round trip was symmetric; "
+                  "a fixed path asymmetry shows up as clock offset)")
+        if 'p50_rtt' in stats:
+            print(f"RTT percentiles: p50 {stats['p50_rtt']:.2f} / p90 {stats['p90_rtt']:.2f} / "
+                  f"p99 {stats['p99_rtt']:.2f} / p99.9 {stats['p999_rtt']:.2f} ms")
+        if 'requested_mbps' in stats:
+            print(f"Send rate: {stats['achieved_mbps']:.2f} Mbps achieved / "
+                  f"{stats['requested_mbps']:.2f} Mbps requested")
+    
+    # Print idle vs. loaded RTT if latency probing was on
+    if stats and 'latency' in stats:
+        for phase in ('idle', 'loaded'):
+            rtt = stats['latency'][phase]
+            print(f"RTT {phase}: p50 {rtt['p50']:.2f} / p90 {rtt['p90']:.2f} / "
+                  f"p99 {rtt['p99']:.2f} ms ({rtt['probes']} probes, {rtt['lost']} lost)")
+        print(f"Latency under load: {stats['latency']['delta_ms']:+.2f} ms (p50)")
+    
+    # Print the kernel's view of each sending side if TCP_INFO was sampled
+    if stats and stats.get('tcp_info'):
+        for side, info in stats['tcp_info'].items():
+            if not info or not info.get('segments_out'):
+                continue
+            print(f"TCP {side} send: {info['retransmits']} retransmits of {info['segments_out']} segments, "
+                  f"cwnd max {info['cwnd_max']}, kernel RTT min {info['rtt_min']:.2f} / "
+                  f"mean {info['rtt_mean']:.2f} / max {info['rtt_max']:.2f} ms")
+            print(f"  Limited by rwnd {info['rwnd_limited_pct']:.1f}% / sndbuf "
+                  f"{info['sndbuf_limited_pct']:.1f}% of busy time; app-limited in "
+                  f"{info['app_limited_samples_pct']:.1f}% of samples; likely limit: {info['likely_limit']}")
+    
+    # Print the spread of interval throughput if interval reporting was on
+    if stats and 'intervals' in stats:
+        intervals = stats['intervals']
+        print(f"Interval Mbps: min {intervals['min']:.2f} / mean {intervals['mean']:.2f} / "
+              f"max {intervals['max']:.2f} / p95 {intervals['p95']:.2f}")
+
+def format_steady(steady) -> str:
+    """Format steady-state figures as a report line following the direction name."""
+    if steady['end'] <= steady['start']:
+        return "steady-state speed: no intervals after the warm-up"
+    if steady['settled']:
+        outcome = f"settled at {steady['settled_at']:.2f} s"
+    elif steady['threshold'] is not None:
+        outcome = f"did not settle within {steady['threshold']:g}%"
+    else:
+        outcome = f"first {steady['omit']:g} s omitted"
+    return (f"steady-state speed: {steady['mbps']:.2f} Mbps over {steady['start']:.2f}-"
+            f"{steady['end']:.2f} s (CV {steady['cv']:.1f}%, {outcome})")
+
+def print_history(rows) -> None:
+    """Print history aggregates as one table per host, protocol and test."""
+    if not rows:
+        print("No results in this window")
+        return
+    
+    def value(number, width: int) -> str:
+        return f"{number:{width}.2f}" if number is not None else f"{'-':>{width}}"
+    
+    series = None
+    for row in rows:
+        if (row['host'], row['protocol'], row['test']) != series:
+            series = (row['host'], row['protocol'], row['test'])
+            print(f"\n{row['host']} {row['protocol'].upper()} {row['test']}")
+            print(f"{'Start (UTC)':<17} {'Runs':>5} {'Fail':>5} {'p50 Mbps':>10} {'p95 Mbps':>10} "
+                  f"{'Loss %':>7} {'p50 RTT':>8} {'p95 RTT':>8}")
+        start = time.strftime('%Y-%m-%d %H:%M', time.gmtime(row['start']))
+        print(f"{start:<17} {row['runs']:>5} {row['failed']:>5} {value(row['p50_mbps'], 10)} "
+              f"{value(row['p95_mbps'], 10)} {value(row['loss'], 7)} "
+              f"{value(row['p50_rtt'], 8)} {value(row['p95_rtt'], 8)}")
 
 def main():
     """Main entry point for the network speed tester."""
@@ -19,73 +165,248 @@ def main():
     mode_group = parser.add_mutually_exclusive_group(required=True)
     mode_group.add_argument('-s', '--server', action='store_true', help='Run in server mode')
     mode_group.add_argument('-c', '--client', action='store_true', help='Run in client mode')
+    mode_group.add_argument('--self-bench', action='store_true', help='Benchmark the tester itself over loopback')
+    mode_group.add_argument('--monitor', action='store_true', help='Run client tests on a schedule and record them in the history database')
+    mode_group.add_argument('--history', action='store_true', help='Show hourly or daily aggregates from the history database')
+    mode_group.add_argument('--impair', action='store_true', help='Run a relay to --target that delays, drops, reorders and rate-limits traffic')
+    mode_group.add_argument('--impair-bench', action='store_true', help='Check measured speed, RTT, jitter and loss against impairments injected by a local relay')
     
     # Network settings
     parser.add_argument('-H', '--host', default=DEFAULT_HOST, help=f'Host address (default: {DEFAULT_HOST})')
     parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT, help=f'Port number (default: {DEFAULT_PORT})')
-    parser.add_argument('-b', '--buffer', type=int, default=DEFAULT_BUFFER_SIZE, help=f'Buffer size in bytes (default: {DEFAULT_BUFFER_SIZE})')
+    parser.add_argument('-b', '--buffer', type=int, default=None, help=f'Buffer size in bytes (default: {DEFAULT_BUFFER_SIZE})')
     parser.add_argument('-d', '--data-size', type=int, default=DEFAULT_DATA_SIZE, help=f'Data size in bytes (default: {format_size(DEFAULT_DATA_SIZE)})')
     parser.add_argument('-t', '--timeout', type=int, default=DEFAULT_TIMEOUT, help=f'Timeout in seconds (default: {DEFAULT_TIMEOUT})')
     parser.add_argument('-P', '--protocol', choices=['tcp', 'udp'], default='tcp', help='Protocol to use (default: tcp)')
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads', help='I/O engine; asyncio uses uvloop when installed (default: threads)')
+    parser.add_argument('--payload', choices=PAYLOAD_MODES, default=DEFAULT_PAYLOAD_MODE, help=f'Test data content (default: {DEFAULT_PAYLOAD_MODE})')
+    parser.add_argument('--datagram-size', type=int, default=DEFAULT_DATAGRAM_SIZE, help=f'UDP datagram size in bytes, up to 65507 (default: {DEFAULT_DATAGRAM_SIZE})')
+    parser.add_argument('--interval', type=float, default=None, help='Report throughput every this many seconds')
+    parser.add_argument('--workers', type=int, default=1, help='Server processes sharing the port with SO_REUSEPORT, or client processes to spread --streams over (default: 1)')
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose output')
     
+    # Socket options, on both client and server
+    socket_group = parser.add_argument_group('Socket options')
+    socket_group.add_argument('--sndbuf', type=parse_size, default=None, help='SO_SNDBUF size, with optional K/M/G suffix (default: kernel)')
+    socket_group.add_argument('--rcvbuf', type=parse_size, default=None, help='SO_RCVBUF size, with optional K/M/G suffix (default: kernel)')
+    socket_group.add_argument('--nodelay', action='store_true', help='Set TCP_NODELAY on TCP sockets')
+    socket_group.add_argument('--congestion', default=None, help='TCP congestion control algorithm, e.g. cubic or bbr (Linux)')
+    socket_group.add_argument('--profile', default=None, help='Load buffer size and socket options from a saved autotune profile')
+    
+    # Server options
+    server_group = parser.add_argument_group('Server options')
+    server_group.add_argument('--backlog', type=int, default=DEFAULT_BACKLOG, help=f'TCP listen backlog (default: {DEFAULT_BACKLOG})')
+    server_group.add_argument('--max-sessions', type=int, default=DEFAULT_MAX_SESSIONS, help=f'Maximum concurrent TCP sessions (default: {DEFAULT_MAX_SESSIONS})')
+    server_group.add_argument('--sendfile', action='store_true', help='Serve TCP download tests from a tmpfs file with sendfile()')
+    server_group.add_argument('--metrics-port', type=int, default=None, help='Serve Prometheus metrics over HTTP on this port; with --workers, worker i uses this port + i')
+    
     # Client options
     client_group = parser.add_argument_group('Client options')
     client_group.add_argument('--download', action='store_true', help='Test download speed')
     client_group.add_argument('--upload', action='store_true', help='Test upload speed')
     client_group.add_argument('--both', action='store_true', help='Test both download and upload speeds')
+    client_group.add_argument('--bidir', action='store_true', help='Test download and upload at the same time over one TCP connection')
+    client_group.add_argument('--time', type=float, default=None, help='Run each test for this many seconds instead of a fixed data size')
+    client_group.add_argument('-B', '--bandwidth', type=parse_rate, default=None, help='Target UDP send rate in bits/s, with optional K/M/G suffix (e.g. 200M)')
+    client_group.add_argument('--latency', action='store_true', help='Measure idle and loaded RTT with ping probes during TCP tests')
+    client_group.add_argument('--probe-interval', type=float, default=DEFAULT_PROBE_INTERVAL, help=f'Seconds between latency probes (default: {DEFAULT_PROBE_INTERVAL})')
+    client_group.add_argument('--omit', type=float, default=0.0, help='Leave the first N seconds of each test out of the steady-state speed (default: 0)')
+    client_group.add_argument('--steady', action='store_true', help='Detect the steady state from interval rates and, with --time, stop TCP tests once it is reached')
+    client_group.add_argument('--steady-cv', type=float, default=DEFAULT_STEADY_CV, help=f'Coefficient of variation, in percent, over {DEFAULT_STEADY_WINDOW} intervals that counts as steady (default: {DEFAULT_STEADY_CV:g})')
+    client_group.add_argument('--no-tcp-info', action='store_true', help='Do not sample TCP_INFO (retransmits, cwnd, kernel RTT) on either end during TCP tests')
+    client_group.add_argument('--autotune', action='store_true', help='Sweep buffer and socket buffer sizes and report the fastest setting')
+    client_group.add_argument('--save-profile', default=None, help='Save the autotune result as a profile JSON file')
+    client_group.add_argument('--format', choices=OUTPUT_FORMATS, default='text', help='Format of client and --history results; json and csv go to stdout with progress on stderr (default: text)')
+    client_group.add_argument('--streams', type=int, default=1, help='Number of parallel TCP streams or UDP probes (default: 1)')
+    
+    # Monitoring options
+    monitor_group = parser.add_argument_group('Monitoring options')
+    monitor_group.add_argument('--every', type=parse_duration, default=DEFAULT_MONITOR_EVERY, help=f'Time between monitoring rounds, e.g. 60s or 5m (default: {DEFAULT_MONITOR_EVERY:g}s)')
+    monitor_group.add_argument('--jitter', type=parse_duration, default=DEFAULT_MONITOR_JITTER, help=f'Maximum random delay added to each round (default: {DEFAULT_MONITOR_JITTER:g}s)')
+    monitor_group.add_argument('--rounds', type=int, default=None, help='Stop monitoring after this many rounds (default: run until interrupted)')
+    monitor_group.add_argument('--history-db', default=DEFAULT_HISTORY_DB, help=f'SQLite results history (default: {DEFAULT_HISTORY_DB})')
+    monitor_group.add_argument('--since', type=parse_duration, default=parse_duration(DEFAULT_HISTORY_SINCE), help=f'Window shown by --history, e.g. 24h, 7d or 52w (default: {DEFAULT_HISTORY_SINCE})')
+    monitor_group.add_argument('--bucket', choices=['hour', 'day'], default=DEFAULT_HISTORY_BUCKET, help=f'Aggregation bucket for --history (default: {DEFAULT_HISTORY_BUCKET})')
+    
+    # Impairment relay options, applied to each direction
+    impair_group = parser.add_argument_group('Impairment relay options')
+    impair_group.add_argument('--target', type=parse_address, default=None, help='Server the relay forwards to, as host:port')
+    impair_group.add_argument('--impair-delay', type=float, default=0.0, help='One-way delay in ms (default: 0)')
+    impair_group.add_argument('--impair-jitter', type=float, default=0.0, help='Random delay variation in +/- ms (default: 0)')
+    impair_group.add_argument('--impair-loss', type=float, default=0.0, help='Percent of UDP datagrams dropped (default: 0)')
+    impair_group.add_argument('--impair-burst', type=float, default=1.0, help='Mean loss burst length in datagrams; 1 drops independently (default: 1)')
+    impair_group.add_argument('--impair-reorder', type=float, default=0.0, help='Percent of UDP datagrams that skip the delay and overtake earlier ones (default: 0)')
+    impair_group.add_argument('--impair-rate', type=parse_rate, default=None, help='Token-bucket rate limit in bits/s, with optional K/M/G suffix (default: unlimited)')
+    impair_group.add_argument('--impair-queue', type=float, default=DEFAULT_IMPAIR_QUEUE * 1000, help=f'Rate limiter queue in ms before datagrams are dropped (default: {DEFAULT_IMPAIR_QUEUE * 1000:g})')
+    impair_group.add_argument('--impair-seed', type=int, default=None, help='Seed for repeatable loss, jitter and reordering')
+    
+    # Self-benchmark options
+    bench_group = parser.add_argument_group('Self-benchmark options')
+    bench_group.add_argument('--bench-output', default=DEFAULT_BENCH_OUTPUT, help=f'JSON file for benchmark results (default: {DEFAULT_BENCH_OUTPUT})')
+    bench_group.add_argument('--bench-time', type=float, default=DEFAULT_BENCH_TIME, help=f'Seconds of traffic per benchmark case (default: {DEFAULT_BENCH_TIME})')
+    bench_group.add_argument('--baseline', default=None, help='Earlier benchmark JSON to compare against')
+    bench_group.add_argument('--threshold', type=float, default=DEFAULT_BENCH_THRESHOLD * 100, help=f'Percent change flagged as a regression (default: {DEFAULT_BENCH_THRESHOLD * 100:g})')
     
     args = parser.parse_args()
+    if args.bidir and args.protocol != 'tcp':
+        parser.error("--bidir requires TCP")
+    if args.steady and args.protocol != 'tcp':
+        parser.error("--steady requires TCP")
+    
+    if args.impair:
+        if args.target is None:
+            parser.error("--impair requires --target")
+        from impair import Impairment, ImpairmentRelay
+        impairment = Impairment(
+            delay=args.impair_delay / 1000,
+            jitter=args.impair_jitter / 1000,
+            loss=args.impair_loss / 100,
+            loss_burst=args.impair_burst,
+            reorder=args.impair_reorder / 100,
+            rate=args.impair_rate,
+            queue=args.impair_queue / 1000
+        )
+        ImpairmentRelay(args.host, args.port, *args.target, impairment, args.verbose,
+                        args.impair_seed).start()
+        return
+    
+    if args.impair_bench:
+        from accuracy import accuracy_bench
+        sys.exit(0 if accuracy_bench(verbose=args.verbose) else 1)
+    
+    if args.self_bench:
+        # Imported here so normal runs do not pay for it
+        from selfbench import self_bench
+        ok = self_bench(args.bench_output, args.baseline, args.threshold / 100,
+                        args.bench_time, args.verbose)
+        sys.exit(0 if ok else 1)
+    
+    if args.history:
+        from history import HistoryStore
+        store = HistoryStore(args.history_db)
+        rows = store.aggregate(time.time() - args.since, bucket=args.bucket)
+        store.close()
+        if args.format == 'text':
+            print_history(rows)
+        else:
+            write_history(rows, args.format, sys.stdout)
+        return
+    
+    # Explicit flags override a loaded profile, which overrides the defaults
+    profile = {}
+    if args.profile:
+        from autotune import load_profile
+        profile = load_profile(args.profile)
+    buffer_size = args.buffer or profile.get('buffer_size') or DEFAULT_BUFFER_SIZE
+    socket_options = SocketOptions(
+        sndbuf=args.sndbuf,
+        rcvbuf=args.rcvbuf,
+        nodelay=args.nodelay,
+        congestion=args.congestion
+    ).merged(SocketOptions.from_dict(profile.get('socket', {})))
+    
+    if args.client and args.autotune:
+        from autotune import autotune, save_profile
+        test_type = 'upload' if args.upload and not (args.download or args.both) else 'download'
+        result = autotune(args.host, args.port, args.timeout, test_type, socket_options,
+                          args.engine, args.streams, verbose=args.verbose)
+        chosen = SocketOptions.from_dict(result['socket'])
+        print(f"\nBest setting: buffer {format_size(result['buffer_size'])}, "
+              f"{chosen.describe()} ({result['mbps']:.2f} Mbps steady state)")
+        if args.save_profile:
+            save_profile(args.save_profile, result)
+            print(f"Profile saved to {args.save_profile}; use it with --profile {args.save_profile}")
+        return
     
     # Initialize the speed tester
     tester = NetworkSpeedTester(
         host=args.host,
         port=args.port,
-        buffer_size=args.buffer,
+        buffer_size=buffer_size,
         data_size=args.data_size,
         timeout=args.timeout,
         protocol=args.protocol,
-        verbose=args.verbose
+        verbose=args.verbose,
+        backlog=args.backlog,
+        max_sessions=args.max_sessions,
+        streams=args.streams,
+        use_sendfile=args.sendfile,
+        payload_mode=args.payload,
+        test_duration=args.time,
+        interval=args.interval,
+        datagram_size=args.datagram_size,
+        bandwidth=args.bandwidth,
+        engine=args.engine,
+        latency=args.latency,
+        probe_interval=args.probe_interval,
+        socket_options=socket_options,
+        workers=args.workers,
+        metrics_port=args.metrics_port,
+        tcp_info=not args.no_tcp_info,
+        omit=args.omit,
+        steady_cv=args.steady_cv if args.steady else None
     )
     
     try:
         if args.server:
             # Start server mode
             tester.start_server()
+        elif args.monitor:
+            from history import HistoryStore
+            from monitor import run_monitor
+            tests = [test for test in ('download', 'upload')
+                     if getattr(args, test) or args.both or not (args.download or args.upload or args.bidir)]
+            if args.bidir:
+                tests.append('bidir')
+            store = HistoryStore(args.history_db)
+            try:
+                run_monitor(tester, tests, store, args.every, args.jitter, args.rounds)
+            finally:
+                store.close()
         elif args.client:
             # If no specific test type is selected, test both
-            if not (args.download or args.upload or args.both):
+            if not (args.download or args.upload or args.both or args.bidir):
                 args.both = True
             
-            print(f"Connecting to {args.host}:{args.port} using {args.protocol.upper()}...")
-            
-            # Run download test
-            if args.download or args.both:
-                print(f"\nTesting download speed...")
-                speed, duration, bytes_received, stats = tester.run_client_test('download')
-                print(f"Download speed: {speed:.2f} Mbps")
-                print(f"Data received: {format_size(bytes_received)}")
-                print(f"Duration: {duration:.2f} seconds")
+            # Machine-readable output owns stdout; progress messages move to stderr
+            results_stream = sys.stdout
+            records = []
+            with contextlib.ExitStack() as stack:
+                if args.format != 'text':
+                    stack.enter_context(contextlib.redirect_stdout(sys.stderr))
                 
-                # Print UDP-specific statistics if available
-                if stats:
-                    print(f"Packet loss: {stats['packet_loss']:.2f}%")
-                    print(f"Average RTT: {stats['avg_rtt']:.2f} ms")
-                    print(f"Jitter: {stats['jitter']:.2f} ms")
-            
-            # Run upload test
-            if args.upload or args.both:
-                print(f"\nTesting upload speed...")
-                speed, duration, bytes_sent, stats = tester.run_client_test('upload')
-                print(f"Upload speed: {speed:.2f} Mbps")
-                print(f"Data sent: {format_size(bytes_sent)}")
-                print(f"Duration: {duration:.2f} seconds")
+                print(f"Connecting to {args.host}:{args.port} using {args.protocol.upper()}...")
                 
-                # Print UDP-specific statistics if available
-                if stats:
-                    print(f"Packet loss: {stats['packet_loss']:.2f}%")
-                    print(f"Average RTT: {stats['avg_rtt']:.2f} ms")
-                    print(f"Jitter: {stats['jitter']:.2f} ms")
+                # Run download test
+                if args.download or args.both:
+                    print(f"\nTesting download speed...")
+                    speed, duration, bytes_received, stats = tester.run_client_test('download')
+                    records.append(build_record('download', speed, duration, bytes_received, stats))
+                    if args.format == 'text':
+                        print_results('Download', speed, duration, bytes_received, stats)
+                
+                # Run upload test
+                if args.upload or args.both:
+                    print(f"\nTesting upload speed...")
+                    speed, duration, bytes_sent, stats = tester.run_client_test('upload')
+                    records.append(build_record('upload', speed, duration, bytes_sent, stats))
+                    if args.format == 'text':
+                        print_results('Upload', speed, duration, bytes_sent, stats)
+                
+                # Run both directions at once
+                if args.bidir:
+                    print("\nTesting download and upload speed at the same time...")
+                    speed, duration, bytes_transferred, stats = tester.run_client_test('bidir')
+                    records.append(build_record('bidir', speed, duration, bytes_transferred, stats))
+                    if args.format == 'text':
+                        print_results('Combined', speed, duration, bytes_transferred, stats)
+            
+            if args.format == 'json':
+                run = {'host': args.host, 'port': args.port, 'protocol': args.protocol,
+                       'engine': args.engine, 'streams': args.streams}
+                write_json(run, records, results_stream)
+            elif args.format == 'csv':
+                write_csv(records, results_stream)
                 
     except KeyboardInterrupt:
         print("\nExiting...")
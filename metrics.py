@@ -0,0 +1,189 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Sequence, Tuple
+
+from config import METRICS_DURATION_BUCKETS
+
+Labels = Tuple[str, ...]
+
+
+class _Metric:
+    """
+    Base class for metrics whose values are sharded per thread.
+
+    Each thread updates its own dict without taking a lock; only the first
+    update from a new thread registers its shard. A scrape sums the shards,
+    so instrumentation costs a dict update and nothing more on the hot path.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _snapshots(self) -> List[Dict]:
+        with self._lock:
+            shards = list(self._shards)
+        # Copying a dict is atomic under the GIL, so owners can keep writing
+        return [dict(shard) for shard in shards]
+
+    def _format_labels(self, labels: Labels, extra: str = '') -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.label_names, labels)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self) -> List[str]:
+        """Return the metric in Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        totals: Dict[Labels, float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        for labels in sorted(totals):
+            lines.append(f"{self.name}{self._format_labels(labels)} {totals[labels]}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Add amount to the counter for the given label values."""
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        """Subtract amount from the gauge for the given label values."""
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = METRICS_DURATION_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation for the given label values."""
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # Per-bucket counts (the last one is +Inf), sum, count
+            entry = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        totals: Dict[Labels, list] = {}
+        for shard in self._snapshots():
+            for labels, (counts, total, count) in shard.items():
+                merged = totals.setdefault(labels, [[0] * len(counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+
+        for labels in sorted(totals):
+            counts, total, count = totals[labels]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                bucket_labels = self._format_labels(labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        """Initialize an empty metric registry."""
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add a metric to the registry and return it."""
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Return every registered metric in Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+active_sessions = registry.register(Gauge(
+    'nst_active_sessions', 'Test sessions currently in progress', ('protocol',)))
+sessions_total = registry.register(Counter(
+    'nst_sessions_total', 'Test sessions completed', ('protocol', 'test')))
+bytes_total = registry.register(Counter(
+    'nst_bytes_total', 'Bytes transferred by test sessions, as seen by the server',
+    ('protocol', 'direction')))
+session_duration = registry.register(Histogram(
+    'nst_session_duration_seconds', 'Duration of test sessions', ('protocol',)))
+errors_total = registry.register(Counter(
+    'nst_errors_total', 'Test sessions that ended with an error', ('protocol',)))
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        # Scrapes every few seconds would drown out the test server's output
+        pass
+
+
+def start_metrics_server(host: str, port: int) -> ThreadingHTTPServer:
+    """
+    Serve the registry over HTTP on a background thread.
+
+    Args:
+        host (str): Address to bind
+        port (int): Port to bind
+
+    Returns:
+        ThreadingHTTPServer: The running server
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+    thread.start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return server
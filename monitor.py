@@ -0,0 +1,51 @@
+import random
+import time
+from typing import List, Optional
+
+from config import DEFAULT_MONITOR_EVERY, DEFAULT_MONITOR_JITTER
+from history import HistoryStore
+from network_tester import NetworkSpeedTester
+
+
+def run_monitor(tester: NetworkSpeedTester, tests: List[str], store: HistoryStore,
+                every: float = DEFAULT_MONITOR_EVERY, jitter: float = DEFAULT_MONITOR_JITTER,
+                rounds: Optional[int] = None) -> None:
+    """
+    Run tests on a fixed cadence and append every result to a history store.
+
+    One process and one tester are kept for the whole run, so interpreter
+    startup and payload generation are paid once instead of per round.
+    Rounds are scheduled from a fixed start so they do not drift; each is
+    delayed by a random 0..jitter seconds so many monitors do not hit a
+    server in lockstep. A round that overruns skips the slots it missed.
+
+    Args:
+        tester (NetworkSpeedTester): Client to run the tests with
+        tests (List[str]): Test types to run each round ('download', 'upload')
+        store (HistoryStore): Where results are appended
+        every (float): Seconds between rounds
+        jitter (float): Maximum random delay added to each round, in seconds
+        rounds (Optional[int]): Stop after this many rounds (default: run until interrupted)
+    """
+    print(f"Monitoring {tester.host}:{tester.port} ({tester.protocol.upper()} "
+          f"{', '.join(tests)}) every {every:g} s, results in {store.path}")
+
+    start = time.monotonic()
+    completed = 0
+    while rounds is None or completed < rounds:
+        delay = start + completed * every + random.uniform(0, jitter) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        for test_type in tests:
+            speed, duration, transferred, stats = tester.run_client_test(test_type)
+            store.record(tester.host, tester.protocol, test_type, speed, duration, transferred, stats)
+            status = f"{speed:.2f} Mbps" if transferred else 'failed'
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {test_type:<8} {status}")
+
+        completed += 1
+        # Skip slots that already passed while this round was running
+        behind = int((time.monotonic() - start) / every) - completed
+        if behind > 0:
+            print(f"Round overran its slot; skipping {behind} round(s)")
+            start += behind * every
@@ -1,12 +1,37 @@
 import threading
-from typing import Tuple, Dict, Optional
+from typing import Tuple, Dict, List, Optional
 
+from config import (
+    DEFAULT_BACKLOG,
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_PAYLOAD_MODE,
+    DEFAULT_DATAGRAM_SIZE,
+    DEFAULT_IDLE_PROBES,
+    DEFAULT_PROBE_INTERVAL,
+    DEFAULT_STEADY_INTERVAL
+)
+from framing import ProtocolError
+from intervals import merge, steady_state
+from latency import LatencyProbe, summarize_rtts
+from metrics import start_metrics_server
+from sockopts import SocketOptions
 from tcp_handler import TCPHandler
+from tcpinfo import merge_summaries
 from udp_handler import UDPHandler
+from workers import run_client_workers, serve_workers
 
 class NetworkSpeedTester:
     def __init__(self, host: str, port: int, buffer_size: int, data_size: int,
-                 timeout: int, protocol: str = 'tcp', verbose: bool = False):
+                 timeout: int, protocol: str = 'tcp', verbose: bool = False,
+                 backlog: int = DEFAULT_BACKLOG, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 streams: int = 1, use_sendfile: bool = False,
+                 payload_mode: str = DEFAULT_PAYLOAD_MODE, test_duration: Optional[float] = None,
+                 interval: Optional[float] = None, datagram_size: int = DEFAULT_DATAGRAM_SIZE,
+                 bandwidth: Optional[float] = None, engine: str = 'threads',
+                 latency: bool = False, probe_interval: float = DEFAULT_PROBE_INTERVAL,
+                 socket_options: Optional[SocketOptions] = None, workers: int = 1,
+                 metrics_port: Optional[int] = None, tcp_info: bool = True,
+                 omit: float = 0.0, steady_cv: Optional[float] = None):
         """
         Initialize Network Speed Tester.
         
@@ -18,6 +43,25 @@ class NetworkSpeedTester:
             timeout (int): Socket timeout in seconds
             protocol (str): Protocol to use ('tcp' or 'udp')
             verbose (bool): Enable verbose output
+            backlog (int): Pending connection queue length (TCP server)
+            max_sessions (int): Maximum concurrent TCP sessions (TCP server)
+            streams (int): Number of parallel TCP connections or UDP probes per client test
+            use_sendfile (bool): Serve TCP download tests with sendfile() (TCP server)
+            payload_mode (str): Test data content ('random', 'zeros' or 'pattern')
+            test_duration (Optional[float]): Run time-bounded tests of this many seconds
+            interval (Optional[float]): Report throughput every this many seconds
+            datagram_size (int): UDP datagram size in bytes
+            bandwidth (Optional[float]): Target UDP send rate in bits per second
+            engine (str): I/O engine ('threads' for blocking sockets or 'asyncio')
+            latency (bool): Measure idle and loaded RTT with ping probes during TCP tests
+            probe_interval (float): Seconds between latency probes
+            socket_options (Optional[SocketOptions]): Kernel socket options for test sockets
+            workers (int): Server processes sharing the port, or client processes the streams are spread over
+            metrics_port (Optional[int]): Serve Prometheus metrics on this port (server)
+            tcp_info (bool): Sample TCP_INFO on both ends of TCP tests (Linux)
+            omit (float): Warm-up seconds left out of the steady-state figures
+            steady_cv (Optional[float]): Detect the steady state as the first intervals varying by
+                no more than this many percent, stopping time-bounded TCP tests there
         """
         self.host = host
         self.port = port
@@ -26,32 +70,70 @@ class NetworkSpeedTester:
         self.timeout = timeout
         self.protocol = protocol.lower()
         self.verbose = verbose
+        self.streams = max(1, streams)
+        self.workers = max(1, workers)
+        self.metrics_port = metrics_port
+        self.engine = engine.lower()
+        self.latency = latency and self.protocol == 'tcp'
+        self.probe_interval = probe_interval
+        self.omit = max(0.0, omit)
+        self.steady_cv = steady_cv
         self.stop_event = threading.Event()
+        
+        # Steady-state figures are computed from the interval series
+        if (self.omit or steady_cv is not None) and not interval:
+            interval = DEFAULT_STEADY_INTERVAL
+
+        # The asyncio engine is only imported when selected
+        if self.engine == 'asyncio':
+            from async_engine import AsyncTCPHandler as tcp_class, AsyncUDPHandler as udp_class
+        else:
+            tcp_class, udp_class = TCPHandler, UDPHandler
 
         # Initialize the appropriate handler based on protocol
         if self.protocol == 'tcp':
-            self.handler = TCPHandler(
+            self.handler = tcp_class(
                 host=host,
                 port=port,
                 buffer_size=buffer_size,
                 data_size=data_size,
                 timeout=timeout,
-                verbose=verbose
+                verbose=verbose,
+                backlog=backlog,
+                max_sessions=max_sessions,
+                use_sendfile=use_sendfile,
+                payload_mode=payload_mode,
+                test_duration=test_duration,
+                interval=interval,
+                socket_options=socket_options,
+                tcp_info=tcp_info,
+                steady_cv=steady_cv,
+                omit=self.omit
             )
         else:
-            self.handler = UDPHandler(
+            self.handler = udp_class(
                 host=host,
                 port=port,
                 buffer_size=buffer_size,
                 data_size=data_size,
                 timeout=timeout,
-                verbose=verbose
+                verbose=verbose,
+                test_duration=test_duration,
+                interval=interval,
+                datagram_size=datagram_size,
+                bandwidth=bandwidth,
+                socket_options=socket_options
             )
 
     def start_server(self) -> None:
         """Start the speed test server."""
         try:
-            self.handler.start_server()
+            if self.workers > 1:
+                serve_workers(self.handler, self.workers, self.metrics_port)
+            else:
+                if self.metrics_port:
+                    start_metrics_server(self.host, self.metrics_port)
+                self.handler.start_server()
         except KeyboardInterrupt:
             print("\nServer shutting down...")
         finally:
@@ -62,17 +144,160 @@ class NetworkSpeedTester:
         Run a client speed test.
         
         Args:
-            test_type (str): Type of test ('upload' or 'download')
+            test_type (str): Type of test ('upload', 'download', or 'bidir' for both
+                directions at once over TCP)
             
         Returns:
             Tuple containing:
             - float: Speed in Mbps
             - float: Duration in seconds
             - int: Bytes transferred
-            - Optional[Dict]: Additional statistics for UDP tests
+            - Optional[Dict]: Additional statistics: UDP loss/RTT/jitter, the
+              per-stream results under 'streams' for parallel tests,
+              the interval summary under 'intervals' when interval reporting is on,
+              idle vs. loaded RTT under 'latency' when latency probing is on,
+              per-direction results under 'directions' for bidirectional tests,
+              client and server TCP_INFO summaries under 'tcp_info' for TCP tests,
+              and the steady-state rate after the warm-up under 'steady' when
+              --omit or --steady is used
         """
-        if self.protocol == 'tcp':
-            speed, duration, bytes_transferred = self.handler.run_client_test(test_type)
-            return speed, duration, bytes_transferred, None
+        if self.latency:
+            result = self._run_with_latency_probe(test_type)
+        else:
+            result = self._run_test(test_type)
+        if self.omit or self.steady_cv is not None:
+            self._add_steady_state(result[3])
+        return result
+    
+    def _add_steady_state(self, stats: Optional[Dict]) -> None:
+        """Attach steady-state figures to every interval series in the results."""
+        if not stats:
+            return
+        for result in [stats, *stats.get('directions', {}).values()]:
+            if 'intervals' in result:
+                result['steady'] = steady_state(result['intervals']['samples'], self.omit, self.steady_cv)
+
+    def _run_test(self, test_type: str) -> Tuple[float, float, int, Optional[Dict]]:
+        """Run the bulk transfer test on the protocol handler."""
+        # Worker processes run their share of the streams each
+        if self.streams > 1 and self.workers > 1:
+            speed, duration, bytes_transferred, per_stream = run_client_workers(
+                self.handler, test_type, self.streams, self.workers)
+        elif self.streams > 1:
+            speed, duration, bytes_transferred, per_stream = self.handler.run_parallel_test(
+                test_type, self.streams)
         else:
             return self.handler.run_client_test(test_type)
+        
+        stats = {'streams': per_stream}
+        if self.protocol == 'udp':
+            stats.update(self._aggregate_udp_stats(per_stream))
+        if any('directions' in stream for stream in per_stream):
+            stats['directions'] = self._aggregate_directions(per_stream)
+        elif self.handler.interval:
+            stats['intervals'] = merge([stream['intervals'] for stream in per_stream
+                                        if 'intervals' in stream])
+        if any('tcp_info' in stream for stream in per_stream):
+            stats['tcp_info'] = {
+                side: merge_summaries([(stream.get('tcp_info') or {}).get(side) or {}
+                                       for stream in per_stream])
+                for side in ('client', 'server')
+            }
+        return speed, duration, bytes_transferred, stats
+
+    def _run_with_latency_probe(self, test_type: str) -> Tuple[float, float, int, Optional[Dict]]:
+        """
+        Run a TCP test while pinging the server on a separate connection.
+        
+        A short series of probes before the transfer gives the idle RTT; the
+        same probes keep running in the background for the whole transfer to
+        give the loaded RTT.
+        """
+        probe = LatencyProbe(self.host, self.port, self.timeout, self.probe_interval)
+        try:
+            probe.connect()
+            idle = summarize_rtts(probe.measure(DEFAULT_IDLE_PROBES), probe.lost)
+        except (OSError, ProtocolError) as e:
+            print(f"Latency probe failed: {e}")
+            probe.close()
+            return self._run_test(test_type)
+        
+        probe.start()
+        try:
+            speed, duration, bytes_transferred, stats = self._run_test(test_type)
+        finally:
+            loaded = summarize_rtts(probe.stop(), probe.lost)
+            probe.close()
+        
+        stats = dict(stats or {})
+        stats['latency'] = {
+            'idle': idle,
+            'loaded': loaded,
+            'delta_ms': loaded['p50'] - idle['p50'] if loaded['probes'] else 0.0
+        }
+        return speed, duration, bytes_transferred, stats
+
+    @staticmethod
+    def _aggregate_directions(per_stream: List[Dict]) -> Dict:
+        """Combine the upload and download halves of parallel bidirectional streams."""
+        directions = {}
+        for name in ('upload', 'download'):
+            halves = [stream['directions'][name] for stream in per_stream if 'directions' in stream]
+            total_bytes = sum(half['bytes'] for half in halves)
+            duration = max(half['duration'] for half in halves)
+            directions[name] = {
+                'speed': (total_bytes * 8) / (1024 * 1024 * duration) if duration > 0 else 0.0,
+                'duration': duration,
+                'bytes': total_bytes
+            }
+            if any('intervals' in half for half in halves):
+                directions[name]['intervals'] = merge([half['intervals'] for half in halves
+                                                       if 'intervals' in half])
+        return directions
+
+    @staticmethod
+    def _aggregate_udp_stats(per_stream: List[Dict]) -> Dict:
+        """Combine loss, RTT, one-way delay and jitter across parallel UDP probes."""
+        sent = sum(stream.get('packets_sent', 0) for stream in per_stream)
+        received = sum(stream.get('packets_received', 0) for stream in per_stream)
+        
+        def weighted(key: str) -> float:
+            if not received:
+                return 0.0
+            return sum(stream.get(key, 0) * stream.get('packets_received', 0)
+                       for stream in per_stream) / received
+        
+        round_trip_loss = (1 - received / sent) * 100 if sent > 0 else 0
+        # Every probe talks to the same server, so the probe with the tightest
+        # offset bound supplies both figures; probes without ACKs have none
+        timed = [stream for stream in per_stream
+                 if stream.get('packets_received') and 'clock_offset_error' in stream]
+        best = min(timed, key=lambda stream: stream['clock_offset_error']) if timed else {}
+        combined = {
+            'packet_loss': round_trip_loss,
+            'avg_rtt': weighted('avg_rtt'),
+            'jitter': weighted('jitter'),
+            'forward_delay': weighted('forward_delay'),
+            'forward_jitter': weighted('forward_jitter'),
+            'reverse_delay': weighted('reverse_delay'),
+            'reverse_jitter': weighted('reverse_jitter'),
+            'clock_offset': best.get('clock_offset', 0.0),
+            'clock_offset_error': best.get('clock_offset_error', 0.0),
+            'packets_sent': sent,
+            'packets_received': received,
+            'send_errors': sum(stream.get('send_errors', 0) for stream in per_stream)
+        }
+        # Forward and reverse loss need the server's counts from every probe
+        if per_stream and all('server_received' in stream for stream in per_stream):
+            server_received = sum(stream['server_received'] for stream in per_stream)
+            combined.update({
+                'packet_loss': (1 - server_received / sent) * 100 if sent > 0 else 0,
+                'round_trip_loss': round_trip_loss,
+                'reverse_loss': (max(0.0, 1 - received / server_received) * 100
+                                 if server_received else 0.0),
+                'server_received': server_received,
+                'reordered': sum(stream['reordered'] for stream in per_stream),
+                'duplicates': sum(stream['duplicates'] for stream in per_stream),
+                'late': sum(stream['late'] for stream in per_stream)
+            })
+        return combined
@@ -0,0 +1,118 @@
+import csv
+import json
+import time
+from typing import Dict, IO, Iterator, List, Optional, Tuple
+
+OUTPUT_FORMATS = ('text', 'json', 'csv')
+
+CSV_COLUMNS = ('test', 'record', 'id', 'metric', 'value')
+
+
+def build_record(test_type: str, speed: float, duration: float,
+                 bytes_transferred: int, stats: Optional[Dict]) -> Dict:
+    """
+    Turn one client test result into a plain dict.
+
+    Args:
+        test_type (str): Type of test ('upload' or 'download')
+        speed (float): Speed in Mbps
+        duration (float): Duration in seconds
+        bytes_transferred (int): Bytes transferred
+        stats (Optional[Dict]): Statistics returned with the result
+
+    Returns:
+        Dict: The result with its statistics under 'stats'
+    """
+    return {
+        'test': test_type,
+        'speed_mbps': speed,
+        'duration': duration,
+        'bytes': bytes_transferred,
+        'stats': stats or {}
+    }
+
+
+def write_json(run: Dict, records: List[Dict], stream: IO) -> None:
+    """
+    Write a client run as one JSON document.
+
+    Args:
+        run (Dict): Run settings (host, port, protocol, ...)
+        records (List[Dict]): Results from build_record()
+        stream (IO): Destination
+    """
+    json.dump({**run, 'timestamp': time.time(), 'tests': records}, stream, indent=2)
+    stream.write('\n')
+
+
+def _flatten(values: Dict, prefix: str = '') -> Iterator[Tuple[str, object]]:
+    """Yield (dotted key, scalar) pairs, skipping lists such as interval samples."""
+    for key, value in values.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{name}.")
+        elif not isinstance(value, list):
+            yield name, value
+
+
+def csv_rows(records: List[Dict]) -> Iterator[Tuple]:
+    """
+    Yield long-form CSV rows: one per summary value, stream value and interval value.
+
+    Args:
+        records (List[Dict]): Results from build_record()
+    """
+    for record in records:
+        test = record['test']
+        stats = record['stats']
+        summary = {key: value for key, value in record.items() if key not in ('test', 'stats')}
+        for metric, value in _flatten({**summary, **stats}):
+            yield test, 'summary', '', metric, value
+
+        for stream in stats.get('streams', []):
+            for metric, value in _flatten(stream):
+                yield test, 'stream', stream['stream'], metric, value
+
+        samples = stats.get('intervals', {}).get('samples', [])
+        for index, sample in enumerate(samples):
+            for metric, value in _flatten(sample):
+                yield test, 'interval', index, metric, value
+
+        # Bidirectional tests keep their interval samples per direction
+        for name, direction in stats.get('directions', {}).items():
+            samples = direction.get('intervals', {}).get('samples', [])
+            for index, sample in enumerate(samples):
+                for metric, value in _flatten(sample):
+                    yield test, 'interval', f"{name}/{index}", metric, value
+
+
+def write_csv(records: List[Dict], stream: IO) -> None:
+    """
+    Write client results as long-form CSV with a header row.
+
+    Args:
+        records (List[Dict]): Results from build_record()
+        stream (IO): Destination
+    """
+    writer = csv.writer(stream)
+    writer.writerow(CSV_COLUMNS)
+    writer.writerows(csv_rows(records))
+
+
+def write_history(rows: List[Dict], output_format: str, stream: IO) -> None:
+    """
+    Write history aggregates as JSON or as CSV with one row per bucket.
+
+    Args:
+        rows (List[Dict]): Aggregates from HistoryStore.aggregate()
+        output_format (str): 'json' or 'csv'
+        stream (IO): Destination
+    """
+    if output_format == 'json':
+        json.dump(rows, stream, indent=2)
+        stream.write('\n')
+        return
+    writer = csv.writer(stream)
+    if rows:
+        writer.writerow(rows[0].keys())
+        writer.writerows(row.values() for row in rows)
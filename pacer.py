@@ -0,0 +1,62 @@
+import time
+
+from config import DEFAULT_PACER_BURST
+
+
+class TokenBucketPacer:
+    def __init__(self, rate_bps: float, packet_size: int, burst: int = DEFAULT_PACER_BURST):
+        """
+        Initialize a token-bucket pacer for fixed-size datagrams.
+
+        Args:
+            rate_bps (float): Target rate in bits per second
+            packet_size (int): Datagram size in bytes
+            burst (int): Maximum number of datagrams released per tick
+        """
+        self.rate = rate_bps / 8  # bytes per second
+        self.packet_size = packet_size
+        self.capacity = packet_size * max(1, burst)
+        self.tokens = float(packet_size)
+        self.last = time.perf_counter()
+
+    def next_burst(self) -> int:
+        """
+        Wait until at least one datagram may be sent.
+
+        Tokens accumulate on the monotonic clock, so time lost to sleep
+        overshoot is made up with a larger burst on the next tick rather than
+        lowering the achieved rate.
+
+        Returns:
+            int: Number of datagrams that may be sent back to back now
+        """
+        delay = self.wait_time()
+        if delay > 0:
+            time.sleep(delay)
+        return self.take()
+
+    def wait_time(self) -> float:
+        """Return the seconds until one datagram's worth of tokens is available."""
+        tokens = self._refill()
+        if tokens >= self.packet_size:
+            return 0.0
+        return (self.packet_size - tokens) / self.rate
+
+    def take(self) -> int:
+        """
+        Consume the tokens for as many whole datagrams as are available.
+
+        Returns:
+            int: Number of datagrams that may be sent back to back now
+        """
+        tokens = self._refill()
+        burst = int(tokens // self.packet_size)
+        self.tokens = tokens - burst * self.packet_size
+        return burst
+
+    def _refill(self) -> float:
+        """Add the tokens earned since the last call, capped at the bucket size."""
+        now = time.perf_counter()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        return self.tokens
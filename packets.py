@@ -0,0 +1,57 @@
+import struct
+from typing import Optional, Tuple
+
+# Binary header carried by every UDP data and ACK datagram:
+# magic, version, message type, session id, sequence number, timestamp (ns).
+# Timestamps come from each host's monotonic clock; the client estimates the
+# offset between the two clocks from the ACKs.
+HEADER = struct.Struct('!HBBIIQ')
+HEADER_SIZE = HEADER.size
+
+MAGIC = 0x4E54  # 'NT'
+VERSION = 1
+
+TYPE_DATA = 1
+TYPE_ACK = 2
+
+# Largest UDP payload that fits in an IPv4 datagram
+MAX_DATAGRAM_SIZE = 65507
+
+
+def pack_header(buffer, msg_type: int, session_id: int, seq: int, timestamp_ns: int) -> None:
+    """
+    Write a datagram header into the start of a reusable buffer.
+
+    Args:
+        buffer (bytearray): Datagram buffer, at least HEADER_SIZE bytes
+        msg_type (int): TYPE_DATA or TYPE_ACK
+        session_id (int): Test session identifier
+        seq (int): Sequence number
+        timestamp_ns (int): Sender's time.monotonic_ns() timestamp
+    """
+    HEADER.pack_into(buffer, 0, MAGIC, VERSION, msg_type, session_id, seq, timestamp_ns)
+
+
+def unpack_header(buffer, size: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Parse a datagram header from a receive buffer.
+
+    Args:
+        buffer (bytearray): Buffer the datagram was received into
+        size (int): Number of bytes received
+
+    Returns:
+        Optional[Tuple[int, int, int, int]]: Message type, session id, sequence
+        number and timestamp, or None if the datagram is not a valid packet
+    """
+    if size < HEADER_SIZE:
+        return None
+    magic, version, msg_type, session_id, seq, timestamp_ns = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return msg_type, session_id, seq, timestamp_ns
+
+
+def is_packet(buffer, size: int) -> bool:
+    """Return True if the received bytes start with the binary packet magic."""
+    return size >= 2 and buffer[0] == MAGIC >> 8 and buffer[1] == MAGIC & 0xFF
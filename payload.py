@@ -0,0 +1,93 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+from config import PAYLOAD_CACHE_ENTRIES, PAYLOAD_CACHE_BYTES
+
+PAYLOAD_MODES = ('random', 'zeros', 'pattern')
+
+# Repeating pattern used by the 'pattern' mode
+_PATTERN = bytes(range(256))
+
+
+def generate_payload(size: int, mode: str = 'random') -> bytes:
+    """
+    Generate a test payload in bulk.
+
+    Args:
+        size (int): Payload size in bytes
+        mode (str): 'random' (incompressible), 'zeros' or 'pattern'
+
+    Returns:
+        bytes: The generated payload
+    """
+    if mode == 'random':
+        return os.urandom(size)
+    elif mode == 'zeros':
+        return bytes(size)
+    elif mode == 'pattern':
+        repeats = size // len(_PATTERN) + 1
+        return (_PATTERN * repeats)[:size]
+    raise ValueError(f"Unknown payload mode: {mode}")
+
+
+class PayloadProvider:
+    def __init__(self, max_entries: int = PAYLOAD_CACHE_ENTRIES,
+                 max_bytes: int = PAYLOAD_CACHE_BYTES):
+        """
+        Initialize a payload cache with least-recently-used eviction.
+
+        Args:
+            max_entries (int): Maximum number of cached payloads
+            max_bytes (int): Maximum total size of cached payloads
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._cache: 'OrderedDict[Tuple[str, int], bytes]' = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, size: int, mode: str = 'random') -> bytes:
+        """
+        Return a payload of the given size and mode, generating it at most once.
+
+        Args:
+            size (int): Payload size in bytes
+            mode (str): 'random', 'zeros' or 'pattern'
+
+        Returns:
+            bytes: The cached payload
+        """
+        key = (mode, size)
+        with self._lock:
+            payload = self._cache.get(key)
+            if payload is not None:
+                self._cache.move_to_end(key)
+                return payload
+
+        payload = generate_payload(size, mode)
+
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = payload
+                self._cached_bytes += size
+                self._evict()
+        return payload
+
+    def _evict(self) -> None:
+        """Drop least recently used payloads until the cache is within bounds."""
+        while len(self._cache) > 1 and (len(self._cache) > self.max_entries
+                                        or self._cached_bytes > self.max_bytes):
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+
+    def clear(self) -> None:
+        """Drop all cached payloads."""
+        with self._lock:
+            self._cache.clear()
+            self._cached_bytes = 0
+
+
+# Shared by all handlers in the process so sessions reuse the same buffers
+default_provider = PayloadProvider()
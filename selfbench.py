@@ -0,0 +1,205 @@
+import contextlib
+import itertools
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import (
+    DEFAULT_BENCH_TIME,
+    DEFAULT_BENCH_THRESHOLD,
+    DEFAULT_DATA_SIZE,
+    DEFAULT_TIMEOUT
+)
+from network_tester import NetworkSpeedTester
+from utils import free_port
+
+# Sweep matrix: every TCP combination of engine, buffer size and streams,
+# and every UDP combination of engine and datagram size
+BENCH_ENGINES = ('threads', 'asyncio')
+BENCH_TCP_BUFFERS = (8 * 1024, 64 * 1024, 1024 * 1024)
+BENCH_TCP_STREAMS = (1, 4)
+BENCH_UDP_DATAGRAMS = (1024, 8192)
+
+GB = 1024 * 1024 * 1024
+
+
+def bench_cases() -> List[Dict]:
+    """Return the benchmark configurations in run order."""
+    cases = []
+    for engine, buffer_size, streams in itertools.product(BENCH_ENGINES, BENCH_TCP_BUFFERS,
+                                                          BENCH_TCP_STREAMS):
+        cases.append({'protocol': 'tcp', 'engine': engine, 'buffer_size': buffer_size,
+                      'streams': streams, 'key': f"tcp/{engine}/b{buffer_size}/s{streams}"})
+    for engine, datagram_size in itertools.product(BENCH_ENGINES, BENCH_UDP_DATAGRAMS):
+        cases.append({'protocol': 'udp', 'engine': engine, 'datagram_size': datagram_size,
+                      'streams': 1, 'key': f"udp/{engine}/d{datagram_size}"})
+    return cases
+
+
+def _tester(case: Dict, port: int, duration: float) -> NetworkSpeedTester:
+    return NetworkSpeedTester(
+        host='127.0.0.1',
+        port=port,
+        buffer_size=case.get('buffer_size', 8192),
+        data_size=DEFAULT_DATA_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+        protocol=case['protocol'],
+        streams=case['streams'],
+        test_duration=duration,
+        datagram_size=case.get('datagram_size', 1024),
+        engine=case['engine']
+    )
+
+
+def run_case(case: Dict, duration: float = DEFAULT_BENCH_TIME) -> Dict:
+    """
+    Run one loopback benchmark with server and client in this process.
+
+    CPU time and context switches are read from getrusage() for the whole
+    process, so they cover both ends of the transfer.
+
+    Args:
+        case (Dict): Benchmark configuration from bench_cases()
+        duration (float): Seconds of traffic per case
+
+    Returns:
+        Dict: The configuration plus Gbps, CPU seconds per GB (user, system
+        and total) and context switches per GB
+    """
+    port = free_port()
+    server = _tester(case, port, duration)
+    # The server thread idles in its accept/recv loop once the case is done
+    threading.Thread(target=server.start_server, name=f"bench-server-{port}", daemon=True).start()
+    time.sleep(0.3)
+
+    client = _tester(case, port, duration)
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    wall_start = time.perf_counter()
+    speed, _, transferred, _ = client.run_client_test('download')
+    wall = time.perf_counter() - wall_start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+
+    user = after.ru_utime - before.ru_utime
+    system = after.ru_stime - before.ru_stime
+    switches = (after.ru_nvcsw - before.ru_nvcsw) + (after.ru_nivcsw - before.ru_nivcsw)
+    gigabytes = transferred / GB
+
+    def per_gb(value: float) -> float:
+        return value / gigabytes if gigabytes > 0 else 0.0
+
+    return {
+        **case,
+        'bytes': transferred,
+        'wall': wall,
+        'gbps': speed / 1024,
+        'cpu_s_per_gb': per_gb(user + system),
+        'user_s_per_gb': per_gb(user),
+        'sys_s_per_gb': per_gb(system),
+        'ctx_switches_per_gb': per_gb(switches)
+    }
+
+
+def run_suite(duration: float = DEFAULT_BENCH_TIME, verbose: bool = False) -> Dict:
+    """
+    Run every benchmark case.
+
+    Args:
+        duration (float): Seconds of traffic per case
+        verbose (bool): Show the handlers' own output
+
+    Returns:
+        Dict: Environment description and per-case results
+    """
+    results = []
+    for case in bench_cases():
+        if verbose:
+            result = run_case(case, duration)
+        else:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                result = run_case(case, duration)
+        print(f"{result['key']:<24} {result['gbps']:8.2f} Gbps  "
+              f"{result['cpu_s_per_gb']:7.3f} CPU s/GB  "
+              f"{result['ctx_switches_per_gb']:10.0f} ctx/GB")
+        results.append(result)
+
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'duration': duration,
+        'results': results
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = DEFAULT_BENCH_THRESHOLD) -> List[Dict]:
+    """
+    Compare a benchmark run against a stored baseline.
+
+    Args:
+        current (Dict): Result of run_suite()
+        baseline (Dict): Earlier result of run_suite(), e.g. loaded from JSON
+        threshold (float): Relative change that counts as a regression (0.1 = 10%)
+
+    Returns:
+        List[Dict]: One entry per case present in both runs, with the relative
+        change in Gbps and CPU per GB and a 'regression' flag
+    """
+    previous = {result['key']: result for result in baseline.get('results', [])}
+    comparisons = []
+    for result in current['results']:
+        old = previous.get(result['key'])
+        if old is None:
+            continue
+        gbps_change = (result['gbps'] - old['gbps']) / old['gbps'] if old['gbps'] else 0.0
+        cpu_change = ((result['cpu_s_per_gb'] - old['cpu_s_per_gb']) / old['cpu_s_per_gb']
+                      if old['cpu_s_per_gb'] else 0.0)
+        comparisons.append({
+            'key': result['key'],
+            'gbps_change': gbps_change,
+            'cpu_change': cpu_change,
+            'regression': gbps_change < -threshold or cpu_change > threshold
+        })
+    return comparisons
+
+
+def self_bench(output: str, baseline_path: Optional[str] = None,
+               threshold: float = DEFAULT_BENCH_THRESHOLD,
+               duration: float = DEFAULT_BENCH_TIME, verbose: bool = False) -> bool:
+    """
+    Run the benchmark suite, save it as JSON and check it against a baseline.
+
+    Args:
+        output (str): Path of the JSON results file
+        baseline_path (Optional[str]): Earlier results file to compare against
+        threshold (float): Relative change that counts as a regression
+        duration (float): Seconds of traffic per case
+        verbose (bool): Show the handlers' own output
+
+    Returns:
+        bool: False if any case regressed against the baseline
+    """
+    print(f"Running loopback self-benchmark ({duration:g} s per case)...")
+    current = run_suite(duration, verbose)
+
+    with open(output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"Results written to {output}")
+
+    if not baseline_path:
+        return True
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    comparisons = compare(current, baseline, threshold)
+    print(f"\nComparison with {baseline_path} (threshold {threshold:.0%}):")
+    for comparison in comparisons:
+        flag = '  REGRESSION' if comparison['regression'] else ''
+        print(f"{comparison['key']:<24} Gbps {comparison['gbps_change']:+7.1%}  "
+              f"CPU/GB {comparison['cpu_change']:+7.1%}{flag}")
+    return not any(comparison['regression'] for comparison in comparisons)
@@ -0,0 +1,90 @@
+import socket
+from typing import Dict, Optional
+
+from utils import format_size
+
+
+class SocketOptions:
+    def __init__(self, sndbuf: Optional[int] = None, rcvbuf: Optional[int] = None,
+                 nodelay: bool = False, congestion: Optional[str] = None):
+        """
+        Initialize a set of kernel socket options.
+
+        Options left as None (or False) keep the kernel default.
+
+        Args:
+            sndbuf (Optional[int]): SO_SNDBUF in bytes
+            rcvbuf (Optional[int]): SO_RCVBUF in bytes
+            nodelay (bool): Set TCP_NODELAY (TCP only)
+            congestion (Optional[str]): TCP_CONGESTION algorithm, e.g. 'bbr' (TCP only, Linux)
+        """
+        self.sndbuf = sndbuf
+        self.rcvbuf = rcvbuf
+        self.nodelay = nodelay
+        self.congestion = congestion
+
+    def apply(self, sock: socket.socket, tcp: bool = True) -> None:
+        """
+        Set the options on a socket.
+
+        Buffer sizes should be set before connect() or listen(), so the TCP
+        window scale negotiated in the handshake can use them.
+
+        Args:
+            sock (socket.socket): Socket to configure
+            tcp (bool): Whether TCP-only options apply
+        """
+        if self.sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+        if self.rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        if not tcp:
+            return
+        if self.nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.congestion:
+            if not hasattr(socket, 'TCP_CONGESTION'):
+                raise OSError("TCP_CONGESTION is not supported on this platform")
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CONGESTION,
+                                self.congestion.encode('ascii'))
+            except OSError as e:
+                raise OSError(f"Congestion control '{self.congestion}' is not available: {e.strerror}")
+
+    def merged(self, other: 'SocketOptions') -> 'SocketOptions':
+        """Return these options with unset values filled in from other."""
+        return SocketOptions(
+            sndbuf=self.sndbuf or other.sndbuf,
+            rcvbuf=self.rcvbuf or other.rcvbuf,
+            nodelay=self.nodelay or other.nodelay,
+            congestion=self.congestion or other.congestion
+        )
+
+    def to_dict(self) -> Dict:
+        """Return the options that are set, e.g. for a test request or profile."""
+        options = {'sndbuf': self.sndbuf, 'rcvbuf': self.rcvbuf,
+                   'nodelay': self.nodelay, 'congestion': self.congestion}
+        return {key: value for key, value in options.items() if value}
+
+    @classmethod
+    def from_dict(cls, options: Dict) -> 'SocketOptions':
+        """Build options from a dict produced by to_dict()."""
+        return cls(
+            sndbuf=int(options['sndbuf']) if options.get('sndbuf') else None,
+            rcvbuf=int(options['rcvbuf']) if options.get('rcvbuf') else None,
+            nodelay=bool(options.get('nodelay')),
+            congestion=options.get('congestion') or None
+        )
+
+    def describe(self) -> str:
+        """Return a short human-readable summary, e.g. 'sndbuf=4.00 MB nodelay'."""
+        parts = []
+        if self.sndbuf:
+            parts.append(f"sndbuf={format_size(self.sndbuf)}")
+        if self.rcvbuf:
+            parts.append(f"rcvbuf={format_size(self.rcvbuf)}")
+        if self.nodelay:
+            parts.append('nodelay')
+        if self.congestion:
+            parts.append(f"congestion={self.congestion}")
+        return ' '.join(parts) or 'kernel defaults'
@@ -0,0 +1,334 @@
+import math
+import threading
+from array import array
+from typing import Dict, Optional
+
+from config import DEFAULT_UDP_SEQ_WINDOW
+
+
+class RunningStats:
+    """Count, mean, variance, min and max in constant memory (Welford's algorithm)."""
+
+    __slots__ = ('count', 'mean', '_m2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        """Add one observation."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'RunningStats') -> None:
+        """Fold another set of observations into this one (Chan et al.)."""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, or 0 with fewer than two observations."""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        """Sample standard deviation."""
+        return math.sqrt(self.variance)
+
+
+class LogHistogram:
+    def __init__(self, lowest: float = 0.001, highest: float = 1e7, precision: float = 0.01):
+        """
+        Initialize a log-bucketed histogram for percentile estimates.
+
+        Bucket boundaries grow geometrically, so every percentile is reported
+        within the given relative error whatever the magnitude of the values,
+        and memory is fixed by the value range rather than the sample count.
+
+        Args:
+            lowest (float): Smallest distinguishable value; smaller values share the first bucket
+            highest (float): Largest tracked value; larger values share the last bucket
+            precision (float): Relative width of each bucket
+        """
+        self.lowest = lowest
+        self._log_base = math.log1p(precision)
+        self._buckets = int(math.log(highest / lowest) / self._log_base) + 1
+        self.counts = array('Q', bytes(8 * self._buckets))
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        """Add one observation."""
+        if value > self.lowest:
+            index = min(self._buckets - 1, int(math.log(value / self.lowest) / self._log_base))
+        else:
+            index = 0
+        self.counts[index] += 1
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'LogHistogram') -> None:
+        """Fold in a histogram built with the same bounds and precision."""
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        """
+        Estimate a percentile.
+
+        Args:
+            p (float): Percentile as a fraction (e.g. 0.99)
+
+        Returns:
+            float: The value at that rank, or 0 if the histogram is empty
+        """
+        if not self.count:
+            return 0.0
+        # Nearest rank, resolved to the geometric middle of its bucket
+        rank = max(1, math.ceil(p * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                value = self.lowest * math.exp((index + 0.5) * self._log_base)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class JitterEstimator:
+    """RFC 3550 interarrival jitter: a 1/16-gain moving average of transit-time changes."""
+
+    __slots__ = ('jitter', '_last_transit')
+
+    def __init__(self):
+        self.jitter = 0.0
+        self._last_transit: Optional[float] = None
+
+    def add(self, transit: float) -> None:
+        """
+        Add the transit time of the next packet.
+
+        Args:
+            transit (float): Arrival time minus send time, in any consistent unit
+        """
+        if self._last_transit is not None:
+            self.jitter += (abs(transit - self._last_transit) - self.jitter) / 16
+        self._last_transit = transit
+
+
+class SendTimes:
+    def __init__(self, capacity: int = DEFAULT_UDP_SEQ_WINDOW):
+        """
+        Initialize a ring of send timestamps indexed by sequence number.
+
+        Only the last capacity sequence numbers are remembered, so memory stays
+        constant however long the test runs; a reply for an older sequence
+        number is treated like a lost one. A lock keeps each slot's sequence
+        number and time consistent when a sender thread records while an
+        ACK receiver thread pops.
+
+        Args:
+            capacity (int): Number of outstanding sequence numbers tracked
+        """
+        self.capacity = capacity
+        self._seqs = array('q', [-1]) * capacity
+        self._times = array('q', bytes(8 * capacity))
+        self._lock = threading.Lock()
+
+    def record(self, seq: int, timestamp_ns: int) -> None:
+        """Remember the send time of a sequence number."""
+        slot = seq % self.capacity
+        with self._lock:
+            self._seqs[slot] = seq
+            self._times[slot] = timestamp_ns
+
+    def pop(self, seq: int) -> Optional[int]:
+        """
+        Take the send time of a sequence number.
+
+        Returns:
+            Optional[int]: The send timestamp, or None if unknown, evicted or already taken
+        """
+        slot = seq % self.capacity
+        with self._lock:
+            if self._seqs[slot] != seq:
+                return None
+            self._seqs[slot] = -1
+            return self._times[slot]
+
+
+class LatencyStats:
+    """Streaming RTT summary: running moments, RFC 3550 jitter and percentiles."""
+
+    def __init__(self):
+        self.running = RunningStats()
+        self.histogram = LogHistogram(lowest=0.001, highest=1e5)  # 1 us to 100 s, in ms
+        self.jitter = JitterEstimator()
+
+    @property
+    def count(self) -> int:
+        return self.running.count
+
+    def add(self, rtt_ms: float) -> None:
+        """Add one round-trip time in milliseconds."""
+        self.running.add(rtt_ms)
+        self.histogram.add(rtt_ms)
+        self.jitter.add(rtt_ms)
+
+    def summary(self) -> Dict:
+        """
+        Summarise the round-trip times seen so far.
+
+        Returns:
+            Dict: min/avg/max/stdev RTT, jitter and p50/p90/p99/p99.9 RTT in milliseconds
+        """
+        running = self.running
+        if not running.count:
+            return {'min_rtt': 0.0, 'max_rtt': 0.0, 'avg_rtt': 0.0, 'rtt_stdev': 0.0,
+                    'jitter': 0.0, 'p50_rtt': 0.0, 'p90_rtt': 0.0, 'p99_rtt': 0.0,
+                    'p999_rtt': 0.0}
+        percentile = self.histogram.percentile
+        return {
+            'min_rtt': running.min,
+            'max_rtt': running.max,
+            'avg_rtt': running.mean,
+            'rtt_stdev': running.stdev,
+            'jitter': self.jitter.jitter,
+            'p50_rtt': percentile(0.50),
+            'p90_rtt': percentile(0.90),
+            'p99_rtt': percentile(0.99),
+            'p999_rtt': percentile(0.999)
+        }
+
+
+class ClockOffsetEstimator:
+    """NTP-style offset between the local clock and a peer's, from timestamped round trips."""
+
+    __slots__ = ('offset_ns', 'error_ns')
+
+    def __init__(self):
+        self.offset_ns: Optional[int] = None
+        self.error_ns: Optional[int] = None
+
+    def add(self, sent_ns: int, peer_ns: int, received_ns: int) -> None:
+        """
+        Add one round trip.
+
+        The peer stamps a single time when it turns the packet around, so the
+        offset is its timestamp minus the midpoint of the local send and
+        receive times. As in NTP's clock filter, the sample with the shortest
+        round trip wins: it had the least queueing to make the two directions
+        unequal, and half its RTT bounds the error.
+
+        The estimate assumes that fastest round trip was symmetric. A fixed
+        asymmetry (different routes or link speeds each way) cannot be told
+        apart from clock offset: it is absorbed into the offset, and the
+        forward and reverse delays derived from it are equal for that round trip.
+
+        Args:
+            sent_ns (int): Local send time
+            peer_ns (int): Peer time when the packet was turned around
+            received_ns (int): Local receive time of the reply
+        """
+        error = (received_ns - sent_ns) // 2
+        if self.error_ns is None or error < self.error_ns:
+            self.error_ns = error
+            self.offset_ns = peer_ns - (sent_ns + received_ns) // 2
+
+
+class OneWayDelayStats:
+    def __init__(self):
+        """
+        Initialize forward and reverse one-way delay statistics.
+
+        Delays are accumulated against the offset estimated from the first
+        round trip and corrected to the best estimate when summarised. The
+        correction is a constant shift, so the running moments and the
+        per-direction RFC 3550 jitter are unaffected by it.
+
+        The split between the directions is only as good as the offset, which
+        assumes the fastest round trip was symmetric. Changes in each
+        direction's delay and jitter are measured, but a constant asymmetry of
+        the path is not: it shows up as clock offset, not as a difference
+        between forward and reverse delay.
+        """
+        self.offset = ClockOffsetEstimator()
+        self.forward = RunningStats()
+        self.reverse = RunningStats()
+        self.forward_jitter = JitterEstimator()
+        self.reverse_jitter = JitterEstimator()
+        self._base_ns: Optional[int] = None
+
+    def add(self, sent_ns: int, peer_ns: int, received_ns: int) -> None:
+        """
+        Add one round trip.
+
+        Args:
+            sent_ns (int): Local send time
+            peer_ns (int): Peer time when the packet was turned around
+            received_ns (int): Local receive time of the reply
+        """
+        self.offset.add(sent_ns, peer_ns, received_ns)
+        if self._base_ns is None:
+            self._base_ns = self.offset.offset_ns
+
+        # Milliseconds relative to the provisional offset, small enough for float accuracy
+        forward = (peer_ns - sent_ns - self._base_ns) / 1e6
+        reverse = (received_ns - peer_ns + self._base_ns) / 1e6
+        self.forward.add(forward)
+        self.reverse.add(reverse)
+        self.forward_jitter.add(forward)
+        self.reverse_jitter.add(reverse)
+
+    def summary(self) -> Dict:
+        """
+        Summarise one-way delays.
+
+        Returns:
+            Dict: Clock offset and its error bound, and average/min/max delay and
+            jitter for each direction, all in milliseconds
+        """
+        if self._base_ns is None:
+            return {'clock_offset': 0.0, 'clock_offset_error': 0.0,
+                    'forward_delay': 0.0, 'forward_min_delay': 0.0, 'forward_max_delay': 0.0,
+                    'forward_jitter': 0.0, 'reverse_delay': 0.0, 'reverse_min_delay': 0.0,
+                    'reverse_max_delay': 0.0, 'reverse_jitter': 0.0}
+
+        correction = (self.offset.offset_ns - self._base_ns) / 1e6
+        forward, reverse = self.forward, self.reverse
+        return {
+            'clock_offset': self.offset.offset_ns / 1e6,
+            'clock_offset_error': self.offset.error_ns / 1e6,
+            'forward_delay': forward.mean - correction,
+            'forward_min_delay': forward.min - correction,
+            'forward_max_delay': forward.max - correction,
+            'forward_jitter': self.forward_jitter.jitter,
+            'reverse_delay': reverse.mean + correction,
+            'reverse_min_delay': reverse.min + correction,
+            'reverse_max_delay': reverse.max + correction,
+            'reverse_jitter': self.reverse_jitter.jitter
+        }
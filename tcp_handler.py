@@ -1,11 +1,40 @@
 import socket
+import threading
 import time
-import random
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, List, Dict, Optional
+
+import metrics
+from config import (
+    DEFAULT_BACKLOG,
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_SENDFILE_SIZE,
+    DEFAULT_PAYLOAD_MODE,
+    DEFAULT_STEADY_WINDOW,
+    FRAME_MAX_BLOCK
+)
+from framing import (
+    FRAME_REQUEST,
+    FRAME_RESULT,
+    VERSION,
+    recv_message,
+    send_message
+)
+from intervals import create_detector, create_reporter
+from latency import echo_pings
+from payload import PAYLOAD_MODES, default_provider
+from sockopts import SocketOptions
+from tcpinfo import create_sampler, sampling_period
+from transfer import PayloadFile, send_and_receive, send_framed, recv_framed
 
 class TCPHandler:
     def __init__(self, host: str, port: int, buffer_size: int, data_size: int,
-                 timeout: int, verbose: bool = False):
+                 timeout: int, verbose: bool = False, backlog: int = DEFAULT_BACKLOG,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS, use_sendfile: bool = False,
+                 payload_mode: str = DEFAULT_PAYLOAD_MODE,
+                 test_duration: Optional[float] = None, interval: Optional[float] = None,
+                 socket_options: Optional[SocketOptions] = None, tcp_info: bool = True,
+                 steady_cv: Optional[float] = None, omit: float = 0.0):
         """
         Initialize TCP Handler.
         
@@ -16,6 +45,17 @@ class TCPHandler:
             data_size (int): Total size of data to transfer
             timeout (int): Socket timeout in seconds
             verbose (bool): Enable verbose output
+            backlog (int): Pending connection queue length for the server
+            max_sessions (int): Maximum number of test sessions served concurrently
+            use_sendfile (bool): Serve download tests from a tmpfs file with sendfile()
+            payload_mode (str): Test data content ('random', 'zeros' or 'pattern')
+            test_duration (Optional[float]): Run tests for this many seconds instead of data_size bytes
+            interval (Optional[float]): Report throughput every this many seconds
+            socket_options (Optional[SocketOptions]): Kernel socket options for test connections
+            tcp_info (bool): Sample TCP_INFO on both ends of client test connections (Linux)
+            steady_cv (Optional[float]): Stop time-bounded tests once the interval rate varies
+                by no more than this many percent (requires interval)
+            omit (float): Warm-up seconds ignored by the steady-state detection
         """
         self.host = host
         self.port = port
@@ -23,174 +63,485 @@ class TCPHandler:
         self.data_size = data_size
         self.timeout = timeout
         self.verbose = verbose
+        self.backlog = backlog
+        self.max_sessions = max(1, max_sessions)
+        self.use_sendfile = use_sendfile
+        self.payload_mode = payload_mode
+        self.test_duration = test_duration
+        self.interval = interval
+        self.socket_options = socket_options or SocketOptions()
+        self.tcp_info = tcp_info
+        self.steady_cv = steady_cv
+        self.omit = omit
+        # Set by worker processes that share the listening port
+        self.reuse_port = False
+        # One sendfile payload file per payload mode, filled on first use
+        self._payload_files: Dict[str, PayloadFile] = {}
 
     def _generate_test_data(self, size: int) -> bytes:
-        """Generate random test data."""
-        return bytes(random.getrandbits(8) for _ in range(size))
+        """Return test data of the given size, generated once and cached."""
+        return default_provider.get(size, self.payload_mode)
+
+    def _open_payload_files(self) -> None:
+        """Prepare a sendfile payload file for each payload mode clients may request."""
+        size = min(self.data_size, DEFAULT_SENDFILE_SIZE)
+        self._payload_files = {mode: PayloadFile(default_provider.get(self.buffer_size, mode), size)
+                               for mode in PAYLOAD_MODES}
+
+    def _close_payload_files(self) -> None:
+        """Release the sendfile payload files."""
+        for payload_file in self._payload_files.values():
+            payload_file.close()
+        self._payload_files = {}
 
     def start_server(self) -> None:
-        """Start TCP server."""
+        """Start TCP server, serving up to max_sessions clients concurrently."""
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        # Accepted sockets inherit these, window scale included
+        self.socket_options.apply(server_socket)
         server_socket.bind((self.host, self.port))
-        server_socket.listen(1)
-        server_socket.settimeout(self.timeout)
+        server_socket.listen(self.backlog)
+        server_socket.settimeout(1.0)
+        
+        print(f"TCP Server started on {self.host}:{self.port} "
+              f"(max {self.max_sessions} concurrent sessions)")
         
-        print(f"TCP Server started on {self.host}:{self.port}")
+        if self.use_sendfile:
+            self._open_payload_files()
+        
+        # Each session runs on its own pool thread with its own socket timeout,
+        # so a slow client only ever occupies its own slot.
+        slots = threading.BoundedSemaphore(self.max_sessions)
+        executor = ThreadPoolExecutor(max_workers=self.max_sessions,
+                                      thread_name_prefix='tcp-session')
         
         try:
             while True:
                 try:
                     client_socket, address = server_socket.accept()
-                    print(f"Connection from {address}")
-                    
-                    client_socket.settimeout(self.timeout)
-                    self._handle_client(client_socket)
                 except socket.timeout:
                     continue
                 except KeyboardInterrupt:
                     break
+                
+                if not slots.acquire(blocking=False):
+                    print(f"Rejecting {address}: session limit of {self.max_sessions} reached")
+                    client_socket.close()
+                    continue
+                
+                print(f"Connection from {address}")
+                client_socket.settimeout(self.timeout)
+                executor.submit(self._serve_session, client_socket, slots)
         finally:
             server_socket.close()
+            executor.shutdown(wait=False)
+            self._close_payload_files()
+
+    def _serve_session(self, client_socket: socket.socket,
+                       slots: threading.BoundedSemaphore) -> None:
+        """Run one client session on a pool thread and free its slot afterwards."""
+        try:
+            self._handle_client(client_socket)
+        finally:
+            slots.release()
 
     def _handle_client(self, client_socket: socket.socket) -> None:
         """Handle TCP client connection."""
+        metrics.active_sessions.inc('tcp')
+        session_start = time.perf_counter()
+        sampler = None
         try:
-            test_type = client_socket.recv(16).decode('utf-8').strip()
+            request = recv_message(client_socket, FRAME_REQUEST)
+            test_type = request.get('test')
+            size = int(request.get('size') or self.data_size)
+            test_duration = float(request.get('duration') or 0) or None
+            options = request.get('options', {})
+            payload_mode = options.get('payload', self.payload_mode)
+            buffer_size = min(int(options.get('buffer') or self.buffer_size), FRAME_MAX_BLOCK)
+            self._apply_requested_options(client_socket, options)
+            label = f"[stream {request.get('stream', 0)}] "
+            # Clients asking for intervals get them from our side of the transfer too
+            steady = options.get('steady')
+            reporter = create_reporter(self._requested_interval(options), label,
+                                       live=self.verbose, detector=create_detector(steady))
+            sampler = create_sampler(client_socket, float(options.get('tcp_info') or 0))
+            intervals = None
             
             if test_type == 'upload':
                 if self.verbose:
-                    print("Starting upload test (receiving data)...")
+                    print(f"{label}Starting upload test (receiving data)...")
+                
+                start_time = time.perf_counter()
+                if reporter:
+                    reporter.start()
+                if sampler:
+                    sampler.start()
+                total_received = recv_framed(client_socket, bytearray(buffer_size), reporter)
+                end_time = time.perf_counter()
+                intervals = reporter.finish() if reporter else None
+                duration = end_time - start_time
                 
-                total_received = 0
-                start_time = time.time()
+                if self.verbose:
+                    print(f"{label}Received {total_received} bytes in {duration:.2f} seconds")
                 
-                while True:
-                    data = client_socket.recv(self.buffer_size)
-                    if not data:
-                        break
-                    total_received += len(data)
+                metrics.bytes_total.inc('tcp', 'in', amount=total_received)
+                send_message(client_socket, FRAME_RESULT,
+                             self._with_tcp_info({'bytes': total_received, 'duration': duration,
+                                                  **self._receive_intervals(intervals)}, sampler))
                 
-                end_time = time.time()
+            elif test_type == 'download':
+                if self.verbose:
+                    print(f"{label}Starting download test (sending data)...")
+                
+                # Time-bounded downloads run until the client's requested deadline
+                total = None if test_duration else size
+                test_data = memoryview(default_provider.get(buffer_size, payload_mode))
+                
+                start_time = time.perf_counter()
+                if reporter:
+                    reporter.start()
+                if sampler:
+                    sampler.start()
+                deadline = time.perf_counter() + test_duration if test_duration else None
+                total_sent = send_framed(client_socket, test_data, total, deadline, reporter,
+                                         self._payload_files.get(payload_mode))
+                end_time = time.perf_counter()
+                intervals = reporter.finish() if reporter else None
                 duration = end_time - start_time
                 
                 if self.verbose:
-                    print(f"Received {total_received} bytes in {duration:.2f} seconds")
+                    print(f"{label}Sent {total_sent} bytes in {duration:.2f} seconds")
                 
-                response = f"STATS:{total_received}:{duration}"
-                client_socket.sendall(response.encode('utf-8'))
+                metrics.bytes_total.inc('tcp', 'out', amount=total_sent)
+                send_message(client_socket, FRAME_RESULT,
+                             self._with_tcp_info({'bytes': total_sent, 'duration': duration}, sampler))
                 
-            elif test_type == 'download':
+            elif test_type == 'bidir':
                 if self.verbose:
-                    print("Starting download test (sending data)...")
+                    print(f"{label}Starting bidirectional test (sending and receiving)...")
                 
-                test_data = self._generate_test_data(self.buffer_size)
-                remaining = self.data_size
+                total = None if test_duration else size
+                test_data = memoryview(default_provider.get(buffer_size, payload_mode))
+                # Our sending half only needs a reporter to stop at the steady state
+                send_reporter = create_reporter(reporter.interval, live=False,
+                                                detector=create_detector(steady)) if steady else None
                 
-                start_time = time.time()
+                if reporter:
+                    reporter.start()
+                if send_reporter:
+                    send_reporter.start()
+                if sampler:
+                    sampler.start()
+                deadline = time.perf_counter() + test_duration if test_duration else None
+                total_sent, send_duration, total_received, duration = send_and_receive(
+                    client_socket, test_data, total, deadline, bytearray(buffer_size),
+                    send_reporter, reporter, payload_file=self._payload_files.get(payload_mode))
+                intervals = reporter.finish() if reporter else None
                 
-                while remaining > 0:
-                    chunk_size = min(remaining, self.buffer_size)
-                    client_socket.sendall(test_data[:chunk_size])
-                    remaining -= chunk_size
+                if self.verbose:
+                    print(f"{label}Sent {total_sent} bytes in {send_duration:.2f} seconds, "
+                          f"received {total_received} bytes in {duration:.2f} seconds")
                 
-                end_time = time.time()
-                duration = end_time - start_time
+                metrics.bytes_total.inc('tcp', 'in', amount=total_received)
+                metrics.bytes_total.inc('tcp', 'out', amount=total_sent)
+                # The client reports upload from our receive side and download from our send side
+                send_message(client_socket, FRAME_RESULT,
+                             self._with_tcp_info({'bytes': total_received, 'duration': duration,
+                                                  'sent': total_sent, 'send_duration': send_duration,
+                                                  **self._receive_intervals(intervals)}, sampler))
                 
+            elif test_type == 'ping':
+                # Latency probes run on their own connection next to the bulk streams
+                probes = echo_pings(client_socket)
                 if self.verbose:
-                    print(f"Sent {self.data_size} bytes in {duration:.2f} seconds")
+                    print(f"{label}Echoed {probes} latency probes")
+                
+            else:
+                metrics.errors_total.inc('tcp')
+                send_message(client_socket, FRAME_RESULT, {'error': f"Unknown test type: {test_type}"})
+                return
                 
-                response = f"STATS:{self.data_size}:{duration}"
-                client_socket.sendall(response.encode('utf-8'))
+            metrics.sessions_total.inc('tcp', test_type)
+            if intervals and self.verbose:
+                self._print_interval_summary(label, intervals)
                 
         except Exception as e:
+            metrics.errors_total.inc('tcp')
             print(f"Error handling client: {e}")
         finally:
+            if sampler:
+                sampler.cancel()
             client_socket.close()
+            metrics.active_sessions.dec('tcp')
+            metrics.session_duration.observe(time.perf_counter() - session_start, 'tcp')
+
+    def _apply_requested_options(self, client_socket: socket.socket, options: Dict) -> None:
+        """Mirror the client's socket options on this end, unless the server set its own."""
+        requested = SocketOptions.from_dict(options.get('socket', {}))
+        if requested.to_dict():
+            try:
+                self.socket_options.merged(requested).apply(client_socket)
+            except OSError as e:
+                print(f"Could not apply requested socket options ({requested.describe()}): {e}")
+
+    @staticmethod
+    def _print_interval_summary(label: str, summary: Dict) -> None:
+        """Print min/mean/max/p95 throughput over the reported intervals."""
+        print(f"{label}Intervals: min {summary['min']:.2f} / mean {summary['mean']:.2f} / "
+              f"max {summary['max']:.2f} / p95 {summary['p95']:.2f} Mbps")
 
-    def run_client_test(self, test_type: str) -> Tuple[float, float, int]:
+    @staticmethod
+    def _with_tcp_info(result: Dict, sampler) -> Dict:
+        """Stop the TCP_INFO sampler, if any, and attach its series to a RESULT message."""
+        if sampler:
+            result['tcp_info'] = sampler.stop()
+        return result
+
+    def _requested_interval(self, options: Dict) -> Optional[float]:
+        """Return the server-side reporting interval: the steady-state one, the client's, or our own."""
+        steady = options.get('steady')
+        if steady:
+            return float(steady['interval'])
+        return float(options.get('interval') or 0) or self.interval
+
+    @staticmethod
+    def _receive_intervals(intervals: Optional[Dict]) -> Dict:
+        """Return our receive-side interval summary for a RESULT message, if there is one."""
+        return {'intervals': intervals} if intervals else {}
+
+    @staticmethod
+    def _sender_intervals(result: Dict, own: Optional[Dict]) -> Optional[Dict]:
+        """
+        Pick the interval summary of a direction the client sent.
+
+        The receiver's intervals are preferred: the sender's count bytes
+        handed to the kernel, which run ahead of delivery while buffers fill
+        and stall while they drain. Our own (closed when sending stopped)
+        are the fallback for servers that do not report intervals.
+        """
+        return result.get('intervals') or own
+
+    @staticmethod
+    def _direction_result(transferred: int, duration: float, intervals: Optional[Dict] = None) -> Dict:
+        """Summarise one direction of a bidirectional test."""
+        result = {
+            'speed': (transferred * 8) / (1024 * 1024 * duration) if duration > 0 else 0.0,
+            'duration': duration,
+            'bytes': transferred
+        }
+        if intervals:
+            result['intervals'] = intervals
+        return result
+
+    def _build_request(self, test_type: str, stream_id: int) -> Dict:
+        """Build the test request sent at the start of every connection."""
+        return {
+            'version': VERSION,
+            'test': test_type,
+            'stream': stream_id,
+            'size': self.data_size,
+            'duration': self.test_duration or 0,
+            'options': {
+                'payload': self.payload_mode,
+                'buffer': self.buffer_size,
+                'socket': self.socket_options.to_dict(),
+                'tcp_info': sampling_period(self.tcp_info, self.interval),
+                'interval': self.interval or 0,
+                'steady': self._steady_options()
+            }
+        }
+
+    def _steady_options(self) -> Optional[Dict]:
+        """Return the steady-state detection settings for the request, or None when it is off."""
+        if self.steady_cv is None or not self.interval:
+            return None
+        return {'cv': self.steady_cv, 'window': DEFAULT_STEADY_WINDOW, 'omit': self.omit,
+                'interval': self.interval}
+
+    def run_client_test(self, test_type: str) -> Tuple[float, float, int, Dict]:
         """
         Run TCP client speed test.
         
         Args:
-            test_type (str): Type of test ('upload' or 'download')
+            test_type (str): Type of test ('upload', 'download' or 'bidir')
             
         Returns:
-            Tuple[float, float, int]: Speed in Mbps, duration in seconds, bytes transferred
+            Tuple[float, float, int, Dict]: Speed in Mbps, duration in seconds, bytes
+            transferred, and statistics (interval summary under 'intervals' when enabled;
+            for 'bidir', per-direction results under 'directions' and combined totals)
+        """
+        return self._run_stream(test_type)
+
+    def run_parallel_test(self, test_type: str, streams: int) -> Tuple[float, float, int, List[Dict]]:
         """
+        Run a TCP speed test over several concurrent connections.
+        
+        All streams connect first and are released together by a barrier, so
+        none of them gets a head start on the others.
+        
+        Args:
+            test_type (str): Type of test ('upload', 'download' or 'bidir')
+            streams (int): Number of parallel connections
+            
+        Returns:
+            Tuple[float, float, int, List[Dict]]: Aggregate speed in Mbps, duration
+            in seconds, total bytes transferred, and per-stream results
+        """
+        barrier = threading.Barrier(streams)
+        results: List[Optional[Tuple[float, float, int, Dict]]] = [None] * streams
+        
+        def worker(stream_id: int) -> None:
+            results[stream_id] = self._run_stream(test_type, stream_id, barrier)
+        
+        threads = [threading.Thread(target=worker, args=(i,), name=f'tcp-stream-{i}')
+                   for i in range(streams)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        per_stream = []
+        for stream_id, (speed, duration, transferred, stats) in enumerate(results):
+            per_stream.append({
+                'stream': stream_id,
+                'speed': speed,
+                'duration': duration,
+                'bytes': transferred,
+                **stats
+            })
+        
+        total_bytes = sum(stream['bytes'] for stream in per_stream)
+        duration = max(stream['duration'] for stream in per_stream)
+        speed_mbps = (total_bytes * 8) / (1024 * 1024 * duration) if duration > 0 else 0.0
+        return speed_mbps, duration, total_bytes, per_stream
+
+    def _run_stream(self, test_type: str, stream_id: int = 0,
+                    barrier: Optional[threading.Barrier] = None) -> Tuple[float, float, int, Dict]:
+        """Run a single TCP test connection, optionally synchronised on a barrier."""
         client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         client_socket.settimeout(self.timeout)
         
+        # Prepare the payload before the barrier so it does not delay the start
+        sends = test_type in ('upload', 'bidir')
+        test_data = memoryview(self._generate_test_data(self.buffer_size) if sends else b'')
+        
+        # Parallel streams are summarised at the end instead of printed live
+        label = '[download] ' if test_type == 'bidir' else ''
+        reporter = create_reporter(self.interval, label, live=barrier is None,
+                                   detector=create_detector(self._steady_options()))
+        sampler = None
+        stats: Dict = {}
+        
         try:
-            client_socket.connect((self.host, self.port))
-            client_socket.sendall(test_type.encode('utf-8'))
+            try:
+                self.socket_options.apply(client_socket)
+                client_socket.connect((self.host, self.port))
+            except Exception:
+                if barrier is not None:
+                    barrier.abort()
+                raise
+            
+            if barrier is not None:
+                barrier.wait(self.timeout)
+            
+            send_message(client_socket, FRAME_REQUEST, self._build_request(test_type, stream_id))
+            sampler = create_sampler(client_socket, sampling_period(self.tcp_info, self.interval))
+            if sampler:
+                sampler.start()
+            result: Dict = {}
             
             if test_type == 'upload':
                 if self.verbose:
                     print(f"Starting upload test to {self.host}:{self.port}...")
                 
-                test_data = self._generate_test_data(self.buffer_size)
-                remaining = self.data_size
-                
-                start_time = time.time()
+                total = None if self.test_duration else self.data_size
+                start_time = time.perf_counter()
+                if reporter:
+                    reporter.start()
+                deadline = time.perf_counter() + self.test_duration if self.test_duration else None
+                total_sent = send_framed(client_socket, test_data, total, deadline, reporter)
+                # Close our intervals now, not after waiting for the receiver to drain
+                own_intervals = reporter.finish() if reporter else None
+                reporter = None
                 
-                while remaining > 0:
-                    chunk_size = min(remaining, self.buffer_size)
-                    client_socket.sendall(test_data[:chunk_size])
-                    remaining -= chunk_size
-                
-                # Set a shorter timeout for receiving the response
-                client_socket.settimeout(2)
+                # Prefer the receiver's view of the transfer; fall back to our own
                 try:
-                    response = client_socket.recv(1024).decode('utf-8')
-                    if response.startswith('STATS:'):
-                        _, bytes_sent, duration = response.split(':')
-                        bytes_sent = int(bytes_sent)
-                        duration = float(duration)
-                    else:
-                        end_time = time.time()
-                        duration = end_time - start_time
-                        bytes_sent = self.data_size
-                except socket.timeout:
-                    end_time = time.time()
+                    result = recv_message(client_socket, FRAME_RESULT)
+                    bytes_sent = int(result['bytes'])
+                    duration = float(result['duration'])
+                except (socket.timeout, KeyError):
+                    end_time = time.perf_counter()
                     duration = end_time - start_time
-                    bytes_sent = self.data_size
+                    bytes_sent = total_sent
+                intervals = self._sender_intervals(result, own_intervals)
+                if intervals:
+                    stats['intervals'] = intervals
                 
             elif test_type == 'download':
                 if self.verbose:
                     print(f"Starting download test from {self.host}:{self.port}...")
                 
-                total_received = 0
-                start_time = time.time()
-                
-                while True:
-                    data = client_socket.recv(self.buffer_size)
-                    if not data or data.startswith(b'STATS:'):
-                        break
-                    total_received += len(data)
-                
-                if data and data.startswith(b'STATS:'):
-                    try:
-                        _, bytes_received, server_duration = data.decode('utf-8').split(':')
-                        bytes_received = int(bytes_received)
-                        server_duration = float(server_duration)
-                        
-                        total_received = bytes_received
-                        duration = server_duration
-                    except:
-                        end_time = time.time()
-                        duration = end_time - start_time
-                else:
-                    end_time = time.time()
-                    duration = end_time - start_time
+                start_time = time.perf_counter()
+                if reporter:
+                    reporter.start()
+                total_received = recv_framed(client_socket, bytearray(self.buffer_size), reporter)
+                end_time = time.perf_counter()
                 
+                # Report the sender's timing, as for uploads
+                result = recv_message(client_socket, FRAME_RESULT)
+                duration = float(result.get('duration') or end_time - start_time)
                 bytes_sent = total_received
             
+            elif test_type == 'bidir':
+                if self.verbose:
+                    print(f"Starting bidirectional test with {self.host}:{self.port}...")
+                
+                upload_reporter = create_reporter(self.interval, '[upload] ', live=barrier is None,
+                                                  detector=create_detector(self._steady_options()))
+                total = None if self.test_duration else self.data_size
+                if reporter:
+                    reporter.start()
+                if upload_reporter:
+                    upload_reporter.start()
+                deadline = time.perf_counter() + self.test_duration if self.test_duration else None
+                _, _, total_received, receive_duration = send_and_receive(
+                    client_socket, test_data, total, deadline, bytearray(self.buffer_size),
+                    upload_reporter, reporter)
+                upload_intervals = upload_reporter.finish() if upload_reporter else None
+                download_intervals = reporter.finish() if reporter else None
+                
+                # Each direction is reported from its receiver's byte count and its sender's timing
+                result = recv_message(client_socket, FRAME_RESULT)
+                directions = {
+                    'upload': self._direction_result(int(result['bytes']), float(result['duration']),
+                                                     self._sender_intervals(result, upload_intervals)),
+                    'download': self._direction_result(
+                        total_received, float(result.get('send_duration') or receive_duration),
+                        download_intervals)
+                }
+                stats['directions'] = directions
+                reporter = None
+                bytes_sent = sum(direction['bytes'] for direction in directions.values())
+                duration = max(direction['duration'] for direction in directions.values())
+            
+            else:
+                raise ValueError(f"Unknown test type: {test_type}")
+            
+            if reporter:
+                stats['intervals'] = reporter.finish()
+            if sampler:
+                stats['tcp_info'] = {'client': sampler.stop(), 'server': result.get('tcp_info')}
+            
             speed_mbps = (bytes_sent * 8) / (1024 * 1024 * duration)
-            return speed_mbps, duration, bytes_sent
+            return speed_mbps, duration, bytes_sent, stats
             
         except Exception as e:
-            print(f"Error during {test_type} test: {e}")
-            return 0.0, 0.0, 0
+            print(f"Error during {test_type} test (stream {stream_id}): {e}")
+            return 0.0, 0.0, 0, stats
         finally:
+            if sampler:
+                sampler.cancel()
             client_socket.close()
@@ -0,0 +1,278 @@
+import asyncio
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import DEFAULT_TCPINFO_INTERVAL, TCPINFO_MAX_SAMPLES
+
+# struct tcp_info from linux/tcp.h, up to tcpi_sndbuf_limited (Linux 4.10+).
+# Older kernels return a shorter struct; missing fields read as zero.
+TCP_INFO_FORMAT = struct.Struct('=8B24I4Q6IQ3Q')
+TCP_INFO_FIELDS = (
+    'state', 'ca_state', 'retransmits', 'probes', 'backoff', 'options', 'wscale', 'flags',
+    'rto', 'ato', 'snd_mss', 'rcv_mss',
+    'unacked', 'sacked', 'lost', 'retrans', 'fackets',
+    'last_data_sent', 'last_ack_sent', 'last_data_recv', 'last_ack_recv',
+    'pmtu', 'rcv_ssthresh', 'rtt', 'rttvar', 'snd_ssthresh', 'snd_cwnd', 'advmss', 'reordering',
+    'rcv_rtt', 'rcv_space', 'total_retrans',
+    'pacing_rate', 'max_pacing_rate', 'bytes_acked', 'bytes_received',
+    'segs_out', 'segs_in', 'notsent_bytes', 'min_rtt', 'data_segs_in', 'data_segs_out',
+    'delivery_rate', 'busy_time', 'rwnd_limited', 'sndbuf_limited'
+)
+# Bit 0 of the byte after the window scales: delivery rate was application-limited
+APP_LIMITED = 0x01
+
+MBPS = 1024 * 1024 / 8  # bytes per second in one Mbps
+
+# Share of segments retransmitted above which loss is named as the limit
+LOSS_LIMIT_RATE = 0.05
+
+
+def tcp_info_supported() -> bool:
+    """Return whether this platform can read TCP_INFO."""
+    return hasattr(socket, 'TCP_INFO')
+
+
+def read_tcp_info(sock) -> Dict[str, int]:
+    """
+    Read and decode TCP_INFO for a connected socket.
+
+    Args:
+        sock: Socket (or asyncio TransportSocket) to query
+
+    Returns:
+        Dict[str, int]: Raw tcp_info fields; times in microseconds, rates in bytes/s
+    """
+    raw = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, TCP_INFO_FORMAT.size)
+    raw = raw.ljust(TCP_INFO_FORMAT.size, b'\0')
+    return dict(zip(TCP_INFO_FIELDS, TCP_INFO_FORMAT.unpack(raw)))
+
+
+class TcpInfoSampler:
+    def __init__(self, sock, period: float = DEFAULT_TCPINFO_INTERVAL,
+                 max_samples: int = TCPINFO_MAX_SAMPLES):
+        """
+        Initialize a TCP_INFO sampler for one connection.
+
+        Samples are decoded into a compact time series. Once max_samples
+        is reached, every other sample is dropped and the period doubles,
+        so memory stays bounded however long the test runs.
+
+        Args:
+            sock: Connected TCP socket
+            period (float): Seconds between samples
+            max_samples (int): Upper bound on the kept time series
+        """
+        self.sock = sock
+        self.period = period
+        self.max_samples = max_samples
+        self.samples: List[Dict] = []
+        self._first: Optional[Dict[str, int]] = None
+        self._last: Optional[Dict[str, int]] = None
+        self._app_limited = 0
+        self._count = 0
+        self._start = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> bool:
+        """
+        Take one sample now.
+
+        Returns:
+            bool: False if the socket could not be queried (e.g. it was closed)
+        """
+        try:
+            info = read_tcp_info(self.sock)
+        except OSError:
+            return False
+        now = time.perf_counter()
+        if self._first is None:
+            self._first = info
+        self._last = info
+        self._count += 1
+        if info['flags'] & APP_LIMITED:
+            self._app_limited += 1
+
+        self.samples.append({
+            't': now - self._start,
+            'retrans': info['total_retrans'],
+            'cwnd': info['snd_cwnd'],
+            'rtt': info['rtt'] / 1000,
+            'rttvar': info['rttvar'] / 1000,
+            'pacing_mbps': info['pacing_rate'] / MBPS,
+            'delivery_mbps': info['delivery_rate'] / MBPS,
+            'busy_ms': info['busy_time'] / 1000,
+            'rwnd_limited_ms': info['rwnd_limited'] / 1000,
+            'sndbuf_limited_ms': info['sndbuf_limited'] / 1000
+        })
+        if len(self.samples) > self.max_samples:
+            # Keep the newest sample so the series always ends at the latest state
+            self.samples = self.samples[::2] if len(self.samples) % 2 else self.samples[1::2]
+            self.period *= 2
+        return True
+
+    def start(self) -> None:
+        """Sample now and then every period on a background thread."""
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name='tcp-info', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.period):
+            if not self.sample():
+                return
+
+    async def run_async(self) -> None:
+        """Sample now and then every period on the running event loop, until cancelled."""
+        self.sample()
+        while True:
+            await asyncio.sleep(self.period)
+            if not self.sample():
+                return
+
+    def cancel(self) -> None:
+        """Stop the background thread without a final sample, e.g. after an error."""
+        self._stop.set()
+
+    def stop(self) -> Dict:
+        """
+        Take a final sample, stop sampling and summarise.
+
+        Returns:
+            Dict: The summary plus the time series under 'samples'
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sample()
+        return {**self.summary(), 'samples': self.samples}
+
+    def summary(self) -> Dict:
+        """
+        Summarise the connection over the sampled period.
+
+        Counters (retransmits, busy and limited time) are differences
+        between the first and last sample; gauges are taken over the series.
+
+        Returns:
+            Dict: Retransmits, cwnd, kernel RTT, pacing and delivery rates,
+            the share of busy time limited by the receive window or send
+            buffer, the share of samples flagged app-limited (the kernel
+            keeps no app-limited time), and the likely limit
+        """
+        if self._last is None:
+            return {'samples_taken': 0}
+        first, last = self._first, self._last
+        busy = last['busy_time'] - first['busy_time']
+        rwnd = last['rwnd_limited'] - first['rwnd_limited']
+        sndbuf = last['sndbuf_limited'] - first['sndbuf_limited']
+        segments = last['data_segs_out'] - first['data_segs_out']
+        rtts = [sample['rtt'] for sample in self.samples if sample['rtt']]
+
+        summary = {
+            'samples_taken': self._count,
+            'retransmits': last['total_retrans'] - first['total_retrans'],
+            'segments_out': segments,
+            'cwnd_max': max(sample['cwnd'] for sample in self.samples),
+            'cwnd_last': last['snd_cwnd'],
+            'rtt_min': min(rtts) if rtts else 0.0,
+            'rtt_mean': sum(rtts) / len(rtts) if rtts else 0.0,
+            'rtt_max': max(rtts) if rtts else 0.0,
+            'rttvar': last['rttvar'] / 1000,
+            'pacing_mbps_max': max(sample['pacing_mbps'] for sample in self.samples),
+            'delivery_mbps_max': max(sample['delivery_mbps'] for sample in self.samples),
+            'busy_ms': busy / 1000,
+            'rwnd_limited_pct': rwnd / busy * 100 if busy else 0.0,
+            'sndbuf_limited_pct': sndbuf / busy * 100 if busy else 0.0,
+            'app_limited_samples_pct': self._app_limited / self._count * 100
+        }
+        summary['likely_limit'] = likely_limit(summary)
+        return summary
+
+
+def likely_limit(summary: Dict) -> str:
+    """
+    Name the most likely bottleneck of a sending connection.
+
+    Time limited by the receive window or send buffer is measured directly
+    by the kernel, so it is named ahead of loss, which is inferred from
+    retransmits. A few retransmits (e.g. the end of slow start) are normal
+    and only a sustained rate counts as the limit.
+
+    Args:
+        summary (Dict): Sender-side summary from TcpInfoSampler.summary()
+
+    Returns:
+        str: 'loss', 'receive window', 'send buffer', 'sender application'
+        or 'congestion window'; 'idle' if the connection sent nothing
+    """
+    if not summary.get('segments_out'):
+        return 'idle'
+    if summary['rwnd_limited_pct'] >= 20 or summary['sndbuf_limited_pct'] >= 20:
+        return ('receive window' if summary['rwnd_limited_pct'] >= summary['sndbuf_limited_pct']
+                else 'send buffer')
+    if summary['retransmits'] / summary['segments_out'] >= LOSS_LIMIT_RATE:
+        return 'loss'
+    if summary['app_limited_samples_pct'] >= 50:
+        return 'sender application'
+    return 'congestion window'
+
+
+def merge_summaries(summaries: List[Dict]) -> Dict:
+    """
+    Combine per-stream summaries of parallel connections.
+
+    Args:
+        summaries (List[Dict]): Summaries from TcpInfoSampler.stop()
+
+    Returns:
+        Dict: Totals for counters, extremes for gauges and busy-time weighted
+        limited shares, without the per-stream time series
+    """
+    summaries = [summary for summary in summaries if summary.get('samples_taken')]
+    if not summaries:
+        return {'samples_taken': 0}
+    busy = sum(summary['busy_ms'] for summary in summaries)
+    taken = sum(summary['samples_taken'] for summary in summaries)
+
+    def busy_weighted(key: str) -> float:
+        return sum(s[key] * s['busy_ms'] for s in summaries) / busy if busy else 0.0
+
+    merged = {
+        'samples_taken': taken,
+        'streams': len(summaries),
+        'retransmits': sum(s['retransmits'] for s in summaries),
+        'segments_out': sum(s['segments_out'] for s in summaries),
+        'cwnd_max': max(s['cwnd_max'] for s in summaries),
+        'cwnd_last': sum(s['cwnd_last'] for s in summaries),
+        'rtt_min': min(s['rtt_min'] for s in summaries),
+        'rtt_mean': sum(s['rtt_mean'] * s['samples_taken'] for s in summaries) / taken,
+        'rtt_max': max(s['rtt_max'] for s in summaries),
+        'rttvar': max(s['rttvar'] for s in summaries),
+        'pacing_mbps_max': sum(s['pacing_mbps_max'] for s in summaries),
+        'delivery_mbps_max': sum(s['delivery_mbps_max'] for s in summaries),
+        'busy_ms': busy,
+        'rwnd_limited_pct': busy_weighted('rwnd_limited_pct'),
+        'sndbuf_limited_pct': busy_weighted('sndbuf_limited_pct'),
+        'app_limited_samples_pct': sum(s['app_limited_samples_pct'] * s['samples_taken']
+                                       for s in summaries) / taken
+    }
+    merged['likely_limit'] = likely_limit(merged)
+    return merged
+
+
+def sampling_period(enabled: bool, interval: Optional[float] = None) -> float:
+    """Return the sampling period requested from the server: the reporting interval, the default, or 0 for off."""
+    if not enabled:
+        return 0.0
+    return interval if interval and interval > 0 else DEFAULT_TCPINFO_INTERVAL
+
+
+def create_sampler(sock, period: float) -> Optional[TcpInfoSampler]:
+    """Return a sampler for a positive period, or None when sampling is off or unsupported."""
+    if period <= 0 or not tcp_info_supported():
+        return None
+    return TcpInfoSampler(sock, period)
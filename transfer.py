@@ -0,0 +1,318 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Optional, Tuple
+
+from config import FRAME_BLOCK_TIME, FRAME_MAX_BLOCK, SENDFILE_MIN_COUNT, SENDFILE_REPORT_SHARE
+from framing import FRAME_DATA, FRAME_END, ProtocolError, pack_frame, recv_frame
+
+# Directory used for the sendfile payload file; tmpfs keeps it in memory.
+TMPFS_DIR = '/dev/shm'
+
+
+def send_payload(sock: socket.socket, payload: memoryview, total: Optional[int] = None,
+                 deadline: Optional[float] = None, reporter=None) -> int:
+    """
+    Send from a preallocated payload without copying it, cycling over the buffer.
+
+    Args:
+        sock (socket.socket): Connected socket
+        payload (memoryview): View over the payload buffer
+        total (Optional[int]): Number of bytes to send, or None to send until the deadline
+        deadline (Optional[float]): time.perf_counter() value at which to stop sending
+        reporter (Optional[IntervalReporter]): Receives the size of every chunk sent
+
+    Returns:
+        int: Number of bytes sent
+    """
+    sendall = sock.sendall
+    clock = time.perf_counter
+    chunk_size = len(payload)
+    sent = 0
+
+    while total is None or total - sent >= chunk_size:
+        if deadline is not None and clock() >= deadline:
+            return sent
+        sendall(payload)
+        sent += chunk_size
+        if reporter is not None:
+            reporter.update(chunk_size)
+
+    remaining = total - sent
+    if remaining and (deadline is None or clock() < deadline):
+        # Slicing a memoryview shares the underlying buffer
+        sendall(payload[:remaining])
+        sent += remaining
+        if reporter is not None:
+            reporter.update(remaining)
+
+    return sent
+
+
+def send_framed(sock: socket.socket, payload: memoryview, total: Optional[int] = None,
+                deadline: Optional[float] = None, reporter=None,
+                payload_file: Optional['PayloadFile'] = None) -> int:
+    """
+    Send payload as length-announced DATA frames followed by an END frame.
+
+    Size-bounded transfers are a single frame announcing the full length.
+    Time-bounded transfers are split into blocks sized to roughly
+    FRAME_BLOCK_TIME at the rate achieved so far, so the sender stops close
+    to the deadline while the receiver still parses only one header per block.
+    They also stop early once the reporter's steady-state detector has settled.
+
+    Args:
+        sock (socket.socket): Connected socket
+        payload (memoryview): View over the payload buffer
+        total (Optional[int]): Number of bytes to send, or None to send until the deadline
+        deadline (Optional[float]): time.perf_counter() value at which to stop sending
+        reporter (Optional[IntervalReporter]): Receives the size of every chunk sent
+        payload_file (Optional[PayloadFile]): Send with sendfile() from this file instead
+
+    Returns:
+        int: Number of payload bytes sent
+    """
+    def send_block(size: int) -> int:
+        sock.sendall(pack_frame(FRAME_DATA, size))
+        if payload_file is not None:
+            sent = payload_file.send(sock, size, None, reporter)
+        else:
+            sent = send_payload(sock, payload, size, None, reporter)
+        # The header already announced size bytes; anything less desynchronises the stream
+        if sent != size:
+            raise ProtocolError(f"DATA frame announced {size} bytes but {sent} were sent")
+        return sent
+
+    if total is not None:
+        sent = send_block(total) if total > 0 else 0
+    else:
+        clock = time.perf_counter
+        start = clock()
+        chunk_size = len(payload) if payload_file is None else payload_file.size
+        sent = 0
+        while True:
+            now = clock()
+            if now >= deadline or (reporter is not None and reporter.settled):
+                break
+            sent += send_block(next_block_size(sent, now - start, deadline - now, chunk_size))
+
+    sock.sendall(pack_frame(FRAME_END, 0))
+    return sent
+
+
+def next_block_size(sent: int, elapsed: float, remaining_time: float, chunk_size: int) -> int:
+    """
+    Size the next DATA frame of a time-bounded transfer.
+
+    Args:
+        sent (int): Bytes sent so far
+        elapsed (float): Seconds since the transfer started
+        remaining_time (float): Seconds left until the deadline
+        chunk_size (int): Smallest useful block (one payload chunk)
+
+    Returns:
+        int: Block size in bytes
+    """
+    if not sent or elapsed <= 0:
+        return chunk_size
+    block = (sent / elapsed) * min(FRAME_BLOCK_TIME, remaining_time)
+    return int(min(FRAME_MAX_BLOCK, max(chunk_size, block)))
+
+
+def recv_framed(sock: socket.socket, buffer: bytearray, reporter=None) -> int:
+    """
+    Receive DATA frames into a reused buffer until the END frame.
+
+    Payload bytes are never inspected: the frame headers say exactly how
+    many bytes belong to the payload.
+
+    Args:
+        sock (socket.socket): Connected socket
+        buffer (bytearray): Scratch buffer, overwritten on every read
+        reporter (Optional[IntervalReporter]): Receives the size of every read
+
+    Returns:
+        int: Number of payload bytes received
+    """
+    view = memoryview(buffer)
+    buffer_size = len(buffer)
+    recv_into = sock.recv_into
+    total_received = 0
+
+    while True:
+        frame_type, length = recv_frame(sock)
+        if frame_type == FRAME_END:
+            return total_received
+        if frame_type != FRAME_DATA:
+            raise ProtocolError(f"Unexpected frame type {frame_type} in data stream")
+
+        remaining = length
+        while remaining:
+            received = recv_into(view, min(remaining, buffer_size))
+            if not received:
+                raise ProtocolError("Connection closed mid-frame")
+            remaining -= received
+            if reporter is not None:
+                reporter.update(received)
+        total_received += length
+
+
+def send_and_receive(sock: socket.socket, payload: memoryview, total: Optional[int],
+                     deadline: Optional[float], buffer: bytearray, send_reporter=None,
+                     recv_reporter=None, payload_file: Optional['PayloadFile'] = None
+                     ) -> Tuple[int, float, int, float]:
+    """
+    Send framed payload on a worker thread while receiving the peer's frames.
+
+    Both directions of the connection are loaded at the same time; the
+    call returns once our END frame is sent and the peer's END frame has
+    arrived.
+
+    Args:
+        sock (socket.socket): Connected socket
+        payload (memoryview): View over the payload buffer
+        total (Optional[int]): Number of bytes to send, or None to send until the deadline
+        deadline (Optional[float]): time.perf_counter() value at which to stop sending
+        buffer (bytearray): Scratch receive buffer
+        send_reporter (Optional[IntervalReporter]): Receives the size of every chunk sent
+        recv_reporter (Optional[IntervalReporter]): Receives the size of every read
+        payload_file (Optional[PayloadFile]): Send with sendfile() from this file instead
+
+    Returns:
+        Tuple[int, float, int, float]: Bytes sent, send duration, bytes received
+        and receive duration in seconds
+    """
+    outcome = {}
+    start = time.perf_counter()
+
+    def sender() -> None:
+        try:
+            outcome['sent'] = send_framed(sock, payload, total, deadline, send_reporter, payload_file)
+        except Exception as e:
+            outcome['error'] = e
+        outcome['send_duration'] = time.perf_counter() - start
+
+    thread = threading.Thread(target=sender, name='duplex-sender', daemon=True)
+    thread.start()
+    try:
+        received = recv_framed(sock, buffer, recv_reporter)
+        recv_duration = time.perf_counter() - start
+    except Exception:
+        # Unblock the sender so the failure surfaces now rather than at the timeout
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        raise
+    finally:
+        thread.join()
+
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['sent'], outcome['send_duration'], received, recv_duration
+
+
+def sendfile_count(remaining: int, file_size: int, sent: int, elapsed: float, reporter=None) -> int:
+    """
+    Size the next sendfile() call.
+
+    A whole file pass can take longer than a reporting interval, so with
+    interval reporting on each call covers only SENDFILE_REPORT_SHARE of an
+    interval at the rate achieved so far, starting from SENDFILE_MIN_COUNT.
+
+    Args:
+        remaining (int): Bytes still to send
+        file_size (int): Size of the payload file
+        sent (int): Bytes sent so far
+        elapsed (float): Seconds spent sending so far
+        reporter (Optional[IntervalReporter]): Reporter fed by the sender
+
+    Returns:
+        int: Byte count for the next sendfile() call
+    """
+    count = min(remaining, file_size)
+    if reporter is None:
+        return count
+    cap = SENDFILE_MIN_COUNT
+    if sent and elapsed > 0:
+        cap = max(cap, int(sent / elapsed * reporter.interval * SENDFILE_REPORT_SHARE))
+    return min(count, cap)
+
+
+class PayloadFile:
+    """Payload written once to a tmpfs file and served with sendfile()."""
+
+    def __init__(self, payload: bytes, size: int):
+        """
+        Initialize the payload file.
+
+        Args:
+            payload (bytes): Pattern repeated to fill the file
+            size (int): Minimum file size in bytes
+        """
+        self.payload = payload
+        self.size = max(size, len(payload))
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Create and fill the backing file on first use."""
+        with self._lock:
+            if self._file is None:
+                directory = TMPFS_DIR if os.path.isdir(TMPFS_DIR) else None
+                backing = tempfile.TemporaryFile(dir=directory)
+                written = 0
+                while written < self.size:
+                    written += backing.write(self.payload[:self.size - written])
+                backing.flush()
+                self._file = backing
+        return self._file
+
+    def send(self, sock: socket.socket, total: Optional[int] = None,
+             deadline: Optional[float] = None, reporter=None) -> int:
+        """
+        Send from the payload file using the kernel's sendfile path.
+
+        Short sendfile() calls are resumed until total bytes are sent, so a
+        caller that announced total in a frame header stays in sync. With a
+        reporter, calls are sized by sendfile_count() so it is updated
+        several times per interval.
+
+        Args:
+            sock (socket.socket): Connected socket
+            total (Optional[int]): Number of bytes to send, or None to send until the deadline
+            deadline (Optional[float]): time.perf_counter() value at which to stop sending
+            reporter (Optional[IntervalReporter]): Receives the size of every sendfile() call
+
+        Returns:
+            int: Number of bytes sent
+        """
+        backing = self.open()
+        clock = time.perf_counter
+        start = clock()
+        sent_total = 0
+
+        while total is None or sent_total < total:
+            now = clock()
+            if deadline is not None and now >= deadline:
+                break
+            remaining = self.size if total is None else total - sent_total
+            count = sendfile_count(remaining, self.size, sent_total, now - start, reporter)
+            # Explicit offsets keep concurrent sessions independent of the file position
+            sent = sock.sendfile(backing, 0, count)
+            if not sent:
+                raise ProtocolError("sendfile() made no progress")
+            sent_total += sent
+            if reporter is not None:
+                reporter.update(sent)
+
+        return sent_total
+
+    def close(self) -> None:
+        """Release the backing file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
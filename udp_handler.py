@@ -1,14 +1,40 @@
+import select
 import socket
+import threading
 import time
 import random
-import statistics
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional
 
-from config import DEFAULT_UDP_PACKETS
+import metrics
+from config import (
+    DEFAULT_UDP_PACKETS,
+    DEFAULT_DATAGRAM_SIZE,
+    DEFAULT_UDP_DRAIN_TIME,
+    DEFAULT_UDP_RCVBUF,
+    DEFAULT_UDP_RESULTS_TIMEOUT,
+    UDP_RESULTS_ATTEMPTS
+)
+from intervals import create_reporter
+from pacer import TokenBucketPacer
+from packets import (
+    HEADER_SIZE,
+    MAX_DATAGRAM_SIZE,
+    TYPE_ACK,
+    TYPE_DATA,
+    is_packet,
+    pack_header,
+    unpack_header
+)
+from payload import default_provider
+from sockopts import SocketOptions
+from streamstats import LatencyStats, OneWayDelayStats, SendTimes
+from udp_session import SessionTable, UDPSession, parse_results
 
 class UDPHandler:
     def __init__(self, host: str, port: int, buffer_size: int, data_size: int,
-                 timeout: int, verbose: bool = False):
+                 timeout: int, verbose: bool = False, test_duration: Optional[float] = None,
+                 interval: Optional[float] = None, datagram_size: int = DEFAULT_DATAGRAM_SIZE,
+                 bandwidth: Optional[float] = None, socket_options: Optional[SocketOptions] = None):
         """
         Initialize UDP Handler.
         
@@ -19,6 +45,11 @@ class UDPHandler:
             data_size (int): Total size of data to transfer
             timeout (int): Socket timeout in seconds
             verbose (bool): Enable verbose output
+            test_duration (Optional[float]): Send for this many seconds instead of a fixed packet count
+            interval (Optional[float]): Report throughput every this many seconds
+            datagram_size (int): Size of each test datagram in bytes, header included
+            bandwidth (Optional[float]): Target send rate in bits per second (unpaced if None)
+            socket_options (Optional[SocketOptions]): SO_SNDBUF/SO_RCVBUF for test sockets
         """
         self.host = host
         self.port = port
@@ -26,57 +57,163 @@ class UDPHandler:
         self.data_size = data_size
         self.timeout = timeout
         self.verbose = verbose
+        self.test_duration = test_duration
+        self.interval = interval
+        self.datagram_size = min(max(datagram_size, HEADER_SIZE), MAX_DATAGRAM_SIZE)
+        self.bandwidth = bandwidth
+        self.socket_options = socket_options or SocketOptions()
+        # Set by worker processes that share the server port
+        self.reuse_port = False
 
     def start_server(self) -> None:
         """Start UDP server."""
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.reuse_port:
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.socket_options.apply(server_socket, tcp=False)
         server_socket.bind((self.host, self.port))
         server_socket.settimeout(1.0)
         
         print(f"UDP Server started on {self.host}:{self.port}")
         
-        packet_times = {}
+        # One entry per (client address, session id) so concurrent probes
+        # never share counters; idle sessions are swept once per second
+        sessions = SessionTable()
+        next_sweep = time.monotonic() + 1.0
+        buffer = bytearray(MAX_DATAGRAM_SIZE)
+        view = memoryview(buffer)
+        ack = bytearray(HEADER_SIZE)
         
         try:
             while True:
                 try:
-                    data, addr = server_socket.recvfrom(self.buffer_size)
+                    size, addr = server_socket.recvfrom_into(buffer)
+                    now = time.monotonic()
                     
-                    if data.startswith(b'START:'):
-                        test_type = data.decode('utf-8').split(':')[1]
-                        if self.verbose:
-                            print(f"Starting UDP {test_type} test with {addr}")
-                        
-                        packet_times = {}
-                        server_socket.sendto(b'READY', addr)
-                        
-                    elif data.startswith(b'SEQ:'):
-                        parts = data.decode('utf-8').split(':')
-                        seq_num = int(parts[1])
-                        client_time = float(parts[2])
-                        
-                        packet_times[seq_num] = {
-                            'client_time': client_time,
-                            'server_time': time.time()
-                        }
-                        
-                        response = f"ACK:{seq_num}:{time.time()}"
-                        server_socket.sendto(response.encode('utf-8'), addr)
-                        
-                    elif data.startswith(b'END'):
-                        if self.verbose:
-                            print(f"UDP test complete, received {len(packet_times)} packets")
-                        
-                        results = f"RESULTS:{len(packet_times)}"
-                        server_socket.sendto(results.encode('utf-8'), addr)
+                    response = self._process_datagram(sessions, view, size, addr, now, ack)
+                    if response is not None:
+                        server_socket.sendto(response, addr)
+                    
+                    if now >= next_sweep:
+                        self._evict_sessions(sessions, now)
+                        next_sweep = now + 1.0
                     
                 except socket.timeout:
+                    self._evict_sessions(sessions, time.monotonic())
                     continue
                 except KeyboardInterrupt:
                     break
         finally:
             server_socket.close()
 
+    def _process_datagram(self, sessions: SessionTable, data, size: int,
+                          addr: Tuple[str, int], now: float, ack: bytearray):
+        """
+        Update the session table for one received datagram.
+        
+        Args:
+            sessions (SessionTable): Server session table
+            data: Buffer holding the datagram
+            size (int): Datagram size in bytes
+            addr (Tuple[str, int]): Client address
+            now (float): time.monotonic() at reception
+            ack (bytearray): Reusable ACK buffer
+            
+        Returns:
+            The response to send back to addr, or None
+        """
+        if is_packet(data, size):
+            header = unpack_header(data, size)
+            if header is None or header[0] != TYPE_DATA:
+                return None
+            _, session_id, seq_num, _ = header
+            
+            server_time = time.monotonic_ns()
+            session = sessions.get(addr, session_id)
+            if session is None:
+                # Data without START (e.g. after eviction) opens a new session while there is room
+                session = self._start_session(sessions, addr, session_id, 'unknown')
+                if session is None:
+                    return None
+            session.record(seq_num, size, now)
+            
+            pack_header(ack, TYPE_ACK, session_id, seq_num, server_time)
+            return ack
+        
+        parts = bytes(data[:size]).decode('utf-8', 'replace').split(':')
+        session_id = int(parts[-1]) if len(parts) > 1 and parts[-1].isdigit() else 0
+        
+        if parts[0] == 'START':
+            test_type = parts[1]
+            if self.verbose:
+                print(f"Starting UDP {test_type} test with {addr} (session {session_id})")
+            
+            if self._start_session(sessions, addr, session_id, test_type) is None:
+                if self.verbose:
+                    print(f"Refused UDP session {session_id} from {addr}: "
+                          f"{sessions.max_sessions} sessions already open")
+                return b'BUSY'
+            return b'READY'
+            
+        elif parts[0] == 'END':
+            session = sessions.get(addr, session_id)
+            if session is None:
+                session = self._start_session(sessions, addr, session_id, 'unknown')
+                if session is None:
+                    return None
+            self._finish_session(session)
+            
+            if self.verbose:
+                print(f"UDP test complete (session {session_id}), received "
+                      f"{session.received} packets ({session.bytes_received} bytes), "
+                      f"{session.duplicates} duplicate, {session.reordered} reordered")
+            
+            return session.results().encode('utf-8')
+        
+        return None
+
+    @staticmethod
+    def _start_session(sessions: SessionTable, addr: Tuple[str, int], session_id: int,
+                       test_type: str) -> Optional[UDPSession]:
+        """
+        Open a session, counting it as active unless a retried START replaces a live one.
+        
+        Returns:
+            Optional[UDPSession]: The session, or None if the session table is full
+        """
+        previous = sessions.get(addr, session_id)
+        session = sessions.start(addr, session_id, test_type)
+        if session is None:
+            metrics.errors_total.inc('udp')
+            return None
+        if previous is None or previous.finished:
+            metrics.active_sessions.inc('udp')
+        return session
+
+    @staticmethod
+    def _finish_session(session: UDPSession, error: bool = False) -> None:
+        """Record a session in the server metrics once, at END or eviction."""
+        if session.finished:
+            return
+        session.finished = True
+        metrics.active_sessions.dec('udp')
+        metrics.bytes_total.inc('udp', 'in', amount=session.bytes_received)
+        # Every received datagram is answered with one header-sized ACK
+        metrics.bytes_total.inc('udp', 'out', amount=session.received * HEADER_SIZE)
+        metrics.session_duration.observe(session.last_seen - session.started, 'udp')
+        if error:
+            metrics.errors_total.inc('udp')
+        else:
+            metrics.sessions_total.inc('udp', session.test_type)
+
+    def _evict_sessions(self, sessions: SessionTable, now: float) -> None:
+        """Drop idle sessions from the server session table."""
+        for session in sessions.evict_idle(now):
+            # A session that never sent END was abandoned by its client
+            self._finish_session(session, error=True)
+            if self.verbose:
+                print(f"Evicted idle UDP session {session.session_id} from {session.addr}")
+
     def run_client_test(self, test_type: str) -> Tuple[float, float, int, Dict]:
         """
         Run UDP client speed test.
@@ -87,15 +224,62 @@ class UDPHandler:
         Returns:
             Tuple[float, float, int, Dict]: Speed in Mbps, duration, bytes sent, statistics
         """
+        return self._client_test(test_type, live=True)
+
+    def run_parallel_test(self, test_type: str, streams: int) -> Tuple[float, float, int, List[Dict]]:
+        """
+        Run several UDP probes concurrently, one thread per probe.
+        
+        Args:
+            test_type (str): Type of test ('upload' or 'download')
+            streams (int): Number of concurrent probes
+            
+        Returns:
+            Tuple[float, float, int, List[Dict]]: Aggregate speed in Mbps, duration
+            in seconds, total bytes sent, and per-probe results
+        """
+        results: List[Optional[Tuple[float, float, int, Dict]]] = [None] * streams
+        
+        def worker(stream_id: int) -> None:
+            results[stream_id] = self._client_test(test_type, live=False)
+        
+        threads = [threading.Thread(target=worker, args=(i,), name=f'udp-probe-{i}')
+                   for i in range(streams)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        per_stream = []
+        for stream_id, (speed, duration, transferred, stats) in enumerate(results):
+            per_stream.append({
+                'stream': stream_id,
+                'speed': speed,
+                'duration': duration,
+                'bytes': transferred,
+                **stats
+            })
+        
+        total_bytes = sum(stream['bytes'] for stream in per_stream)
+        duration = max(stream['duration'] for stream in per_stream)
+        speed_mbps = (total_bytes * 8) / (1024 * 1024 * duration) if duration > 0 else 0.0
+        return speed_mbps, duration, total_bytes, per_stream
+
+    def _client_test(self, test_type: str, live: bool) -> Tuple[float, float, int, Dict]:
+        """Run one UDP probe; parallel probes keep their interval reports quiet."""
         client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         client_socket.settimeout(self.timeout)
         
         try:
-            start_msg = f"START:{test_type}"
+            session_id = random.getrandbits(32)
+            start_msg = f"START:{test_type}:{session_id}"
             client_socket.sendto(start_msg.encode('utf-8'), (self.host, self.port))
             
             try:
                 data, _ = client_socket.recvfrom(1024)
+                if data == b'BUSY':
+                    print("Server is busy: too many UDP sessions open")
+                    return 0.0, 0.0, 0, {}
                 if data != b'READY':
                     print("Did not receive ready signal from server")
                     return 0.0, 0.0, 0, {}
@@ -106,76 +290,198 @@ class UDPHandler:
             if self.verbose:
                 print(f"Starting UDP {test_type} test with {self.host}:{self.port}")
             
-            packet_size = 1024
+            packet_size = self.datagram_size
             num_packets = min(DEFAULT_UDP_PACKETS, self.data_size // packet_size)
-            sent_times = {}
-            received_times = {}
-            
-            start_time = time.time()
-            
-            for i in range(num_packets):
-                now = time.time()
-                packet = f"SEQ:{i}:{now}"
-                client_socket.sendto(packet.encode('utf-8'), (self.host, self.port))
-                sent_times[i] = now
-                
-                if i % 50 == 0 and i > 0:
-                    time.sleep(0.01)
+            send_times = SendTimes()
+            latency = LatencyStats()
+            one_way = OneWayDelayStats()
+            bytes_sent = 0
             
-            client_socket.settimeout(0.5)
+            # One datagram buffer padded with payload; only the header is rewritten per packet
+            packet = bytearray(default_provider.get(packet_size))
+            server_address = (self.host, self.port)
             
-            for _ in range(num_packets):
-                try:
-                    data, _ = client_socket.recvfrom(1024)
-                    if data.startswith(b'ACK:'):
-                        parts = data.decode('utf-8').split(':')
-                        seq_num = int(parts[1])
-                        server_time = float(parts[2])
-                        receive_time = time.time()
-                        
-                        received_times[seq_num] = {
-                            'server_time': server_time,
-                            'receive_time': receive_time
-                        }
-                except socket.timeout:
-                    continue
+            # ACKs are received and timestamped on a separate thread while
+            # sending continues, so RTTs do not include the send loop. The
+            # receiver polls with its own short timeout; the socket keeps the
+            # test timeout for the sender's sendto() calls.
+            self._client_socket_options().apply(client_socket, tcp=False)
+            stop_receiving = threading.Event()
+            last_ack = [0.0]
             
-            end_time = time.time()
-            duration = end_time - start_time
+            def receive_acks() -> None:
+                ack = bytearray(HEADER_SIZE)
+                while not stop_receiving.is_set():
+                    readable, _, _ = select.select([client_socket], [], [], 0.1)
+                    if not readable:
+                        continue
+                    try:
+                        size = client_socket.recv_into(ack)
+                    except (socket.timeout, BlockingIOError):
+                        continue
+                    receive_time = time.monotonic_ns()
+                    header = unpack_header(ack, size)
+                    if header and header[0] == TYPE_ACK and header[1] == session_id:
+                        sent_time = send_times.pop(header[2])
+                        if sent_time is not None:
+                            latency.add((receive_time - sent_time) / 1e6)
+                            one_way.add(sent_time, header[3], receive_time)
+                            last_ack[0] = time.perf_counter()
             
-            client_socket.sendto(b'END', (self.host, self.port))
+            receiver = threading.Thread(target=receive_acks, name='udp-ack-receiver', daemon=True)
             
-            packets_sent = num_packets
-            packets_received = len(received_times)
-            bytes_sent = packets_sent * packet_size
-            bytes_received = packets_received * packet_size
+            reporter = create_reporter(self.interval, live=live)
+            pacer = TokenBucketPacer(self.bandwidth, packet_size) if self.bandwidth else None
             
-            packet_loss = (1 - packets_received / packets_sent) * 100 if packets_sent > 0 else 0
+            if reporter:
+                reporter.start()
+            # Time-bounded tests send until the deadline instead of a fixed count
+            deadline = time.perf_counter() + self.test_duration if self.test_duration else None
             
-            rtts = []
-            for seq_num in received_times:
-                if seq_num in sent_times:
-                    rtt = received_times[seq_num]['receive_time'] - sent_times[seq_num]
-                    rtts.append(rtt)
+            send_start = time.perf_counter()
+            receiver.start()
+            i = 0
+            while (i < num_packets) if deadline is None else (time.perf_counter() < deadline):
+                # The pacer releases a burst of datagrams per tick to keep the
+                # rate on target without a sleep per packet
+                burst = pacer.next_burst() if pacer else 1
+                if deadline is None:
+                    burst = min(burst, num_packets - i)
+                
+                for _ in range(burst):
+                    now = time.monotonic_ns()
+                    pack_header(packet, TYPE_DATA, session_id, i, now)
+                    # Record before sending so a fast ACK always finds its send time
+                    send_times.record(i, now)
+                    sent = client_socket.sendto(packet, server_address)
+                    bytes_sent += sent
+                    if reporter:
+                        reporter.update(sent)
+                    i += 1
+                
+                if not pacer and i % 50 == 0 and i > 0:
+                    time.sleep(0.01)
+            send_duration = time.perf_counter() - send_start
+            num_packets = i
+            intervals = reporter.finish() if reporter else None
             
-            jitter = statistics.stdev(rtts) * 1000 if len(rtts) > 1 else 0  # in ms
+            # Wait for outstanding ACKs until a single drain deadline
+            drain_deadline = time.perf_counter() + DEFAULT_UDP_DRAIN_TIME
+            while latency.count < num_packets and time.perf_counter() < drain_deadline:
+                time.sleep(0.005)
+            stop_receiving.set()
+            receiver.join()
             
-            speed_mbps = (bytes_sent * 8) / (1024 * 1024 * duration) if duration > 0 else 0
+            # The test ends with the last ACK, or with the last send if none arrived later
+            duration = max(send_start + send_duration, last_ack[0]) - send_start
             
-            stats = {
-                'packet_loss': packet_loss,
-                'min_rtt': min(rtts) * 1000 if rtts else 0,  # ms
-                'max_rtt': max(rtts) * 1000 if rtts else 0,  # ms
-                'avg_rtt': statistics.mean(rtts) * 1000 if rtts else 0,  # ms
-                'jitter': jitter,  # ms
-                'packets_sent': packets_sent,
-                'packets_received': packets_received
-            }
+            server_results = self._fetch_results(client_socket, session_id)
             
-            return speed_mbps, duration, bytes_sent, stats
+            return self._build_results(num_packets, bytes_sent, latency, one_way,
+                                       send_duration, duration, intervals, server_results)
             
         except Exception as e:
             print(f"Error during UDP {test_type} test: {e}")
             return 0.0, 0.0, 0, {}
         finally:
             client_socket.close()
+
+    def _fetch_results(self, client_socket: socket.socket, session_id: int) -> Optional[Dict[str, int]]:
+        """
+        End the session and wait for the server's RESULTS, resending END on timeout.
+        
+        Args:
+            client_socket (socket.socket): The test socket; late ACKs on it are skipped
+            session_id (int): Session to end
+            
+        Returns:
+            Optional[Dict[str, int]]: The server's receive counts, or None if none arrived
+        """
+        end = f"END:{session_id}".encode('utf-8')
+        for _ in range(UDP_RESULTS_ATTEMPTS):
+            client_socket.sendto(end, (self.host, self.port))
+            deadline = time.perf_counter() + DEFAULT_UDP_RESULTS_TIMEOUT
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                client_socket.settimeout(remaining)
+                try:
+                    results = parse_results(client_socket.recv(1024))
+                except socket.timeout:
+                    break
+                if results is not None:
+                    return results
+        
+        if self.verbose:
+            print(f"No UDP results from the server (session {session_id}); loss is round trip only")
+        return None
+
+    def _client_socket_options(self) -> SocketOptions:
+        """Return the client socket options, with a large default receive buffer for ACKs."""
+        return self.socket_options.merged(SocketOptions(rcvbuf=DEFAULT_UDP_RCVBUF))
+
+    def _build_results(self, packets_sent: int, bytes_sent: int, latency: LatencyStats,
+                       one_way: OneWayDelayStats, send_duration: float, duration: float,
+                       intervals: Optional[Dict], server: Optional[Dict[str, int]] = None,
+                       send_errors: int = 0) -> Tuple[float, float, int, Dict]:
+        """
+        Compute the UDP test result from the streamed ACK statistics.
+        
+        With the server's RESULTS, packet_loss is the forward loss counted by
+        the server and reverse_loss the share of received datagrams whose ACK
+        never came back; without them, packet_loss is the round-trip loss of
+        unacknowledged datagrams.
+        
+        Args:
+            packets_sent (int): Number of datagrams sent
+            bytes_sent (int): Bytes actually sent on the wire
+            latency (LatencyStats): RTT statistics of the acknowledged datagrams
+            one_way (OneWayDelayStats): Forward and reverse delay of the acknowledged datagrams
+            send_duration (float): Time spent sending in seconds
+            duration (float): Test duration in seconds
+            intervals (Optional[Dict]): Interval summary, if interval reporting was on
+            server (Optional[Dict[str, int]]): Receive counts from the server's RESULTS
+            send_errors (int): Datagrams the socket refused to send, not counted in packets_sent
+            
+        Returns:
+            Tuple[float, float, int, Dict]: Speed in Mbps, duration, bytes sent, statistics
+        """
+        packets_received = latency.count
+        
+        round_trip_loss = (1 - packets_received / packets_sent) * 100 if packets_sent > 0 else 0
+        packet_loss = round_trip_loss
+        if server is not None:
+            # Datagrams beyond our own count can only mean the server saw a stale session
+            expected = max(packets_sent, server['highest_seq'])
+            received = min(server['received'], expected)
+            packet_loss = (1 - received / expected) * 100 if expected > 0 else 0
+        
+        speed_mbps = (bytes_sent * 8) / (1024 * 1024 * duration) if duration > 0 else 0
+        
+        # RTT figures and RFC 3550 jitter are all in ms
+        stats = {
+            'packet_loss': packet_loss,
+            **latency.summary(),
+            **one_way.summary(),
+            'packets_sent': packets_sent,
+            'packets_received': packets_received,
+            'send_errors': send_errors,
+            'datagram_size': self.datagram_size,
+            'achieved_mbps': (bytes_sent * 8) / (1024 * 1024 * send_duration) if send_duration > 0 else 0
+        }
+        if server is not None:
+            stats['round_trip_loss'] = round_trip_loss
+            stats['reverse_loss'] = (max(0.0, 1 - packets_received / received) * 100
+                                     if received > 0 else 0.0)
+            stats['server_received'] = received
+            # The server's view of the forward path: out of order, duplicated, or too late to tell
+            stats['reordered'] = server['reordered']
+            stats['duplicates'] = server['duplicates']
+            stats['late'] = server['late']
+        if self.bandwidth:
+            stats['requested_mbps'] = self.bandwidth / (1024 * 1024)
+        if intervals:
+            stats['intervals'] = intervals
+        
+        return speed_mbps, duration, bytes_sent, stats
@@ -0,0 +1,156 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import DEFAULT_UDP_MAX_SESSIONS, DEFAULT_UDP_REORDER_WINDOW, DEFAULT_UDP_SESSION_IDLE
+
+SessionKey = Tuple[Tuple[str, int], int]
+
+
+class UDPSession:
+    """Compact per-session receive counters kept by the UDP server."""
+
+    __slots__ = ('addr', 'session_id', 'test_type', 'received', 'bytes_received',
+                 'highest_seq', 'duplicates', 'reordered', 'late', 'window',
+                 'window_size', 'window_mask', 'started', 'last_seen', 'finished')
+
+    def __init__(self, addr: Tuple[str, int], session_id: int, test_type: str,
+                 window_size: int = DEFAULT_UDP_REORDER_WINDOW):
+        """
+        Initialize a UDP test session.
+
+        Args:
+            addr (Tuple[str, int]): Client address
+            session_id (int): Session identifier chosen by the client
+            test_type (str): Type of test ('upload' or 'download')
+            window_size (int): Number of sequence numbers tracked below the highest seen
+        """
+        self.addr = addr
+        self.session_id = session_id
+        self.test_type = test_type
+        self.received = 0
+        self.bytes_received = 0
+        self.highest_seq = -1
+        self.duplicates = 0
+        self.reordered = 0
+        self.late = 0
+        # Bit k set means sequence number (highest_seq - k) has been received
+        self.window = 0
+        self.window_size = window_size
+        self.window_mask = (1 << window_size) - 1
+        self.started = self.last_seen = time.monotonic()
+        # Set once the session has been accounted for in the server metrics
+        self.finished = False
+
+    def record(self, seq: int, size: int, now: float) -> bool:
+        """
+        Account for one received datagram.
+
+        Args:
+            seq (int): Sequence number of the datagram
+            size (int): Datagram size in bytes
+            now (float): time.monotonic() at reception
+
+        Returns:
+            bool: False if the datagram was a duplicate
+        """
+        self.last_seen = now
+
+        if seq > self.highest_seq:
+            shift = seq - self.highest_seq
+            if shift >= self.window_size:
+                self.window = 1
+            else:
+                self.window = ((self.window << shift) | 1) & self.window_mask
+            self.highest_seq = seq
+        else:
+            offset = self.highest_seq - seq
+            if offset >= self.window_size:
+                # Too old to tell a duplicate from a late arrival
+                self.late += 1
+            elif (self.window >> offset) & 1:
+                self.duplicates += 1
+                return False
+            else:
+                self.window |= 1 << offset
+                self.reordered += 1
+
+        self.received += 1
+        self.bytes_received += size
+        return True
+
+    def results(self) -> str:
+        """Return the RESULTS message sent to the client at the end of a test."""
+        return (f"RESULTS:{self.received}:{self.bytes_received}:{self.highest_seq + 1}:"
+                f"{self.duplicates}:{self.reordered}:{self.late}")
+
+
+def parse_results(message: bytes) -> Optional[Dict[str, int]]:
+    """
+    Decode the server's RESULTS message.
+
+    Args:
+        message (bytes): Datagram received by the client
+
+    Returns:
+        Optional[Dict[str, int]]: Datagrams and bytes received, the count up to
+        the highest sequence number seen, duplicates, reordered datagrams and
+        datagrams too late to classify (0 from servers that do not report it);
+        None if the datagram is not a RESULTS message
+    """
+    parts = message.split(b':')
+    if parts[0] != b'RESULTS' or len(parts) < 6:
+        return None
+    try:
+        values = [int(part) for part in parts[1:8]]
+    except ValueError:
+        return None
+    results = dict(zip(('received', 'bytes_received', 'highest_seq', 'duplicates', 'reordered', 'late'),
+                       values))
+    results.setdefault('late', 0)
+    return results
+
+
+class SessionTable:
+    def __init__(self, idle_timeout: float = DEFAULT_UDP_SESSION_IDLE,
+                 max_sessions: int = DEFAULT_UDP_MAX_SESSIONS):
+        """
+        Initialize the UDP server session table.
+
+        Args:
+            idle_timeout (float): Seconds without traffic after which a session is evicted
+            max_sessions (int): Sessions kept at once, so stray or spoofed traffic
+                cannot grow the table until the next eviction
+        """
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sessions: Dict[SessionKey, UDPSession] = {}
+
+    def start(self, addr: Tuple[str, int], session_id: int, test_type: str) -> Optional[UDPSession]:
+        """Create (or reset) a session, or return None if the table is full."""
+        key = (addr, session_id)
+        if key not in self.sessions and len(self.sessions) >= self.max_sessions:
+            return None
+        session = UDPSession(addr, session_id, test_type)
+        self.sessions[key] = session
+        return session
+
+    def get(self, addr: Tuple[str, int], session_id: int) -> Optional[UDPSession]:
+        """Return the session for a client address and session id, if any."""
+        return self.sessions.get((addr, session_id))
+
+    def evict_idle(self, now: float) -> List[UDPSession]:
+        """
+        Remove sessions that have been idle longer than the idle timeout.
+
+        Args:
+            now (float): Current time.monotonic() value
+
+        Returns:
+            List[UDPSession]: The evicted sessions
+        """
+        cutoff = now - self.idle_timeout
+        expired = [key for key, session in self.sessions.items() if session.last_seen < cutoff]
+        return [self.sessions.pop(key) for key in expired]
+
+    def __len__(self) -> int:
+        return len(self.sessions)
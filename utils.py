@@ -1,3 +1,6 @@
+import socket
+from typing import Tuple
+
 def format_size(size_bytes: int) -> str:
     """
     Format bytes size into human readable format.
@@ -16,3 +19,74 @@ def format_size(size_bytes: int) -> str:
         return f"{size_bytes/(1024*1024):.2f} MB"
     else:
         return f"{size_bytes/(1024*1024*1024):.2f} GB"
+
+def parse_rate(rate: str) -> float:
+    """
+    Parse a bit rate such as '200M', '1.5G' or '500k' into bits per second.
+    
+    Suffixes use the same 1024-based units as the reported Mbps figures.
+    
+    Args:
+        rate (str): Rate with an optional K, M or G suffix
+        
+    Returns:
+        float: Rate in bits per second
+    """
+    multipliers = {'k': 1024, 'm': 1024 * 1024, 'g': 1024 * 1024 * 1024}
+    rate = rate.strip().lower().rstrip('bps')
+    if rate and rate[-1] in multipliers:
+        return float(rate[:-1]) * multipliers[rate[-1]]
+    return float(rate)
+
+def parse_size(size: str) -> int:
+    """
+    Parse a byte size such as '64K', '4M' or '1G' into bytes.
+    
+    Args:
+        size (str): Size with an optional K, M or G suffix (1024-based)
+        
+    Returns:
+        int: Size in bytes
+    """
+    multipliers = {'k': 1024, 'm': 1024 * 1024, 'g': 1024 * 1024 * 1024}
+    size = size.strip().lower().rstrip('b')
+    if size and size[-1] in multipliers:
+        return int(float(size[:-1]) * multipliers[size[-1]])
+    return int(size)
+
+def parse_duration(duration: str) -> float:
+    """
+    Parse a time span such as '90s', '15m', '24h', '7d' or '1w' into seconds.
+    
+    Args:
+        duration (str): Span with an optional s, m, h, d or w suffix
+        
+    Returns:
+        float: Span in seconds
+    """
+    multipliers = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+    duration = duration.strip().lower()
+    if duration and duration[-1] in multipliers:
+        return float(duration[:-1]) * multipliers[duration[-1]]
+    return float(duration)
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """
+    Parse a 'host:port' address.
+    
+    Args:
+        address (str): Address such as '10.0.0.2:5000'
+        
+    Returns:
+        Tuple[str, int]: Host and port
+    """
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Expected host:port, got '{address}'")
+    return host, int(port)
+
+def free_port() -> int:
+    """Return a port that is currently free on the loopback interface."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
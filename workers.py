@@ -0,0 +1,152 @@
+import multiprocessing
+import queue
+import signal
+import socket
+from typing import Dict, List, Optional, Tuple
+
+from metrics import start_metrics_server
+
+
+def split_streams(streams: int, workers: int) -> List[int]:
+    """
+    Spread streams over worker processes as evenly as possible.
+
+    Args:
+        streams (int): Total number of streams
+        workers (int): Number of worker processes
+
+    Returns:
+        List[int]: Streams per worker, without empty workers
+    """
+    workers = max(1, min(workers, streams))
+    return [streams // workers + (1 if i < streams % workers else 0) for i in range(workers)]
+
+
+def _interrupt(signum, frame) -> None:
+    raise KeyboardInterrupt
+
+
+def _serve(handler, worker_id: int, metrics_port: Optional[int]) -> None:
+    """Worker process entry point: run one server on the shared port."""
+    signal.signal(signal.SIGTERM, _interrupt)
+    handler.reuse_port = True
+    try:
+        if metrics_port:
+            # Metrics live in each process, so every worker is scraped separately
+            start_metrics_server(handler.host, metrics_port + worker_id)
+        handler.start_server()
+    except KeyboardInterrupt:
+        pass
+
+
+def serve_workers(handler, workers: int, metrics_port: Optional[int] = None) -> None:
+    """
+    Run a server in several processes that share one port via SO_REUSEPORT.
+
+    The kernel spreads incoming connections (or, for UDP, client address
+    and port pairs) across the processes, so each one pushes bytes on its
+    own core without contending for the GIL. Every worker keeps its own
+    session limit.
+
+    Args:
+        handler: TCPHandler or UDPHandler (or their asyncio variants) to run
+        workers (int): Number of server processes
+        metrics_port (Optional[int]): First metrics port; worker i serves metrics on metrics_port + i
+    """
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        raise OSError("SO_REUSEPORT is not supported on this platform")
+
+    processes = [multiprocessing.Process(target=_serve, args=(handler, i, metrics_port),
+                                         name=f'server-worker-{i}', daemon=True)
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    print(f"Started {workers} server worker processes")
+
+    # Stop the workers however the parent is asked to stop
+    previous = signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+
+def _client_worker(handler, test_type: str, streams: int, start, results, worker_id: int) -> None:
+    """Worker process entry point: run this worker's share of the streams."""
+    try:
+        start.wait()
+    except Exception:
+        # Another worker failed before the start; run anyway so results stay complete
+        pass
+
+    per_stream: List[Dict] = []
+    try:
+        if streams > 1:
+            _, _, _, per_stream = handler.run_parallel_test(test_type, streams)
+        else:
+            speed, duration, transferred, stats = handler.run_client_test(test_type)
+            per_stream = [{'stream': 0, 'speed': speed, 'duration': duration,
+                           'bytes': transferred, **(stats or {})}]
+    except Exception as e:
+        print(f"Error in client worker {worker_id}: {e}")
+    finally:
+        results.put((worker_id, per_stream))
+
+
+def run_client_workers(handler, test_type: str, streams: int,
+                       workers: int) -> Tuple[float, float, int, List[Dict]]:
+    """
+    Run a client test with its streams spread over several processes.
+
+    Workers start their transfers together behind a process barrier and
+    send their per-stream results back to the parent.
+
+    Args:
+        handler: Client handler; each worker process gets its own copy
+        test_type (str): Type of test ('upload' or 'download')
+        streams (int): Total number of streams
+        workers (int): Number of client processes
+
+    Returns:
+        Tuple[float, float, int, List[Dict]]: Aggregate speed in Mbps, duration
+        in seconds, total bytes transferred, and per-stream results
+    """
+    shares = split_streams(streams, workers)
+    start = multiprocessing.Barrier(len(shares), timeout=handler.timeout)
+    results = multiprocessing.Queue()
+
+    processes = [multiprocessing.Process(target=_client_worker,
+                                         args=(handler, test_type, share, start, results, i),
+                                         name=f'client-worker-{i}')
+                 for i, share in enumerate(shares)]
+    for process in processes:
+        process.start()
+
+    # Drain the queue before joining so large results cannot block a worker's exit
+    gathered = {}
+    while len(gathered) < len(processes):
+        try:
+            worker_id, per_stream = results.get(timeout=1.0)
+            gathered[worker_id] = per_stream
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes) and results.empty():
+                print("A client worker exited without reporting results")
+                break
+    for process in processes:
+        process.join()
+
+    per_stream = []
+    for worker_id in sorted(gathered):
+        for stream in gathered[worker_id]:
+            per_stream.append({**stream, 'stream': len(per_stream), 'worker': worker_id})
+
+    total_bytes = sum(stream['bytes'] for stream in per_stream)
+    duration = max((stream['duration'] for stream in per_stream), default=0.0)
+    speed_mbps = (total_bytes * 8) / (1024 * 1024 * duration) if duration > 0 else 0.0
+    return speed_mbps, duration, total_bytes, per_stream